@@ -0,0 +1,37 @@
+"""
+WSGI to ASGI adapter that closes responses.
+
+asgiref's adapter iterates the WSGI response but never calls its `close()`, so
+Django's `request_finished` doesn't fire, database connections are neither
+closed nor checked, and files of FileResponse stay open. WSGI servers must
+close it and so does this adapter, in the same thread that ran the request.
+"""
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+
+class ClosingWsgiToAsgiInstance(WsgiToAsgiInstance):
+
+    @sync_to_async
+    def run_wsgi_app(self, body):
+        environ = self.build_environ(self.scope, body)
+        response = self.wsgi_application(environ, self.start_response)
+        try:
+            for output in response:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+            if not self.response_started:
+                self.response_started = True
+                self.sync_send(self.response_start)
+            self.sync_send({'type': 'http.response.body'})
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+
+class ClosingWsgiToAsgi(WsgiToAsgi):
+
+    async def __call__(self, scope, receive, send):
+        await ClosingWsgiToAsgiInstance(self.wsgi_application)(scope, receive, send)
@@ -0,0 +1,67 @@
+"""
+Several GET requests in one HTTP round trip.
+
+Sub-requests are dispatched straight to views of BATCH_NAMESPACES, without
+middleware. They reuse user and session of the batch request and its request
+cache, so objects and memberships checked by one are not queried again by the
+next. Response data is collected unrendered and rendered once with the batch.
+"""
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from .request_cache import request_cache
+
+logger = logging.getLogger(__name__)
+
+NOT_BATCHABLE = 'This url can not be requested in batch.'
+
+
+def sub_request(request: HttpRequest, path: str, query: str) -> HttpRequest:
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {
+        **request.META,
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': '',
+        'CONTENT_LENGTH': '',
+    }
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    # set by session and authentication middleware of the batch request, user is loaded once
+    sub.session = request.session
+    sub.user = request.user
+    sub.request_cache = request_cache(request)
+    return sub
+
+
+def dispatch(request: HttpRequest, url: str, api_root: str) -> dict:
+    """Run one GET sub-request, `url` is absolute or relative to `api_root`."""
+    parts = urlsplit(url)
+    path = parts.path if parts.path.startswith('/') else api_root + parts.path
+    result = {'path': url}
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {**result, 'status': 404, 'body': {'detail': 'Not found.'}}
+    if match.namespace not in settings.BATCH_NAMESPACES:
+        return {**result, 'status': 400, 'body': {'detail': NOT_BATCHABLE}}
+
+    sub = sub_request(request, path, parts.query)
+    sub.resolver_match = match
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batch sub-request %s failed', path)
+        return {**result, 'status': 500, 'body': {'detail': 'Server error.'}}
+    if not hasattr(response, 'data'):
+        # downloads and other responses that are not plain api data
+        response.close()
+        return {**result, 'status': 400, 'body': {'detail': NOT_BATCHABLE}}
+    return {**result, 'status': response.status_code, 'body': response.data}
@@ -0,0 +1,108 @@
+"""
+Response compression.
+
+Unlike django's GZipMiddleware this also speaks brotli when the optional
+`brotli` package is installed, leaves small responses and already compressed
+types alone, and compresses streaming responses chunk by chunk.
+"""
+import re
+import zlib
+from functools import partial
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding we support among those client accepts, brotli compresses better."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if match:
+            try:
+                accepted[match.group(1).lower()] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    supported = ('br', 'gzip') if brotli is not None else ('gzip', )
+    candidates = [
+        (accepted.get(encoding, accepted.get('*', 0)), encoding) for encoding in supported
+    ]
+    quality, encoding = max(candidates, key=lambda candidate: candidate[0])
+    return encoding if quality > 0 else None
+
+
+class Compressor:
+    """Same interface for zlib and brotli compressors."""
+
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self.compress = self._compressor.process
+            self.sync = self._compressor.flush
+            self.flush = self._compressor.finish
+        else:
+            # wbits 16 + 15 writes gzip header and trailer
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._compressor.compress
+            self.sync = partial(self._compressor.flush, zlib.Z_SYNC_FLUSH)
+            self.flush = self._compressor.flush
+
+
+def compress_stream(compressor: Compressor, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # every chunk is flushed, so clients get data as soon as the view yields it
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.sync()
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """Compress text responses bigger than COMPRESSION_MIN_SIZE with brotli or gzip."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressor = Compressor(encoding)
+        if response.streaming:
+            response.streaming_content = compress_stream(compressor, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compressor.compress(response.content) + compressor.flush()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # compressed body is not byte for byte what strong etag promised
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compressible(self, response) -> bool:
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return False
+        # stored files are sent with sendfile and support ranges, keep them as they are
+        if getattr(response, 'file_to_stream', None) is not None:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(settings.COMPRESSION_CONTENT_TYPES)
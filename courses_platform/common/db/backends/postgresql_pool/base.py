@@ -0,0 +1,74 @@
+"""
+PostgreSQL backend that keeps connections in a per-process pool.
+
+With CONN_MAX_AGE every thread holds its own connection, which does not bound
+the number of connections of a threaded server. Here connections closed by
+Django go back to a shared pool and are reused by any thread. Pool is configured
+with `POOL` key of DATABASES entry: `MIN_SIZE`, `MAX_SIZE` and `TIMEOUT`, seconds
+to wait for free connection when all `MAX_SIZE` are taken. Use with CONN_MAX_AGE = 0.
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.utils import OperationalError
+from psycopg2 import pool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+
+    def __init__(self, conn_params: dict, min_size: int, max_size: int, timeout: float):
+        self.pool = pool.ThreadedConnectionPool(min_size, max_size, **conn_params)
+        # ThreadedConnectionPool raises when exhausted, semaphore makes callers wait instead
+        self.available = threading.BoundedSemaphore(max_size)
+        self.timeout = timeout
+
+    def get(self):
+        if not self.available.acquire(timeout=self.timeout):
+            raise OperationalError(f'No free database connection in {self.timeout} seconds.')
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self.available.release()
+            raise
+
+    def put(self, connection, close: bool = False):
+        try:
+            self.pool.putconn(connection, close=close or connection.closed)
+        finally:
+            self.available.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self, conn_params: dict) -> ConnectionPool:
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[self.alias] = ConnectionPool(
+                    conn_params,
+                    min_size=int(options.get('MIN_SIZE', 1)),
+                    max_size=int(options.get('MAX_SIZE', 10)),
+                    timeout=float(options.get('TIMEOUT', 10)),
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).get()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            # pool rolls back unfinished transaction, broken connections are discarded
+            with self.wrap_database_errors:
+                _pools[self.alias].put(self.connection, close=self.errors_occurred)
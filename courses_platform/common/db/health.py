@@ -0,0 +1,26 @@
+from typing import Dict
+
+from django.db import DatabaseError, connections
+
+
+def check_databases() -> Dict[str, str]:
+    """Run trivial query on every configured database, return 'ok' or error per alias."""
+    results = {}
+    for connection in connections.all():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+        except DatabaseError as e:
+            results[connection.alias] = f'error: {e}'
+        else:
+            results[connection.alias] = 'ok'
+    return results
+
+
+def close_unusable_connections():
+    """Drop persistent connections that went away since last request, e.g. after db restart."""
+    for connection in connections.all():
+        if connection.connection is not None and connection.settings_dict['CONN_MAX_AGE'] \
+                and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,226 @@
+"""
+Per-request instrumentation.
+
+InstrumentationMiddleware counts queries and their time on every connection of
+the request thread, spots queries repeated with the same parameters, splits the
+rest of the time into view code (serializers mostly) and rendering, and reports
+it as `Server-Timing` header and one log record per request. Views declare how
+many queries they may run with `query_budget`, slow requests can be profiled.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Server-Timing entries and metrics they report
+SERVER_TIMING_METRICS = (('db', 'db_ms'), ('app', 'app_ms'), ('render', 'render_ms'),
+                         ('total', 'total_ms'))
+
+
+class QueryBudgetExceeded(Exception):
+    """View ran more queries than its budget allows."""
+
+
+def query_budget(queries):
+    """
+    Declare how many queries a view may run per request.
+
+    `queries` is a number for every method or a dict of numbers by method. Use
+    as the outermost decorator of function views, class views can set
+    `query_budget` attribute instead.
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def get_query_budget(view_func, method: str) -> Optional[int]:
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        # class based views, both django's and drf's, keep their class on the view function
+        view_class = getattr(view_func, 'view_class', getattr(view_func, 'cls', None))
+        budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        budget = budget.get(method)
+    return budget
+
+
+class QueryStats:
+    """Execute wrapper recording number, time and repetition of queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Queries that repeated an earlier query with the same parameters."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def most_repeated(self):
+        """SQL run most times with any parameters and how many times, the usual N+1 suspect."""
+        by_sql = Counter()
+        for (sql, _), count in self.statements.items():
+            by_sql[sql] += count
+        return by_sql.most_common(1)[0] if by_sql else (None, 0)
+
+
+class SamplingProfiler:
+    """Sample stacks of one thread from a helper thread, in folded format of flame graph tools."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else ''
+
+
+class InstrumentationMiddleware:
+    """Measure queries, time and response size of each request, enforce query budgets."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        request._instrumentation = {'budget': None, 'view_started': None, 'view_finished': None}
+        profiler = None
+        if settings.INSTRUMENTATION_PROFILE_SLOW_MS is not None:
+            profiler = SamplingProfiler(
+                threading.get_ident(), settings.INSTRUMENTATION_PROFILE_INTERVAL
+            )
+            profiler.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                # queries of content loading threads run on their own connections,
+                # they are not counted
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.stop()
+        finished = time.perf_counter()
+
+        metrics = self.collect(request, response, stats, started, finished)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={metrics[key]:.1f}'
+                for name, key in SERVER_TIMING_METRICS
+                if metrics[key] is not None
+            )
+        logger.info(json.dumps(metrics), extra={'metrics': metrics})
+        if profiler and metrics['total_ms'] >= settings.INSTRUMENTATION_PROFILE_SLOW_MS:
+            self.dump_profile(profiler, metrics)
+        self.check_budget(request, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_instrumentation'):
+            request._instrumentation['budget'] = get_query_budget(view_func, request.method)
+            request._instrumentation['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # called between the view and rendering of drf responses
+        if hasattr(request, '_instrumentation'):
+            request._instrumentation['view_finished'] = time.perf_counter()
+        return response
+
+    def collect(self, request, response, stats, started, finished) -> dict:
+        state = request._instrumentation
+        view_started = state['view_started'] or started
+        view_finished = state['view_finished'] or finished
+        sql, repeated = stats.most_repeated()
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name(request),
+            'status': response.status_code,
+            'queries': stats.count,
+            'duplicate_queries': stats.duplicates,
+            'most_repeated_query': sql if repeated > 1 else None,
+            'most_repeated_count': repeated,
+            'db_ms': stats.time * 1000,
+            # time in view code besides queries, mostly spent by serializers
+            'app_ms': max(view_finished - view_started - stats.time, 0) * 1000,
+            'render_ms': (finished - view_finished) * 1000 if state['view_finished'] else None,
+            'total_ms': (finished - started) * 1000,
+            'response_bytes': None if response.streaming else len(response.content),
+            'query_budget': state['budget'],
+        }
+
+    def dump_profile(self, profiler, metrics):
+        os.makedirs(settings.INSTRUMENTATION_PROFILE_DIR, exist_ok=True)
+        view = metrics['view'].replace(':', '-') or 'unresolved'
+        name = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{view}.folded"
+        path = os.path.join(settings.INSTRUMENTATION_PROFILE_DIR, name)
+        profiler.dump(path)
+        logger.warning('Slow request %s %s took %.0f ms, profile written to %s',
+                       metrics['method'], metrics['path'], metrics['total_ms'], path)
+
+    def check_budget(self, request, metrics):
+        budget = metrics['query_budget']
+        if budget is None or metrics['queries'] <= budget:
+            return
+        message = (f"{metrics['view']} ran {metrics['queries']} queries, its budget is {budget} "
+                   f"({metrics['duplicate_queries']} duplicates, most repeated "
+                   f"{metrics['most_repeated_count']} times: {metrics['most_repeated_query']})")
+        logger.warning(message)
+        if settings.INSTRUMENTATION_QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
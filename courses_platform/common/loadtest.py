@@ -0,0 +1,86 @@
+"""Simple HTTP load generator for comparing server configurations."""
+import http.client
+import statistics
+import threading
+import time
+from typing import Dict, List, Sequence
+from urllib.parse import urlsplit
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_load(base_url: str, paths: Sequence[str], concurrency: int, duration: float,
+             headers: Dict[str, str] = None) -> dict:
+    """
+    Request `paths` round-robin from `concurrency` threads for `duration` seconds.
+
+    Each thread keeps one keep-alive connection, so numbers reflect the server
+    rather than connection setup of the client. Returns throughput and latency
+    percentiles in milliseconds, overall and per path.
+    """
+    base = urlsplit(base_url)
+    if base.scheme == 'https':
+        connection_class = http.client.HTTPSConnection
+    else:
+        connection_class = http.client.HTTPConnection
+    prefix = base.path.rstrip('/') + '/'
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        connection = connection_class(base.netloc, timeout=30)
+        index = offset
+        while time.monotonic() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                connection.request('GET', prefix + path.lstrip('/'), headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = connection_class(base.netloc, timeout=30)
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if ok:
+                    latencies[path].append(elapsed)
+                else:
+                    errors[path] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, )) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    def summary(values, error_count):
+        return {
+            'requests': len(values),
+            'errors': error_count,
+            'rps': round(len(values) / elapsed, 1),
+            'mean_ms': round(statistics.mean(values), 2) if values else 0.0,
+            'p50_ms': round(percentile(values, 0.50), 2),
+            'p95_ms': round(percentile(values, 0.95), 2),
+            'p99_ms': round(percentile(values, 0.99), 2),
+        }
+
+    every = [value for values in latencies.values() for value in values]
+    return {
+        'concurrency': concurrency,
+        'duration': round(elapsed, 2),
+        'total': summary(every, sum(errors.values())),
+        'paths': {path: summary(latencies[path], errors[path]) for path in paths},
+    }
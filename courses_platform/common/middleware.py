@@ -0,0 +1,65 @@
+from django.conf import settings
+
+from rest_framework.permissions import SAFE_METHODS
+
+from .db.health import close_unusable_connections
+from .routers import disable_replica_reads, enable_replica_reads, wrote_to_primary
+
+PRIMARY_PIN_COOKIE = 'db_primary'
+
+
+def read_only_view(view):
+    """Mark view that only reads even though it takes unsafe method, so it may use replicas."""
+    view.read_only = True
+    return view
+
+
+class DatabaseHealthCheckMiddleware:
+    """Check persistent connections before each request so a dead one fails no queries."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if settings.DATABASE_HEALTH_CHECKS:
+            close_unusable_connections()
+        return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serve safe requests to DATABASE_REPLICA_VIEWS from read replicas.
+
+    After client writes anything it gets a short-lived cookie and its reads go to
+    the primary until it expires, so replication lag never hides client's own changes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        request.read_only_view = False
+        try:
+            response = self.get_response(request)
+            writing = request.method not in SAFE_METHODS and not request.read_only_view
+            if writing or wrote_to_primary():
+                response.set_cookie(
+                    PRIMARY_PIN_COOKIE, '1',
+                    max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                    httponly=True,
+                )
+        finally:
+            if request.replica_token is not None:
+                disable_replica_reads(request.replica_token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.read_only_view = getattr(view_func, 'read_only', False)
+        if (
+            settings.DATABASE_REPLICAS
+            and (request.method in SAFE_METHODS or request.read_only_view)
+            and PRIMARY_PIN_COOKIE not in request.COOKIES
+            and (view_func.__module__ in settings.DATABASE_REPLICA_VIEWS or request.read_only_view)
+        ):
+            request.replica_token = enable_replica_reads()
@@ -1,6 +1,17 @@
 from courses.models import ContentBase, Item, Module
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
+from .request_cache import cached
+
+
+def is_course_member(request, course, relation: str) -> bool:
+    """Whether user is in `relation` (students or teachers) of course, asked once per request."""
+    return cached(
+        request,
+        ('course_member', relation, course.pk, request.user.pk),
+        lambda: getattr(course, relation).filter(pk=request.user.pk).exists(),
+    )
+
 
 class IsOwnerOrSuperuserOrReadOnly(BasePermission):
 
@@ -47,19 +58,20 @@ class IsStudentOrTeacherReadOnlyOrAdminOrSU(IsOwnerOrSuperuser):
 
     def has_permission(self, request, view):
         obj = view.get_object()
-        is_student = False
-        is_teacher = False
-        if issubclass(obj.__class__, ContentBase):
-            is_student = obj.item.module.course.students.filter(pk=request.user.pk).exists()
-            is_teacher = obj.item.module.course.teachers.filter(pk=request.user.pk).exists()
-        elif isinstance(obj, Module):
-            is_student = obj.course.students.filter(pk=request.user.pk).exists()
-            is_teacher = obj.course.teachers.filter(pk=request.user.pk).exists()
-        elif isinstance(obj, Item):
-            is_student = obj.module.course.students.filter(pk=request.user.pk).exists()
-            is_teacher = obj.module.course.teachers.filter(pk=request.user.pk).exists()
 
         if request.method in SAFE_METHODS:
-            return is_student or is_teacher or request.user.is_staff
+            course = None
+            if issubclass(obj.__class__, ContentBase):
+                course = obj.item.module.course
+            elif isinstance(obj, Module):
+                course = obj.course
+            elif isinstance(obj, Item):
+                course = obj.module.course
+            return bool(
+                request.user.is_staff
+                or course is not None
+                and (is_course_member(request, course, 'students')
+                     or is_course_member(request, course, 'teachers'))
+            )
         else:
             return super().has_permission(request, view)
@@ -0,0 +1,51 @@
+"""
+Renderers faster than drf defaults.
+
+orjson and msgpack are optional, without orjson JSON falls back to drf's
+encoder and MessagePack is only offered when msgpack is installed.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# drf encoder knows lazy strings, decimals, querysets and other types orjson and msgpack don't
+_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Render JSON with orjson, same output as drf JSONRenderer with default settings."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # datetimes go through drf encoder to keep its format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        # orjson only indents by two spaces, good enough for people reading it
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_encoder.default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary alternative to JSON for clients sending `Accept: application/msgpack`."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encoder.default, use_bin_type=True, datetime=False)
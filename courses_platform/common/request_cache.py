@@ -0,0 +1,25 @@
+"""
+Memoization for the lifetime of one request.
+
+Permission checks and views ask for the same objects and memberships several
+times per request. Values are kept on django's request object, which the batch
+endpoint hands to all of its sub-requests, so they share the cache as well.
+"""
+from typing import Callable, Hashable
+
+
+def request_cache(request) -> dict:
+    # drf Request wraps django's one, cache lives on the latter
+    request = getattr(request, '_request', request)
+    cache = getattr(request, 'request_cache', None)
+    if cache is None:
+        cache = request.request_cache = {}
+    return cache
+
+
+def cached(request, key: Hashable, compute: Callable):
+    """Value of `compute()`, computed once per request for `key`."""
+    cache = request_cache(request)
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
@@ -0,0 +1,96 @@
+"""
+Routing of read queries to database replicas.
+
+Replica aliases are listed in DATABASE_REPLICAS. Reads go to a replica only
+inside `replica_reads` context, which ReplicaRoutingMiddleware enters for safe
+requests to views of DATABASE_REPLICA_VIEWS. Everything else, and every query
+after the first write in the same context, uses the primary, so background
+tasks and request handlers that write always see their own changes.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# routing state of current request, None when replicas must not be used
+_state: ContextVar[Optional[dict]] = ContextVar('replica_routing', default=None)
+# replicas that failed to connect, by alias, with monotonic time of next attempt
+_unavailable: Dict[str, float] = {}
+
+
+def enable_replica_reads() -> Token:
+    """Let reads of current context go to a replica, reset returned token to stop."""
+    return _state.set({'alias': None, 'written': False})
+
+
+def disable_replica_reads(token: Token):
+    _state.reset(token)
+
+
+def wrote_to_primary() -> bool:
+    """Whether current context has written anything, its client then sticks to primary a while."""
+    state = _state.get()
+    return bool(state and state['written'])
+
+
+def replica_available(alias: str) -> bool:
+    """Connect to replica unless it failed recently, remembering failures for a while."""
+    if _unavailable.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning('Replica %s is unavailable, reading from primary', alias, exc_info=True)
+        _unavailable[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+        return False
+    _unavailable.pop(alias, None)
+    return True
+
+
+def choose_replica() -> str:
+    aliases = list(settings.DATABASE_REPLICAS)
+    random.shuffle(aliases)
+    return next((alias for alias in aliases if replica_available(alias)), DEFAULT_DB_ALIAS)
+
+
+class ReplicaRouter:
+    """Send reads of replica-enabled contexts to a replica, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state['written'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # one replica per request, so its reads see a consistent snapshot
+        if state['alias'] is None:
+            state['alias'] = choose_replica()
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state['written'] = True
+        # objects of other databases stay there, e.g. while one is being migrated
+        instance = hints.get('instance')
+        db = getattr(getattr(instance, '_state', None), 'db', None)
+        if db is not None and db not in settings.DATABASE_REPLICAS:
+            return db
+        # explicit, otherwise objects read from replica would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get schema changes by replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
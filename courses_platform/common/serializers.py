@@ -1,6 +1,11 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
 from django.db import models
 
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
 
 
 class ListSerializerWithoutNulls(serializers.ListSerializer):
@@ -15,3 +20,86 @@ class ListSerializerWithoutNulls(serializers.ListSerializer):
                 ret.append(self.child.to_representation(item))
 
         return ret
+
+
+def parse_field_paths(value: Optional[str]) -> Optional[dict]:
+    """Turn `title,items.url,items.order` into {'title': {}, 'items': {'url': {}, 'order': {}}}."""
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer leaving out fields not asked for with `fields` and nested ones not asked
+    for with `expand`.
+
+    Views put parsed query parameters into context under `fields` and `expand`,
+    see `common.views.SparseFieldsetsMixin`. `fields` lists the only fields to
+    keep, dotted names select fields of nested serializers. `expand` lists nested
+    serializers to embed, the rest of `collapsed_fields` are shown by their
+    collapsed version (usually links) instead. Without the parameters the output
+    is complete. Fields are chosen before serialization, so views can also use
+    `includes` and `expands` to skip fetching what won't be shown.
+    """
+
+    # name of nested field -> factory of field shown when it isn't expanded
+    collapsed_fields: Dict[str, Callable[[], serializers.Field]] = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, expanded = self.field_selection()
+        if selected is not None:
+            unknown = set(selected) - set(fields)
+            if unknown:
+                raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}.'})
+            fields = OrderedDict(
+                (name, field) for name, field in fields.items() if name in selected
+            )
+        for name, field in fields.items():
+            if expanded is not None and name in self.collapsed_fields and name not in expanded:
+                fields[name] = self.collapsed_fields[name]()
+                continue
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, DynamicFieldsMixin):
+                nested.selection = (
+                    selected.get(name) or None if selected is not None else None,
+                    expanded.get(name, {}) if expanded is not None else None,
+                )
+        return fields
+
+    def field_selection(self) -> Tuple[Optional[dict], Optional[dict]]:
+        if hasattr(self, 'selection'):
+            return self.selection
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        request = self.context.get('request')
+        # parameters belong to the top serializer of a view and only shape output of reads
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return None, None
+        return self.context.get('fields'), self.context.get('expand')
+
+    def field_at(self, path: str):
+        field = self
+        for name in path.split('.'):
+            fields = getattr(getattr(field, 'child', field), 'fields', None)
+            if fields is None or name not in fields:
+                return None
+            field = fields[name]
+        return field
+
+    def includes(self, path: str) -> bool:
+        """Whether dotted field path will be in the output."""
+        return self.field_at(path) is not None
+
+    def expands(self, path: str) -> bool:
+        """Whether dotted field path will be output as nested serializer rather than collapsed."""
+        field = self.field_at(path)
+        return isinstance(getattr(field, 'child', field), serializers.BaseSerializer)
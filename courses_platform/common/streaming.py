@@ -0,0 +1,89 @@
+"""
+Streaming of big lists.
+
+List views render rows one by one while the response is being sent, reading
+the queryset with `iterator()`, so memory use doesn't grow with the number of
+rows and the first bytes go out right after the first row is serialized.
+"""
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .renderers import FastJSONRenderer
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """Lets clients ask for streams with Accept header, other responses are one JSON line."""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        body = super().render(data, None, renderer_context)
+        return body + b'\n' if body else body
+
+
+def stream_rows(rows: Iterable[Optional[dict]], ndjson: bool) -> Iterator[bytes]:
+    """Encode rows as JSON array or one JSON document per line, skipping None rows."""
+    render = FastJSONRenderer().render
+    buffer = bytearray() if ndjson else bytearray(b'[')
+    first = True
+    for row in rows:
+        if row is None:
+            continue
+        if not ndjson and not first:
+            buffer += b','
+        buffer += render(row)
+        if ndjson:
+            buffer += b'\n'
+        # send first row right away, then in blocks
+        if first or len(buffer) >= settings.STREAMING_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+        first = False
+    if not ndjson:
+        buffer += b']'
+    if buffer:
+        yield bytes(buffer)
+
+
+class StreamingListMixin:
+    """
+    List view streaming its rows with `?stream=json` or `?stream=ndjson`.
+
+    NDJSON is also chosen by `Accept: application/x-ndjson`. Pagination is not
+    applied to streams, and prefetch_related is ignored by `iterator()`, so
+    serializers of streamed views should not need related objects. Views limit
+    who may stream with `check_stream_permission`.
+    """
+
+    def get_renderers(self):
+        return super().get_renderers() + [NDJSONRenderer()]
+
+    def stream_format(self) -> Optional[str]:
+        stream = self.request.query_params.get('stream')
+        if stream is None and self.request.accepted_renderer.format == NDJSONRenderer.format:
+            stream = 'ndjson'
+        return stream if stream in ('json', 'ndjson') else None
+
+    def check_stream_permission(self, request):
+        """Raise PermissionDenied if user may not read the whole list at once."""
+
+    def list(self, request, *args, **kwargs):
+        stream = self.stream_format()
+        if stream is None:
+            return super().list(request, *args, **kwargs)
+        self.check_stream_permission(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        # rows are read after the view returns, pick the database while routing still applies
+        queryset = queryset.using(queryset.db)
+        # one serializer for all rows, its fields are built once
+        serializer = self.get_serializer()
+        rows = (serializer.to_representation(obj)
+                for obj in queryset.iterator(chunk_size=settings.STREAMING_CHUNK_SIZE))
+        ndjson = stream == 'ndjson'
+        return StreamingHttpResponse(
+            stream_rows(rows, ndjson),
+            content_type=NDJSONRenderer.media_type if ndjson else 'application/json',
+        )
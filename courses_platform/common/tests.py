@@ -0,0 +1,307 @@
+import asyncio
+import gzip
+import unittest
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+
+from courses.models import Course
+from courses.views import CourseDetailView
+
+from .instrumentation import (InstrumentationMiddleware, QueryBudgetExceeded, get_query_budget,
+                              query_budget)
+
+from .asgi import ClosingWsgiToAsgi
+from .batch import NOT_BATCHABLE
+from .compression import CompressionMiddleware, brotli, choose_encoding
+from .middleware import PRIMARY_PIN_COOKIE
+from .renderers import msgpack
+from .routers import ReplicaRouter, disable_replica_reads, enable_replica_reads
+from .throttling import take_token
+
+
+class TakeTokenTests(SimpleTestCase):
+
+    def test_burst_then_rate(self):
+        full_at, now = 100.0, 100.0
+        for _ in range(3):
+            full_at, wait = take_token(full_at, now, rate=1, burst=3)
+            self.assertEqual(wait, 0)
+        full_at, wait = take_token(full_at, now, rate=1, burst=3)
+        self.assertEqual(wait, 1)
+        full_at, wait = take_token(full_at, now + 1, rate=1, burst=3)
+        self.assertEqual(wait, 0)
+
+    def test_refused_request_takes_no_token(self):
+        full_at, wait = take_token(110.0, 100.0, rate=1, burst=10)
+        self.assertEqual((full_at, wait), (110.0, 1))
+
+    def test_idle_bucket_is_full(self):
+        full_at, wait = take_token(50.0, 100.0, rate=2, burst=2)
+        self.assertEqual((full_at, wait), (100.5, 0))
+
+
+class ClosingWsgiToAsgiTests(SimpleTestCase):
+
+    def test_response_is_closed(self):
+        response = mock.MagicMock()
+        response.__iter__.return_value = [b'body']
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [])
+            return response
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': '/',
+            'query_string': b'', 'headers': [],
+        }
+        asyncio.run(ClosingWsgiToAsgi(wsgi_application)(scope, receive, send))
+        response.close.assert_called_once_with()
+        self.assertEqual([message.get('body') for message in sent], [None, b'body', None])
+
+
+class QueryBudgetTests(TestCase):
+
+    def run_view(self, view, queries):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            for _ in range(queries):
+                get_user_model().objects.exists()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        with self.assertLogs('common.instrumentation', 'INFO') as logs:
+            middleware(RequestFactory().get('/'))
+        return logs
+
+    def test_view_within_budget(self):
+        logs = self.run_view(query_budget(2)(lambda request: None), queries=2)
+        self.assertIn('"queries": 2', logs.output[0])
+
+    def test_view_over_budget_fails(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.run_view(query_budget(2)(lambda request: None), queries=3)
+
+    def test_budget_by_method_of_class_view(self):
+        view = CourseDetailView.as_view()
+        self.assertEqual(get_query_budget(view, 'GET'), 6)
+        self.assertIsNone(get_query_budget(view, 'PATCH'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def create_course(self, using, title):
+        owner = get_user_model().objects.db_manager(using).create_user(pk=1, username='owner')
+        return Course.objects.using(using).create(
+            pk=1, owner=owner, title=title, slug='course', overview='', open_date='2020-01-01',
+            visible=True,
+        )
+
+    def test_reads_go_to_replica_until_first_write(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Course), 'default')
+        token = enable_replica_reads()
+        try:
+            self.assertEqual(router.db_for_read(Course), 'replica')
+            self.assertEqual(router.db_for_write(Course), 'default')
+            self.assertEqual(router.db_for_read(Course), 'default')
+        finally:
+            disable_replica_reads(token)
+
+    def test_replica_is_not_migrated(self):
+        self.assertFalse(ReplicaRouter().allow_migrate('replica', 'courses'))
+
+    def test_client_is_pinned_to_primary_after_writing(self):
+        self.create_course('default', 'Primary')
+        self.create_course('replica', 'Replica')
+        url = '/api/v0.1/courses/1/'
+        self.assertEqual(self.client.get(url).json()['title'], 'Replica')
+        # anonymous POST is refused, but it's a write as far as routing is concerned
+        response = self.client.post('/api/v0.1/courses/', {})
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.client.get(url).json()['title'], 'Primary')
+        del self.client.cookies[PRIMARY_PIN_COOKIE]
+        self.assertEqual(self.client.get(url).json()['title'], 'Replica')
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.create_course('default', 'Primary')
+        replica = connections['replica']
+        with mock.patch.object(replica, 'ensure_connection', side_effect=DatabaseError), \
+                mock.patch.dict('common.routers._unavailable', clear=True), \
+                self.assertLogs('common.routers'):
+            self.assertEqual(self.client.get('/api/v0.1/courses/1/').json()['title'], 'Primary')
+
+
+class BatchTests(TestCase):
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user(username='owner')
+        self.course = Course.objects.create(
+            owner=self.owner, title='Visible', slug='visible', overview='Overview',
+            open_date='2020-01-01', visible=True,
+        )
+        self.hidden = Course.objects.create(
+            owner=self.owner, title='Hidden', slug='hidden', overview='Overview',
+            open_date='2020-01-01', visible=False,
+        )
+
+    def batch(self, *paths):
+        return self.client.post(
+            '/api/v0.1/batch/', {'requests': [{'path': path} for path in paths]},
+            content_type='application/json',
+        )
+
+    def test_responses_in_request_order(self):
+        response = self.batch(
+            f'courses/{self.course.pk}/?fields=title',
+            f'/api/v0.1/courses/{self.course.pk}/?fields=title,overview',
+            'courses/999999/',
+            'no-such-url/',
+            '/admin/',
+            'accounts/profile/',
+        )
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([sub['status'] for sub in responses], [200, 200, 404, 404, 400, 400])
+        self.assertEqual(responses[0]['path'], f'courses/{self.course.pk}/?fields=title')
+        self.assertEqual(responses[0]['body'], {'title': 'Visible'})
+        self.assertEqual(responses[1]['body'], {'title': 'Visible', 'overview': 'Overview'})
+        self.assertEqual(responses[4]['body'], {'detail': NOT_BATCHABLE})
+
+    def test_sub_requests_are_made_as_batch_user(self):
+        path = f'courses/{self.hidden.pk}/?fields=title'
+        self.assertEqual(self.batch(path).json()['responses'][0]['status'], 404)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.batch(path).json()['responses'][0]['body'], {'title': 'Hidden'})
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_number_of_requests_is_limited(self):
+        self.assertEqual(self.batch('courses/', 'courses/').status_code, 200)
+        response = self.batch('courses/', 'courses/', 'courses/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('requests', response.json())
+
+    def test_malformed_batch(self):
+        for data in ({}, {'requests': 'courses/'}, {'requests': [{'url': 'courses/'}]}):
+            response = self.client.post('/api/v0.1/batch/', data, content_type='application/json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(self.client.get('/api/v0.1/batch/').status_code, 405)
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class MessagePackTests(TestCase):
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user(username='owner')
+        Course.objects.create(
+            owner=self.owner, title='Visible', slug='visible', overview='Overview',
+            open_date='2020-01-01', visible=True,
+        )
+
+    def test_same_data_as_json(self):
+        response = self.client.get('/api/v0.1/courses/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content, raw=False),
+                         self.client.get('/api/v0.1/courses/').json())
+
+    def test_msgpack_request_body(self):
+        self.client.force_login(self.owner)
+        response = self.client.post(
+            '/api/v0.1/courses/',
+            msgpack.packb({'title': 'Packed', 'overview': 'Overview', 'open_date': '2020-01-01'}),
+            content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content, raw=False)['title'], 'Packed')
+        response = self.client.post(
+            '/api/v0.1/courses/', b'\xc1', content_type='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(COMPRESSION_MIN_SIZE=100)
+    def test_msgpack_response_is_compressed(self):
+        Course.objects.bulk_create([
+            Course(owner=self.owner, title=f'Course {i}', slug=f'course-{i}', overview='Overview',
+                   open_date='2020-01-01', visible=True)
+            for i in range(10)
+        ])
+        response = self.client.get(
+            '/api/v0.1/courses/', HTTP_ACCEPT='application/msgpack', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept, Cookie, Accept-Encoding')
+        self.assertEqual(len(msgpack.unpackb(gzip.decompress(response.content), raw=False)), 11)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionTests(SimpleTestCase):
+
+    body = b'{"title": "Course"}' * 20
+
+    def compress(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0, identity'), None)
+        self.assertEqual(choose_encoding(''), None)
+        self.assertEqual(choose_encoding('*'), 'br' if brotli is not None else 'gzip')
+
+    def test_gzip(self):
+        response = self.compress(HttpResponse(self.body, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = self.compress(
+            HttpResponse(self.body, content_type='application/json'), 'gzip, br'
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_small_and_other_responses_are_left_alone(self):
+        response = self.compress(HttpResponse(b'{}', content_type='application/json'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        # the same url may be compressed when it gets bigger
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        response = self.compress(HttpResponse(self.body, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+        response = self.compress(HttpResponse(self.body, content_type='application/json'), '')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+
+    def test_streaming_response_is_compressed_by_chunks(self):
+        chunks = [b'{"title": "Course"}\n'] * 3
+        response = self.compress(StreamingHttpResponse(
+            iter(chunks), content_type='application/x-ndjson'
+        ))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        compressed = list(response.streaming_content)
+        self.assertEqual(len(compressed), len(chunks) + 1)
+        self.assertEqual(gzip.decompress(b''.join(compressed)), b''.join(chunks))
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.compress(response)['ETag'], 'W/"abc"')
@@ -0,0 +1,141 @@
+"""
+Token bucket throttles per view group.
+
+Every view belongs to a group of THROTTLE_BUCKETS (catalog reads, content reads,
+writes, enroll, auth) and every user, or IP address of anonymous client, has a
+bucket per group holding `burst` requests refilled at `rate` per second. Buckets
+are kept as one number, the time they will be full again (GCRA), so taking a
+token is a single read and write. The local backend keeps them in process
+memory, the cache backend in the shared cache so all workers see the same buckets.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+def throttle_group(group):
+    """
+    Put a view into throttle group, a name for every method or a dict of names by method.
+
+    Use as the outermost decorator of function views, class views can set
+    `throttle_group` attribute instead. Without it unsafe methods are 'write' and
+    the others 'catalog', unless THROTTLE_NAMESPACE_GROUPS names url namespace.
+    """
+    def decorator(view):
+        view.throttle_group = group
+        return view
+    return decorator
+
+
+def get_throttle_group(request, view) -> str:
+    view_func = getattr(request.resolver_match, 'func', None)
+    group = getattr(view_func, 'throttle_group', None)
+    if group is None:
+        group = getattr(view, 'throttle_group', None)
+    if isinstance(group, dict):
+        group = group.get(request.method)
+    if group is None and request.resolver_match is not None:
+        group = settings.THROTTLE_NAMESPACE_GROUPS.get(request.resolver_match.namespace)
+    if group is None:
+        group = 'catalog' if request.method in SAFE_METHODS else 'write'
+    return group
+
+
+def take_token(full_at: float, now: float, rate: float, burst: int) -> Tuple[float, float]:
+    """New time bucket is full again and 0, or the old one and seconds until there's a token."""
+    interval = 1 / rate
+    taken = max(full_at, now) + interval
+    wait = taken - now - burst * interval
+    if wait > 0:
+        return full_at, wait
+    return taken, 0
+
+
+class LocalBuckets:
+    """Buckets of this process, locked in stripes and evicted least recently used first."""
+
+    stripes = 64
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max(max_keys // self.stripes, 1)
+        self.locks = [threading.Lock() for _ in range(self.stripes)]
+        self.buckets = [OrderedDict() for _ in range(self.stripes)]
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """Take a token, returns 0 or seconds until there is one."""
+        stripe = hash(key) % self.stripes
+        buckets = self.buckets[stripe]
+        now = time.monotonic()
+        with self.locks[stripe]:
+            full_at, wait = take_token(buckets.get(key, now), now, rate, burst)
+            buckets[key] = full_at
+            buckets.move_to_end(key)
+            if len(buckets) > self.max_keys:
+                # forgotten bucket is a full one, at worst client gets a burst more
+                buckets.popitem(last=False)
+        return wait
+
+
+class CacheBuckets:
+    """
+    Buckets in the shared cache.
+
+    Read and write are not atomic, simultaneous requests of the same client may
+    both take the last token. That keeps it lock free and limits still hold.
+    """
+
+    def __init__(self, alias: str):
+        self.cache = caches[alias]
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.time()
+        full_at, wait = take_token(self.cache.get(key, now), now, rate, burst)
+        if not wait:
+            self.cache.set(key, full_at, timeout=int(full_at - now) + 1)
+        return wait
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.THROTTLE_BACKEND == 'cache':
+                    _backend = CacheBuckets(settings.THROTTLE_CACHE)
+                else:
+                    _backend = LocalBuckets(settings.THROTTLE_LOCAL_MAX_KEYS)
+    return _backend
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle of view group of the request, 429 response carries Retry-After."""
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+        group = get_throttle_group(request, view)
+        user = request.user
+        scope = 'user' if user and user.is_authenticated else 'anon'
+        bucket = settings.THROTTLE_BUCKETS.get(group, {}).get(scope)
+        if bucket is None:
+            return True
+        rate, burst = bucket
+        ident = user.pk if scope == 'user' else self.get_ident(request)
+        self.wait_seconds = get_backend().take(f'throttle:{group}:{scope}:{ident}', rate, burst)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.http import JsonResponse
+
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .batch import dispatch
+from .db.health import check_databases
+from .middleware import read_only_view
+from .request_cache import cached
+from .serializers import parse_field_paths
+from .throttling import throttle_group
+
+
+def health(request):
+    """Liveness check for load balancers, 503 if any database is unreachable."""
+    databases = check_databases()
+    healthy = all(result == 'ok' for result in databases.values())
+    return JsonResponse(
+        {'status': 'ok' if healthy else 'error', 'databases': databases},
+        status=200 if healthy else 503,
+    )
+
+
+class SparseFieldsetsMixin:
+    """Hand `fields` and `expand` query parameters to serializers using `DynamicFieldsMixin`."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = parse_field_paths(self.request.query_params.get('fields'))
+        context['expand'] = parse_field_paths(self.request.query_params.get('expand'))
+        return context
+
+
+class CachedObjectMixin:
+    """Fetch the object of a view once per request, permission checks ask for it as well."""
+
+    def get_object(self):
+        request = self.request._request
+        key = ('view_object', type(self), request.get_full_path())
+        return cached(request, key, super().get_object)
+
+
+@throttle_group('catalog')
+@read_only_view
+@api_view(http_method_names=['POST'])
+def batch(request):
+    """Run GET requests listed in `requests` and return their responses in the same order."""
+    requests = request.data.get('requests') if isinstance(request.data, dict) else None
+    if not isinstance(requests, list) or not all(
+        isinstance(sub, dict) and isinstance(sub.get('path'), str) for sub in requests
+    ):
+        raise ValidationError({'requests': 'Give a list of objects with `path` of each request.'})
+    if len(requests) > settings.BATCH_MAX_REQUESTS:
+        raise ValidationError(
+            {'requests': f'At most {settings.BATCH_MAX_REQUESTS} requests at once.'}
+        )
+    # paths may be relative to api root the batch url is in
+    api_root = request.path.rsplit('batch/', 1)[0]
+    return Response({
+        'responses': [dispatch(request._request, sub['path'], api_root) for sub in requests]
+    })
@@ -0,0 +1,40 @@
+"""
+ASGI config for config project.
+
+Django 2.2 handles requests synchronously, so the WSGI application is wrapped
+and every request runs in a thread of the adapter's pool, which also closes the
+response as WSGI servers do, while the ASGI server deals with slow clients and
+keep-alive connections on its event loop. Course event streams are served by a
+native ASGI application instead, so they don't hold threads. Run with e.g.
+`uvicorn config.asgi:application`.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+from common.asgi import ClosingWsgiToAsgi
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+django_application = ClosingWsgiToAsgi(get_wsgi_application())
+
+from courses.sse import EVENTS_PATH, course_events  # noqa: E402 needs configured Django
+
+
+def strip_header_values(send):
+    """Django 2.2 writes Set-Cookie values with leading space, which strict HTTP servers reject."""
+    async def wrapped(message):
+        if message['type'] == 'http.response.start':
+            headers = [(name, value.strip()) for name, value in message['headers']]
+            message = {**message, 'headers': headers}
+        await send(message)
+    return wrapped
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        match = EVENTS_PATH.match(scope['path'])
+        if match:
+            return await course_events(scope, receive, send, int(match.group('pk')))
+    return await django_application(scope, receive, strip_header_values(send))
@@ -0,0 +1,20 @@
+"""
+Settings profile is chosen with DJANGO_PROFILE environment variable:
+`dev`, `test` or `prod`. It's `dev` by default and `test` for `manage.py test`.
+Each profile starts from `base`.
+"""
+import importlib
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('dev', 'test', 'prod')
+PROFILE = os.environ.get('DJANGO_PROFILE', 'dev')
+
+if PROFILE not in PROFILES:
+    raise ImproperlyConfigured(
+        f'DJANGO_PROFILE must be one of {", ".join(PROFILES)}, got {PROFILE!r}.'
+    )
+
+_profile = importlib.import_module(f'{__name__}.{PROFILE}')
+globals().update({name: value for name, value in vars(_profile).items() if name.isupper()})
@@ -0,0 +1,6 @@
+from .base import *  # noqa: F401,F403
+from .base import env_bool
+
+DEBUG = env_bool('DJANGO_DEBUG', True)
+
+INSTRUMENTATION_SERVER_TIMING = env_bool('INSTRUMENTATION_SERVER_TIMING', DEBUG)
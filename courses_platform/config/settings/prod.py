@@ -0,0 +1,30 @@
+import os
+
+from config.env import env_required
+
+from .base import *  # noqa: F401,F403
+from .base import CACHES, DATABASES, env_bool, env_int, env_list
+
+DEBUG = False
+
+SECRET_KEY = env_required('DJANGO_SECRET_KEY')
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS') or [env_required('DJANGO_ALLOWED_HOSTS')]
+
+# no SQLite fallback in production
+env_required('DATABASE_URL')
+DATABASE_CONN_MAX_AGE = env_int('DATABASE_CONN_MAX_AGE', 60)
+for database in DATABASES.values():
+    # pooled connections go back to the pool when closed instead of being kept by thread
+    pooled = database['ENGINE'] == 'common.db.backends.postgresql_pool'
+    database['CONN_MAX_AGE'] = 0 if pooled else DATABASE_CONN_MAX_AGE
+DATABASE_HEALTH_CHECKS = env_bool('DATABASE_HEALTH_CHECKS', True)
+
+# workers must share the cache, a table made by `createcachetable` unless configured
+if 'CACHE_BACKEND' not in os.environ:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+
+SESSION_COOKIE_SECURE = env_bool('DJANGO_SECURE_COOKIES', True)
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
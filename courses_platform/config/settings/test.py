@@ -0,0 +1,21 @@
+from .base import *  # noqa: F401,F403
+from .base import DATABASES
+
+DEBUG = False
+
+# hashing with default iterations takes most of the time of tests that log in
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+TASKS_ALWAYS_EAGER = True
+TASKS_EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# views going over their query budget fail the test
+INSTRUMENTATION_QUERY_BUDGET_RAISE = True
+
+# tests make requests faster than any client should
+THROTTLE_ENABLED = False
+
+# second database for replica routing tests, migrated like the primary and
+# used as replica only where tests add it to DATABASE_REPLICAS
+DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+DATABASE_REPLICAS = []
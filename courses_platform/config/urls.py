@@ -17,14 +17,18 @@ from django.contrib import admin
 from django.urls import path, include, reverse_lazy
 from django.views.generic import RedirectView
 
+from common.views import batch, health
+
 api_urlpatterns = [
     path('', include('courses.urls', namespace='courses')),
     path('accounts/', include('rest_registration.api.urls')),
     path('user/', include('user.urls')),
+    path('batch/', batch, name='batch'),
 ]
 
 urlpatterns = [
     path('', RedirectView.as_view(url=reverse_lazy('courses:course_list'))),
     path('admin/', admin.site.urls),
+    path('health/', health, name='health'),
     path('api/v0.1/', include(api_urlpatterns)),
 ]
@@ -1,7 +1,19 @@
+import calendar
+from datetime import datetime
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+
+from common.paginator import EstimatedCountPaginator
 
+from .contents import content_models
 from .models import (ChoicesAssignment, Course, File, Image, Item, Module,
                      MultipleChoicesAssignment, StringAssignment, Subject, Text, Video)
+from .search import get_search_backend
 
 
 @admin.register(Subject)
@@ -13,61 +25,197 @@ class SubjectAdmin(admin.ModelAdmin):
 class ModuleInline(admin.StackedInline):
     """Inline for adding modules."""
     model = Module
+    extra = 0
+    show_change_link = True
+
+
+class RawSubquery(RawSQL):
+    """Raw SELECT for `__in` lookups, which parenthesize it themselves."""
+
+    def as_sql(self, compiler, connection):
+        # RawSQL adds parentheses too, `IN ((SELECT ...))` compares with the first row only
+        return self.sql, self.params
+
+
+class CreatedFilter(admin.SimpleListFilter):
+    """
+    Date hierarchy of course creation: years, and months of the chosen year.
+
+    Years are listed from the first and last dates of the indexed column instead of
+    scanning every row for distinct dates, and choices filter by range so they use the index.
+    """
+    title = 'created'
+    parameter_name = 'created'
+
+    def lookups(self, request, model_admin):
+        # two index lookups, sqlite can't use index for MIN and MAX in one query
+        dates = model_admin.get_queryset(request).values_list('created', flat=True)
+        first, last = dates.order_by('created').first(), dates.order_by('-created').first()
+        if first is None:
+            return []
+        first, last = timezone.localtime(first), timezone.localtime(last)
+        choices = []
+        for year in range(last.year, first.year - 1, -1):
+            choices.append((str(year), str(year)))
+            if self.value() and self.value().startswith(f'{year}'):
+                choices.extend(
+                    (f'{year}-{month:02}', f'{year} {calendar.month_name[month]}')
+                    for month in range(12, 0, -1)
+                )
+        return choices
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            year, month = (int(part) for part in (self.value() + '-0').split('-')[:2])
+            if month:
+                start = datetime(year, month, 1)
+                end = datetime(year + month // 12, month % 12 + 1, 1)
+            else:
+                start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        except ValueError:
+            raise IncorrectLookupParameters(f'Use year or year-month, not {self.value()}.')
+        return queryset.filter(
+            created__gte=timezone.make_aware(start), created__lt=timezone.make_aware(end),
+        )
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    """Course admin with module inline."""
+    """
+    Course admin with module inline.
+
+    Changelist is meant for millions of courses: pages aren't counted exactly
+    and search goes through course search index instead of LIKE over overviews.
+    """
     list_display = ['title', 'subject', 'created']
-    list_filter = ['created', 'subject']
-    search_fields = ['title', 'overview']
+    list_filter = [CreatedFilter, 'subject', 'archived']
+    list_select_related = ['subject']
+    search_fields = ['title']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     prepopulated_fields = {'slug': ('title', )}
+    autocomplete_fields = ['owner', 'teachers']
+    raw_id_fields = ['students']
     inlines = [ModuleInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        """Courses matching word prefixes of title, overview, subject or contents, or by id."""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        backend = get_search_backend(using=queryset.db)
+        sql, params = backend.matching_sql(search_term) or ('SELECT NULL', [])
+        if search_term.isdigit():
+            sql, params = f'{sql} UNION SELECT %s', [*params, int(search_term)]
+        # all matches as a subquery, so the changelist pages through them like any other list
+        return queryset.filter(pk__in=RawSubquery(sql, params)), False
+
 
-class ImageInline(admin.StackedInline):
+class ContentInline(admin.StackedInline):
+    """Inline of one content type, shown on item page only when asked for."""
+    extra = 0
+    raw_id_fields = ['owner']
+
+
+class ImageInline(ContentInline):
     model = Image
 
 
-class TextInline(admin.StackedInline):
+class TextInline(ContentInline):
     model = Text
 
 
-class FileInline(admin.StackedInline):
+class FileInline(ContentInline):
     model = File
 
 
-class VideoInline(admin.StackedInline):
+class VideoInline(ContentInline):
     model = Video
 
 
-class StringAssignmentInline(admin.StackedInline):
+class StringAssignmentInline(ContentInline):
     model = StringAssignment
 
 
-class ChoicesAssignmentInline(admin.StackedInline):
+class ChoicesAssignmentInline(ContentInline):
     model = ChoicesAssignment
 
 
-class MultipleChoicesAssignmentInline(admin.StackedInline):
+class MultipleChoicesAssignmentInline(ContentInline):
     model = MultipleChoicesAssignment
 
 
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
-    fields = ['module']
+    """
+    Item admin listing all its contents with one query.
+
+    Content inlines are loaded only for types given in `?contents=` (comma
+    separated model names or `all`), linked from the list, so the page doesn't
+    render seven formsets for every visit.
+    """
+    fields = ['module', 'contents']
+    readonly_fields = ['contents']
+    raw_id_fields = ['module']
+    list_display = ['pk', 'module', 'order']
+    list_select_related = ['module']
     inlines = [
         ImageInline, TextInline, FileInline, VideoInline,
         StringAssignmentInline, ChoicesAssignmentInline, MultipleChoicesAssignmentInline
     ]
 
-
-class ItemInline(admin.StackedInline):
+    def get_inline_instances(self, request, obj=None):
+        requested = request.GET.get('contents', '').split(',')
+        return [
+            inline for inline in super().get_inline_instances(request, obj)
+            if 'all' in requested or inline.model._meta.model_name in requested
+        ]
+
+    def contents(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
+        querysets = [
+            model.objects.filter(item=obj).values_list('content_type', 'pk', 'title', 'order')
+            for model in content_models()
+        ]
+        rows = querysets[0].union(*querysets[1:], all=True).order_by('order')
+        row = '<tr><td>{}</td><td>{}</td><td><a href="{}">{}</a></td></tr>'
+        table = format_html_join('', row, (
+            (order, content_type, reverse(f'admin:courses_{content_type}_change', args=[pk]),
+             title or pk)
+            for content_type, pk, title, order in rows
+        ))
+        links = format_html_join(' | ', '<a href="?contents={}">{}</a>', (
+            (model._meta.model_name, model._meta.verbose_name_plural) for model in content_models()
+        ))
+        return format_html(
+            '<table>{}</table><p>Edit inline: {} | <a href="?contents=all">all</a></p>',
+            table, links,
+        )
+
+
+class ItemInline(admin.TabularInline):
     fields = ['module', 'order']
     model = Item
+    extra = 0
     show_change_link = True
 
 
 @admin.register(Module)
 class ModuleAdmin(admin.ModelAdmin):
+    list_display = ['title', 'course', 'order']
+    list_select_related = ['course']
+    raw_id_fields = ['course']
     inlines = [ItemInline]
+
+
+class ContentAdmin(admin.ModelAdmin):
+    list_display = ['title', 'content_type', 'item', 'owner', 'created']
+    list_select_related = ['owner', 'item']
+    raw_id_fields = ['owner', 'item']
+
+
+for content_model in content_models():
+    admin.site.register(content_model, ContentAdmin)
@@ -0,0 +1,146 @@
+"""
+Archival of inactive courses.
+
+Archiving moves modules, items and contents of a course out of the hot tables
+into one compressed JSON document in CourseArchive. Course row itself stays as
+a stub with `archived` flag, so links, enrollments and ownership keep working.
+The flag is set before the tree is read and saves or deletes of its modules,
+items and contents are refused from then on, so none is lost between reading
+and removing the tree. Stored files are not touched and stay referenced by the
+archive. Restored objects keep their original creation and update times.
+Neither side sends model signals, so both write the change log of the tree
+themselves and tell event streams with a course-level event.
+"""
+import logging
+import zlib
+from typing import Callable, Iterable, Optional
+
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Case, Value, When
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import changes, models
+from .deletion import CONTENT_MODELS, BatchDeleter
+from .events import broker
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+RESTORE_BATCH_SIZE = 500
+
+
+class CourseArchived(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Course is archived, restore it to make changes.'
+    default_code = 'course_archived'
+
+
+def check_tree_writable(instance):
+    """Refuse changes of module, item or content of archived course."""
+    if isinstance(instance, models.Module):
+        courses = models.Course.objects.filter(pk=instance.course_id)
+    elif isinstance(instance, models.Item):
+        courses = models.Course.objects.filter(modules=instance.module_id)
+    else:
+        courses = models.Course.objects.filter(modules__items=instance.item_id)
+    if courses.filter(archived=True).exists():
+        raise CourseArchived()
+
+
+def course_tree_querysets(course_id: int) -> Iterable:
+    """Querysets of everything archived with the course, parents first."""
+    yield models.Module.objects.filter(course_id=course_id).order_by('pk')
+    yield models.Item.objects.filter(module__course_id=course_id).order_by('pk')
+    for model in CONTENT_MODELS:
+        yield model.objects.filter(item__module__course_id=course_id).order_by('pk')
+
+
+def compress_tree(course_id: int) -> bytes:
+    """Serialize course tree to zlib compressed JSON list, one queryset chunk at a time."""
+    compressor = zlib.compressobj(level=9)
+    chunks = [compressor.compress(b'[')]
+    first = True
+    for queryset in course_tree_querysets(course_id):
+        for obj in queryset.iterator(chunk_size=RESTORE_BATCH_SIZE):
+            # serialize objects one by one to keep memory flat, strip list brackets
+            data = serializers.serialize('json', [obj])[1:-1].encode()
+            chunks.append(compressor.compress(data if first else b',' + data))
+            first = False
+    chunks.append(compressor.compress(b']'))
+    chunks.append(compressor.flush())
+    return b''.join(chunks)
+
+
+def archive_course(course_id: int, progress: Optional[Callable[[str], None]] = None):
+    """Move course tree into archive and leave course row as stub."""
+    # from now on the tree doesn't change, archive written by interrupted run is complete
+    models.Course.objects.filter(pk=course_id).update(archived=True, visible=False)
+    if not models.CourseArchive.objects.filter(course_id=course_id).exists():
+        payload = compress_tree(course_id)
+        models.CourseArchive.objects.create(course_id=course_id, payload=payload, size=len(payload))
+        logger.info('Course %s archived (%s compressed bytes)', course_id, len(payload))
+    # archive holds references to stored files now, so keep them
+    BatchDeleter(course_id, progress=progress).delete_modules(release_files=False, tombstones=True)
+    get_search_backend(write=True).index_course(course_id)
+    publish_course_event(course_id, 'archived')
+
+
+def publish_course_event(course_id: int, kind: str):
+    if broker.has_subscribers(course_id):
+        broker.publish(course_id, {'type': f'course.{kind}', 'course': course_id})
+
+
+def bulk_create_keeping_times(model, objs):
+    """bulk_create sets auto_now and auto_now_add fields to current time, put original ones back."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    times = [{field.attname: getattr(obj, field.attname) for field in fields} for obj in objs]
+    model.objects.bulk_create(objs)
+    if fields:
+        model.objects.filter(pk__in=[obj.pk for obj in objs]).update(**{
+            field.attname: Case(
+                *[
+                    When(pk=obj.pk, then=Value(obj_times[field.attname]))
+                    for obj, obj_times in zip(objs, times)
+                ],
+                output_field=field,
+            )
+            for field in fields
+        })
+
+
+def restore_batch(course_id: int, model, objs):
+    bulk_create_keeping_times(model, objs)
+    changes.record_many(course_id, model._meta.model_name, [obj.pk for obj in objs], deleted=False)
+
+
+def restore_course(course_id: int):
+    """Recreate archived course tree with original primary keys and drop the archive."""
+    archive = models.CourseArchive.objects.filter(course_id=course_id).first()
+    if archive is None:
+        # archiving was interrupted before the tree was stored, it's still in place
+        models.Course.objects.filter(pk=course_id).update(archived=False)
+        return
+    data = zlib.decompress(archive.payload).decode()
+    with transaction.atomic():
+        batch, batch_model = [], None
+        # objects come grouped by model with parents first, bulk insert each group
+        for deserialized in serializers.deserialize('json', data):
+            obj = deserialized.object
+            if batch and (type(obj) is not batch_model or len(batch) >= RESTORE_BATCH_SIZE):
+                restore_batch(course_id, batch_model, batch)
+                batch = []
+            batch_model = type(obj)
+            batch.append(obj)
+        if batch:
+            restore_batch(course_id, batch_model, batch)
+        archive.delete()
+        models.Course.objects.filter(pk=course_id).update(archived=False)
+        transaction.on_commit(lambda: publish_course_event(course_id, 'restored'))
+    # rows were inserted without signals
+    get_search_backend(write=True).index_course(course_id)
+    logger.info('Course %s restored from archive', course_id)
@@ -0,0 +1,202 @@
+"""
+In-process benchmarks of course endpoints.
+
+Every url of `courses.urls` answering GET is requested through django test
+client with objects picked from the database, preferring the biggest course, so
+results include queries per request and don't depend on a running server.
+Renderers and compression are compared on the payload of a module page.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from common.compression import Compressor, brotli
+from common.loadtest import percentile
+from common.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import models, serializers, urls
+from .contents import load_contents
+
+
+def sample_arguments() -> Tuple[Dict[str, dict], Dict[str, str]]:
+    """Url kwargs and query of every benchmarked url name, and why other urls are skipped."""
+    course = (models.Course.objects.filter(deleted=False, archived=False)
+              .annotate(module_count=Count('modules')).order_by('-module_count', 'pk').first())
+    if course is None:
+        return {}, {'*': 'no courses, run seed_benchmark_data first'}
+    module = (
+        course.modules.annotate(item_count=Count('items')).order_by('-item_count', 'pk').first()
+    )
+    item = module and module.items.order_by('pk').first()
+    text = models.Text.objects.filter(item__module__course=course).order_by('pk').first()
+    stored_file = models.File.objects.filter(item__module__course=course).order_by('pk').first()
+    upload = models.Upload.objects.order_by('created').first()
+    word = course.title.split()[0]
+
+    candidates = {
+        'course_list': ({}, {}),
+        'course_facets': ({}, {}),
+        'course_search': ({}, {'q': word}),
+        'course_detail': ({'pk': course.pk}, {}),
+        'course_modules': ({'pk': course.pk}, {}),
+        'course_changes': ({'pk': course.pk}, {}),
+        'course_students': ({'pk': course.pk}, {}),
+        'course_students_export': ({'pk': course.pk}, {}),
+        'user_courses': ({'pk': course.owner_id}, {}),
+        'subject_list': ({}, {}),
+        'subject_detail': (course.subject_id and {'pk': course.subject_id}, {}),
+        'module_detail': (module and {'pk': module.pk}, {}),
+        'module_items': (module and {'pk': module.pk}, {}),
+        'item_detail': (item and {'pk': item.pk}, {}),
+        'content_detail': (text and {'content_type': 'text', 'pk': text.pk}, {}),
+        'content_download': (stored_file and {'content_type': 'file', 'pk': stored_file.pk}, {}),
+        'upload_detail': (upload and {'pk': upload.pk}, {}),
+    }
+    arguments, skipped = {}, {}
+    for pattern in urls.urlpatterns:
+        if not pattern.name:
+            continue
+        view_class = getattr(pattern.callback, 'cls', getattr(pattern.callback, 'view_class', None))
+        if not hasattr(view_class, 'get'):
+            skipped[pattern.name] = 'no GET method'
+        elif pattern.name not in candidates:
+            skipped[pattern.name] = 'no sample arguments'
+        elif candidates[pattern.name][0] is None:
+            skipped[pattern.name] = 'no object to request'
+        else:
+            kwargs, query = candidates[pattern.name]
+            arguments[pattern.name] = {'kwargs': kwargs, 'query': query}
+    return arguments, skipped
+
+
+def measure(client: Client, path: str, query: dict, repeat: int, warmup: int) -> dict:
+    """Latency percentiles, sequential throughput and queries of request thread for one path."""
+    for _ in range(warmup):
+        request(client, path, query)
+    latencies: List[float] = []
+    queries: List[int] = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            status = request(client, path, query)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+        queries.append(len(captured))
+    elapsed = time.perf_counter() - started
+    return {
+        'status': status,
+        'requests': repeat,
+        'rps': round(repeat / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0,
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries': max(queries, default=0),
+    }
+
+
+def request(client: Client, path: str, query: dict) -> int:
+    response = client.get(path, query)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    response.close()
+    return response.status_code
+
+
+def run_benchmark(client: Client, repeat: int, warmup: int,
+                  names: Optional[List[str]] = None) -> dict:
+    arguments, skipped = sample_arguments()
+    results = {}
+    # repeated requests of one client would be answered with 429
+    with override_settings(THROTTLE_ENABLED=False):
+        for name, sample in arguments.items():
+            if names and name not in names:
+                continue
+            path = reverse(f'courses:{name}', kwargs=sample['kwargs'])
+            results[name] = {'path': path, 'query': sample['query'],
+                             **measure(client, path, sample['query'], repeat, warmup)}
+    return {'results': results, 'skipped': skipped}
+
+
+def run_admin_benchmark(client: Client, repeat: int, warmup: int) -> dict:
+    """Course admin changelist plain, searched and filtered, client must be logged in as staff."""
+    course = models.Course.objects.order_by('-created').first()
+    if course is None:
+        return {
+            'results': {},
+            'skipped': {'admin_courses': 'no courses, run seed_benchmark_data first'},
+        }
+    cases = {
+        'admin_courses': {},
+        'admin_courses_search': {'q': course.title.split()[0]},
+        'admin_courses_date': {'created': f'{course.created.year}-{course.created.month:02}'},
+    }
+    if course.subject_id:
+        cases['admin_courses_subject'] = {'subject__slug__exact': course.subject_id}
+    path = reverse('admin:courses_course_changelist')
+    results = {}
+    with override_settings(THROTTLE_ENABLED=False):
+        for name, query in cases.items():
+            results[name] = {'path': path, 'query': query,
+                             **measure(client, path, query, repeat, warmup)}
+    return {'results': results, 'skipped': {}}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Regressions of current run: p95 slower by more than `threshold` percent, or more queries."""
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + threshold / 100):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def module_payload(module_id: Optional[int] = None) -> dict:
+    """Serialized module page as ModuleDetailView returns it, for the biggest module by default."""
+    modules = models.Module.objects.select_related('course').prefetch_related('items')
+    if module_id is None:
+        module = modules.annotate(item_count=Count('items')).order_by('-item_count', 'pk').first()
+    else:
+        module = modules.get(pk=module_id)
+    load_contents(module.items.all())
+    request = Request(RequestFactory().get(reverse('courses:module_detail', args=[module.pk])))
+    return serializers.ModuleSerializer(module, context={'request': request}).data
+
+
+def measure_renderers(data, repeat: int) -> List[dict]:
+    """Render time of each renderer and size of its output, raw and compressed."""
+    renderer_classes = [JSONRenderer, FastJSONRenderer]
+    if msgpack is not None:
+        renderer_classes.append(MessagePackRenderer)
+    results = []
+    for renderer_class in renderer_classes:
+        renderer = renderer_class()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            body = renderer.render(data, renderer.media_type, {})
+        result = {
+            'renderer': renderer_class.__name__,
+            'render_ms': round((time.perf_counter() - started) * 1000 / repeat, 3),
+            'bytes': len(body),
+        }
+        for encoding in ('gzip', 'br') if brotli is not None else ('gzip', ):
+            started = time.perf_counter()
+            compressor = Compressor(encoding)
+            compressed = compressor.compress(body) + compressor.flush()
+            result[f'{encoding}_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            result[f'{encoding}_bytes'] = len(compressed)
+        results.append(result)
+    return results
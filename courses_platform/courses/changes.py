@@ -0,0 +1,86 @@
+"""
+Change log of course trees for delta sync.
+
+Every save or delete of a module, item or content updates one ChangeLogEntry
+row per object with the time of its latest change, deletions stay as tombstones.
+Clients ask for entries of a course newer than their last sync, which is a range
+scan over the (course, changed) index, and fetch only those objects. Pages are
+ordered by (changed, pk) and continue after both, as many entries may share
+one time, e.g. all of the first log.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import models
+
+
+def record(course_id: int, model: str, object_id: int, deleted: bool):
+    action = models.ChangeLogEntry.DELETED if deleted else models.ChangeLogEntry.UPDATED
+    now = timezone.now()
+    updated = models.ChangeLogEntry.objects.filter(model=model, object_id=object_id).update(
+        course_id=course_id, action=action, changed=now,
+    )
+    if not updated:
+        models.ChangeLogEntry.objects.create(
+            course_id=course_id, model=model, object_id=object_id, action=action, changed=now,
+        )
+
+
+def record_many(course_id: int, model: str, object_ids: Iterable[int], deleted: bool):
+    """Record change of many objects of one model, for bulk operations that send no signals."""
+    action = models.ChangeLogEntry.DELETED if deleted else models.ChangeLogEntry.UPDATED
+    now = timezone.now()
+    object_ids = list(object_ids)
+    entries = models.ChangeLogEntry.objects.filter(model=model, object_id__in=object_ids)
+    existing = set(entries.values_list('object_id', flat=True))
+    entries.update(course_id=course_id, action=action, changed=now)
+    models.ChangeLogEntry.objects.bulk_create([
+        models.ChangeLogEntry(
+            course_id=course_id, model=model, object_id=object_id, action=action, changed=now,
+        )
+        for object_id in object_ids if object_id not in existing
+    ])
+
+
+def horizon() -> datetime:
+    """Tombstones older than this are pruned, clients synced before it must download everything."""
+    return timezone.now() - timedelta(days=settings.COURSES_CHANGES_RETENTION_DAYS)
+
+
+def changes_since(course_id: int, since: Optional[datetime], after: Optional[int],
+                  limit: int) -> Tuple[List[models.ChangeLogEntry], datetime, Optional[int], bool]:
+    """
+    Up to `limit` entries of course changed after `since`, or at `since` with pk
+    greater than `after`. Returns them with `since` and `after` of the next page
+    and whether there are more. Most recent entries are left for the next sync
+    until they are older than the settle delay, so changes of transactions that
+    were still running are not skipped.
+    """
+    until = timezone.now() - timedelta(seconds=settings.COURSES_CHANGES_SETTLE_SECONDS)
+    entries = models.ChangeLogEntry.objects.filter(course_id=course_id, changed__lte=until)
+    if since is not None and after is not None:
+        entries = entries.filter(Q(changed__gt=since) | Q(changed=since, pk__gt=after))
+    elif since is not None:
+        entries = entries.filter(changed__gt=since)
+    page = list(entries.order_by('changed', 'pk')[:limit + 1])
+    if len(page) > limit:
+        last = page[limit - 1]
+        return page[:limit], last.changed, last.pk, True
+    if since is not None and since >= until:
+        return page, since, after, False
+    return page, until, None, False
+
+
+def group_entries(entries: List[models.ChangeLogEntry]) -> Tuple[Dict[str, List[int]], List[dict]]:
+    """Ids of changed objects by model and tombstones of deleted ones."""
+    changed, deleted = {}, []
+    for entry in entries:
+        if entry.action == models.ChangeLogEntry.DELETED:
+            deleted.append({'model': entry.model, 'id': entry.object_id, 'changed': entry.changed})
+        else:
+            changed.setdefault(entry.model, []).append(entry.object_id)
+    return changed, deleted
@@ -0,0 +1,92 @@
+"""
+Loading contents of many items at once.
+
+`Item.all_contents` queries every content table for each item, so a module page
+costs seven queries per item. `load_contents` fetches contents of all given
+items with one query per content table instead, one after another.
+
+Django 2.2 has no async ORM, views run synchronously under ASGI too. Running
+the queries concurrently takes a thread pool where each thread has its own
+database connection, which only pays off when those connections are reused.
+So it is opt-in with COURSES_CONTENT_QUERY_WORKERS and only used on connections
+kept open (CONN_MAX_AGE) or pooled, otherwise every page would open and close
+a connection per content table.
+"""
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import models
+
+POOLED_ENGINE = 'common.db.backends.postgresql_pool'
+
+_executor = None
+
+
+def content_models() -> List:
+    """Content models in the order `Item.all_contents` lists them."""
+    return [
+        models.Item._meta.get_field(related_name).related_model
+        for related_name in models.Item.CONTENTS_RELATED + models.Item.ASSIGNMENTS_RELATED
+    ]
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.COURSES_CONTENT_QUERY_WORKERS,
+            thread_name_prefix='content-query',
+        )
+    return _executor
+
+
+def fetch(model, item_ids: List[int]) -> List:
+    return list(model.objects.filter(item_id__in=item_ids).order_by('item_id', 'order'))
+
+
+def fetch_in_thread(model, item_ids: List[int]) -> List:
+    # same lifecycle as request threads: drop broken or expired connections around the work
+    close_old_connections()
+    try:
+        return fetch(model, item_ids)
+    finally:
+        close_old_connections()
+
+
+def reuses_connections() -> bool:
+    return bool(connection.settings_dict['CONN_MAX_AGE']) \
+        or connection.settings_dict['ENGINE'] == POOLED_ENGINE
+
+
+def fetch_all(item_ids: List[int]) -> List[List]:
+    """Query every content table, concurrently if enabled and it's safe."""
+    # rows written by current transaction are invisible to connections of other threads
+    if not settings.COURSES_CONTENT_QUERY_WORKERS or connection.in_atomic_block \
+            or not reuses_connections():
+        return [fetch(model, item_ids) for model in content_models()]
+    executor = get_executor()
+    futures = [
+        # copied context keeps database routing of the request, e.g. replica reads
+        executor.submit(contextvars.copy_context().run, fetch_in_thread, model, item_ids)
+        for model in content_models()
+    ]
+    return [future.result() for future in futures]
+
+
+def load_contents(items: Iterable[models.Item]) -> List[models.Item]:
+    """Fetch contents of items and keep them on items for `all_contents`."""
+    items = list(items)
+    if not items:
+        return items
+    by_item = defaultdict(list)
+    for contents in fetch_all([item.pk for item in items]):
+        for content in contents:
+            by_item[content.item_id].append(content)
+    for item in items:
+        item.loaded_contents = by_item[item.pk]
+    return items
@@ -0,0 +1,158 @@
+"""
+Batched removal of course trees.
+
+Django's delete collector loads every related object into memory and sends
+signals for each of them, which is too slow for big courses. Here children are
+deleted table by table with `DELETE ... WHERE id IN (...)` statements of at most
+`batch_size` rows, each in its own short transaction, so memory use and lock
+time don't depend on course size. Signals are not sent for removed rows, tombstones
+of removed modules, items and contents are written with them if asked to.
+"""
+import logging
+import shutil
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from . import changes, models
+from .storage import is_blob_name
+from .uploads import upload_dir
+
+logger = logging.getLogger(__name__)
+
+CONTENT_MODELS = (
+    models.Text,
+    models.File,
+    models.Image,
+    models.Video,
+    models.StringAssignment,
+    models.ChoicesAssignment,
+    models.MultipleChoicesAssignment,
+)
+FILE_CONTENT_MODELS = (models.File, models.Image)
+
+
+def delete_rows(model, pks):
+    """Delete rows by primary key with a single raw statement."""
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            list(pks),
+        )
+
+
+def release_files(model, names):
+    """Drop references of deleted contents and remove blobs nobody uses anymore."""
+    storage = model._meta.get_field('file').storage
+    for name, count in Counter(name for name in names if name).items():
+        if is_blob_name(name):
+            storage.release(name, count)
+            storage.collect(name)
+        else:
+            storage.delete(name)
+
+
+def delete_batches(model, queryset, batch_size: int, report: Callable[[int], None],
+                   release: bool = True, tombstones_of: Optional[int] = None) -> int:
+    """
+    Delete rows of queryset in batches, releasing stored files of file contents
+    if `release` and recording deletions in change log of course `tombstones_of`.
+    """
+    has_files = release and model in FILE_CONTENT_MODELS
+    fields = ('pk', 'file') if has_files else ('pk', )
+    deleted = 0
+    while True:
+        rows = list(queryset.order_by().values_list(*fields)[:batch_size])
+        if not rows:
+            return deleted
+        with transaction.atomic(using=router.db_for_write(model)):
+            delete_rows(model, [row[0] for row in rows])
+            if has_files:
+                release_files(model, [row[1] for row in rows])
+            if tombstones_of is not None:
+                changes.record_many(
+                    tombstones_of, model._meta.model_name, [row[0] for row in rows], deleted=True,
+                )
+        deleted += len(rows)
+        report(deleted)
+
+
+class BatchDeleter:
+    """Remove parts of one course in batches, reporting progress after each batch."""
+
+    def __init__(self, course_id: int, batch_size: Optional[int] = None,
+                 progress: Optional[Callable[[str], None]] = None):
+        self.course_id = course_id
+        self.batch_size = batch_size or settings.COURSES_DELETE_BATCH_SIZE
+        self.progress = progress
+        self.counts = {}
+
+    def step(self, model, queryset, release: bool = True, tombstones: bool = False):
+        label = model._meta.db_table
+
+        def report(deleted):
+            self.counts[label] = deleted
+            message = f'Course {self.course_id}: deleted {deleted} rows of {label}'
+            logger.info(message)
+            if self.progress:
+                self.progress(message)
+
+        self.counts[label] = delete_batches(
+            model, queryset, self.batch_size, report, release=release,
+            tombstones_of=self.course_id if tombstones else None,
+        )
+
+    def delete_modules(self, release_files: bool = True, tombstones: bool = False):
+        """
+        Delete modules, items, contents and uploads of the course, leaves first.
+        With `tombstones` deletions are recorded for delta sync of the course.
+        """
+        course_id = self.course_id
+        for model in CONTENT_MODELS:
+            self.step(model, model.objects.filter(item__module__course_id=course_id),
+                      release_files, tombstones)
+        uploads = models.Upload.objects.filter(item__module__course_id=course_id)
+        for upload in uploads.iterator():
+            shutil.rmtree(upload_dir(upload), ignore_errors=True)
+        self.step(models.Upload, uploads)
+        self.step(models.Item, models.Item.objects.filter(module__course_id=course_id),
+                  tombstones=tombstones)
+        self.step(models.Module, models.Module.objects.filter(course_id=course_id),
+                  tombstones=tombstones)
+
+    def release_archived_files(self):
+        """Drop references held by archived contents of the course, together with the archive."""
+        archive = models.CourseArchive.objects.filter(course_id=self.course_id).first()
+        if archive is None:
+            return
+        with transaction.atomic(using=router.db_for_write(models.CourseArchive)):
+            for model in FILE_CONTENT_MODELS:
+                release_files(model, archive.file_names().get(model._meta.label_lower, []))
+            archive.delete()
+
+    def delete_course(self):
+        self.release_archived_files()
+        self.delete_modules()
+        for relation in ('students', 'teachers'):
+            through = getattr(models.Course, relation).through
+            self.step(through, through.objects.filter(course_id=self.course_id))
+        self.step(
+            models.ChangeLogEntry,
+            models.ChangeLogEntry.objects.filter(course_id=self.course_id),
+        )
+        # course is small by now, regular delete takes care of anything left and sends signals
+        models.Course.objects.filter(pk=self.course_id).delete()
+
+
+def purge_course(course_id: int, batch_size: Optional[int] = None,
+                 progress: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """Delete course and everything in it, return number of removed rows per table."""
+    deleter = BatchDeleter(course_id, batch_size, progress)
+    deleter.delete_course()
+    return deleter.counts
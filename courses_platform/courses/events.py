@@ -0,0 +1,84 @@
+"""
+In-process broker of course change notifications.
+
+Signal handlers publish small events (what changed, ids, time) after the
+transaction commits, and every open event stream of that course gets a copy.
+Each stream has a bounded buffer: when a client reads too slowly its oldest
+events are dropped and it is told to resync instead of the server holding an
+ever growing backlog. Events only reach streams served by the same process.
+"""
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from django.conf import settings
+from django.utils import timezone
+
+
+class Subscription:
+    """Events of one course for one connected client, consumed on its event loop."""
+
+    def __init__(self, course_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.course_id = course_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # set when events were dropped, client must refetch what it shows
+        self.lost = False
+
+    def push(self, event: dict):
+        """Add event to buffer, dropping the oldest one if it's full. Runs on subscription loop."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.lost = True
+        self.queue.put_nowait(event)
+
+
+class Broker:
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, course_id: int, maxsize: Optional[int] = None) -> Subscription:
+        """Subscribe to course events, must be called from the event loop that consumes them."""
+        subscription = Subscription(
+            course_id,
+            asyncio.get_event_loop(),
+            maxsize or settings.COURSES_EVENTS_BUFFER_SIZE,
+        )
+        with self._lock:
+            self._subscriptions[course_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.course_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.course_id]
+
+    def has_subscribers(self, course_id: Optional[int] = None) -> bool:
+        if course_id is None:
+            return bool(self._subscriptions)
+        return course_id in self._subscriptions
+
+    def publish(self, course_id: int, event: dict):
+        """Send event to all subscribers of course, callable from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(course_id, ()))
+        if not subscriptions:
+            return
+        event = {**event, 'id': next(self._ids), 'timestamp': timezone.now().isoformat()}
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # loop of a server that is shutting down
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
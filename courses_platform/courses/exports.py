@@ -0,0 +1,96 @@
+"""
+CSV exports of course rosters.
+
+Rows are read with `values_list().iterator()`, through a server-side cursor on
+PostgreSQL, and written out as they come, so exports of any size use little memory.
+Finished files may be generated in background and kept in storage under the
+roster version of the course. The version is a counter in the course row bumped
+whenever students enroll, leave or change their names, so a stored file is served
+until the roster it was made from changes, by any process.
+"""
+import csv
+import io
+import tempfile
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import F
+
+from . import models
+
+EXPORT_DIR = 'exports/courses/{}/'
+ROSTER_COLUMNS = ('id', 'username', 'first_name', 'last_name', 'email')
+
+# spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def roster_version(course_id: int) -> int:
+    return models.Course.objects.values_list('roster_version', flat=True).get(pk=course_id)
+
+
+def invalidate_rosters(course_ids: Iterable[int]):
+    """Outdate stored exports of courses."""
+    models.Course.objects.filter(pk__in=list(course_ids)).update(
+        roster_version=F('roster_version') + 1,
+    )
+
+
+def roster_rows(course_id: int) -> Iterator[tuple]:
+    return (
+        get_user_model().objects.filter(courses_joined=course_id).order_by('pk')
+        .values_list(*ROSTER_COLUMNS).iterator(chunk_size=settings.STREAMING_CHUNK_SIZE)
+    )
+
+
+def safe_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def roster_csv(course_id: int) -> Iterator[bytes]:
+    """Roster as CSV in blocks of about STREAMING_BUFFER_SIZE bytes."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ROSTER_COLUMNS)
+    for row in roster_rows(course_id):
+        writer.writerow([safe_cell(value) for value in row])
+        if buffer.tell() >= settings.STREAMING_BUFFER_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def roster_file_name(course_id: int, version: int) -> str:
+    return EXPORT_DIR.format(course_id) + f'students-{version}.csv'
+
+
+def stored_roster(course_id: int) -> Optional[str]:
+    """Storage name of export made from current roster, if there is one."""
+    name = roster_file_name(course_id, roster_version(course_id))
+    return name if default_storage.exists(name) else None
+
+
+def generate_roster_file(course_id: int) -> str:
+    """Write roster export to storage unless it's there already, and drop outdated ones."""
+    # version is read first, if roster changes meanwhile the file is never served
+    name = roster_file_name(course_id, roster_version(course_id))
+    if not default_storage.exists(name):
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in roster_csv(course_id):
+                tmp.write(chunk)
+            tmp.seek(0)
+            saved = default_storage.save(name, File(tmp))
+        if saved != name:
+            # made by someone else at the same time
+            default_storage.delete(saved)
+    directory = EXPORT_DIR.format(course_id)
+    for filename in default_storage.listdir(directory)[1]:
+        if directory + filename != name:
+            default_storage.delete(directory + filename)
+    return name
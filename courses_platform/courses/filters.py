@@ -0,0 +1,86 @@
+"""Query parameter filtering and facet counts for course lists."""
+from collections import Counter
+from typing import Dict
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, Value, When
+
+from rest_framework import serializers
+
+
+class CourseFilterSerializer(serializers.Serializer):
+    """Validate course list query parameters, all of them are optional."""
+
+    subject = serializers.CharField(required=False, help_text='Comma separated subject slugs.')
+    price_min = serializers.IntegerField(required=False, min_value=0)
+    price_max = serializers.IntegerField(required=False, min_value=0)
+    open_after = serializers.DateField(required=False)
+    open_before = serializers.DateField(required=False)
+    is_enroll_open = serializers.NullBooleanField(required=False)
+    owner = serializers.IntegerField(required=False)
+    teacher = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        price_min, price_max = attrs.get('price_min'), attrs.get('price_max')
+        if price_min is not None and price_max is not None and price_min > price_max:
+            raise serializers.ValidationError('price_min must not be greater than price_max.')
+        return attrs
+
+
+def filter_courses(queryset, query_params):
+    """Apply filters from query params to course queryset, raise ValidationError on bad input."""
+    serializer = CourseFilterSerializer(data=query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+
+    if params.get('subject'):
+        queryset = queryset.filter(subject__in=params['subject'].split(','))
+    if 'price_min' in params:
+        queryset = queryset.filter(price__gte=params['price_min'])
+    if 'price_max' in params:
+        queryset = queryset.filter(price__lte=params['price_max'])
+    if 'open_after' in params:
+        queryset = queryset.filter(open_date__gte=params['open_after'])
+    if 'open_before' in params:
+        queryset = queryset.filter(open_date__lte=params['open_before'])
+    if params.get('is_enroll_open') is not None:
+        queryset = queryset.filter(is_enroll_open=params['is_enroll_open'])
+    if 'owner' in params:
+        queryset = queryset.filter(owner=params['owner'])
+    if 'teacher' in params:
+        queryset = queryset.filter(teachers=params['teacher'])
+    return queryset
+
+
+def price_bucket_expression():
+    """
+    Label each course with price bucket from COURSES_PRICE_BUCKETS upper bounds.
+
+    I.e. bounds (0, 50) give '0', '1-50' and '51+' buckets.
+    """
+    whens = []
+    lower = 0
+    for upper in settings.COURSES_PRICE_BUCKETS:
+        label = str(upper) if upper == lower else f'{lower}-{upper}'
+        whens.append(When(price__lte=upper, then=Value(label)))
+        lower = upper + 1
+    return Case(*whens, default=Value(f'{lower}+'), output_field=CharField())
+
+
+def course_facets(queryset) -> Dict[str, Dict[str, int]]:
+    """Count courses per subject and per price bucket with a single grouped query."""
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket_expression())
+        .values('subject_id', 'price_bucket')
+        .annotate(count=Count('pk'))
+    )
+    subjects, prices = Counter(), Counter()
+    for row in rows:
+        subjects[row['subject_id']] += row['count']
+        prices[row['price_bucket']] += row['count']
+    return {
+        'total': sum(subjects.values()),
+        'subject': dict(subjects),
+        'price': dict(prices),
+    }
@@ -0,0 +1,134 @@
+"""
+Resized derivatives of uploaded images.
+
+Sizes are configured in COURSES_IMAGE_DERIVATIVES. The ones listed in
+COURSES_IMAGE_PREGENERATE are rendered by background task as soon as image is
+uploaded, others are rendered on first request and kept in a size-limited
+cache with least recently used ones removed first. Derivatives are stored
+under `derivatives/` next to source files and keyed by source digest, so
+the same picture uploaded many times is resized only once.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image as PILImage, ImageOps
+
+from tasks.queue import task
+
+from .storage import blob_digest, hash_path, is_blob_name
+
+DERIVATIVES_PREFIX = 'derivatives'
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+}
+
+_last_eviction = 0.0
+
+
+def source_digest(storage, name: str) -> str:
+    if is_blob_name(name):
+        return blob_digest(name)
+    return hash_path(storage.path(name))
+
+
+def derivative_name(digest: str, size: str) -> str:
+    spec = settings.COURSES_IMAGE_DERIVATIVES[size]
+    ext = FORMAT_EXTENSIONS[spec['format']]
+    return '/'.join([DERIVATIVES_PREFIX, digest[:2], digest, size + ext])
+
+
+def render(source_path: str, target_path: str, spec: dict):
+    with PILImage.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if spec.get('crop'):
+            img = ImageOps.fit(img, spec['size'], PILImage.LANCZOS)
+        else:
+            img.thumbnail(spec['size'], PILImage.LANCZOS)
+        if spec['format'] == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp_path = f'{target_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        img.save(tmp_path, spec['format'], quality=spec.get('quality', 85))
+    os.replace(tmp_path, target_path)
+
+
+def get_derivative(storage, name: str, size: str, digest: Optional[str] = None) -> str:
+    """Return derivative name of stored image, rendering it if it's not there yet."""
+    digest = digest or source_digest(storage, name)
+    target = derivative_name(digest, size)
+    target_path = default_storage.path(target)
+    if os.path.exists(target_path):
+        # mtime is the recency mark used by cache eviction
+        os.utime(target_path)
+        return target
+    render(storage.path(name), target_path, settings.COURSES_IMAGE_DERIVATIVES[size])
+    if size not in settings.COURSES_IMAGE_PREGENERATE:
+        schedule_eviction()
+    return target
+
+
+@task
+def generate_derivatives(model_label: str, field_name: str, name: str, sizes: Iterable[str]):
+    """Render derivatives of image stored in `field_name` file field of the model."""
+    storage = apps.get_model(model_label)._meta.get_field(field_name).storage
+    digest = source_digest(storage, name)
+    for size in sizes:
+        get_derivative(storage, name, size, digest=digest)
+
+
+def schedule_derivatives(field_file):
+    """Queue rendering of pregenerated sizes of image in file field."""
+    generate_derivatives.delay(
+        field_file.instance._meta.label,
+        field_file.field.name,
+        field_file.name,
+        list(settings.COURSES_IMAGE_PREGENERATE),
+    )
+
+
+def derivative_urls(storage, name: str, digest: Optional[str] = None) -> Dict[str, str]:
+    """Media urls of pregenerated derivatives, for images served without permission checks."""
+    digest = digest or source_digest(storage, name)
+    return {
+        size: default_storage.url(derivative_name(digest, size))
+        for size in settings.COURSES_IMAGE_PREGENERATE
+    }
+
+
+def schedule_eviction():
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction >= settings.COURSES_IMAGE_EVICTION_INTERVAL:
+        _last_eviction = now
+        evict_lazy_derivatives.delay()
+
+
+@task(priority=-5)
+def evict_lazy_derivatives():
+    """Remove least recently used on-demand derivatives until cache fits its size limit."""
+    lazy_sizes = set(settings.COURSES_IMAGE_DERIVATIVES) - set(settings.COURSES_IMAGE_PREGENERATE)
+    files = []
+    for dirpath, _, filenames in os.walk(default_storage.path(DERIVATIVES_PREFIX)):
+        for filename in filenames:
+            size, ext = os.path.splitext(filename)
+            if size in lazy_sizes and ext in FORMAT_EXTENSIONS.values():
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(file_size for _, file_size, _ in files)
+    limit = settings.COURSES_IMAGE_LAZY_CACHE_BYTES
+    for _, file_size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= file_size
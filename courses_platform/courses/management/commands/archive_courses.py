@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from courses.archive import archive_course, restore_course
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        'Move modules and contents of old invisible courses into archive, '
+        'or restore archived ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int,
+                            help='Courses to archive, all matching --older-than-days if omitted.')
+        parser.add_argument('--older-than-days', type=int, default=365,
+                            help='Archive invisible courses created earlier than this.')
+        parser.add_argument('--restore', action='store_true', help='Restore given courses instead.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list courses that would be archived.')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            if not options['course_ids']:
+                raise CommandError('Give ids of courses to restore.')
+            for course_id in Course.objects.filter(pk__in=options['course_ids'], archived=True) \
+                    .values_list('pk', flat=True):
+                restore_course(course_id)
+                self.stdout.write(self.style.SUCCESS(f'Course {course_id} restored.'))
+            return
+
+        courses = Course.objects.filter(visible=False, deleted=False, archived=False)
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+        else:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+            courses = courses.filter(created__lt=cutoff)
+        for course_id in list(courses.values_list('pk', flat=True)):
+            if options['dry_run']:
+                self.stdout.write(f'Would archive course {course_id}')
+                continue
+            archive_course(course_id, progress=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(f'Course {course_id} archived.'))
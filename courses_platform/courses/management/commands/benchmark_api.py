@@ -0,0 +1,83 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from courses.benchmark import compare, run_admin_benchmark, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every GET endpoint of courses app in-process and report latency percentiles, '
+        'throughput and queries per request. Save results with --output and check a later run '
+        'against them with --compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Url names to benchmark, all by default.')
+        parser.add_argument('--repeat', type=int, default=50, help='Measured requests per url.')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per url.')
+        parser.add_argument('--user', help='Username to log in as, first superuser by default.')
+        parser.add_argument('--anonymous', action='store_true', help='Do not log in.')
+        parser.add_argument('--admin', action='store_true',
+                            help='Also request course admin changelist, user must be staff.')
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+        parser.add_argument('--compare',
+                            help='Results file of an earlier run to check for regressions.')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='Percent p95 latency may grow before it counts as regression.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        client = Client(HTTP_HOST=self.host())
+        if not options['anonymous']:
+            users = get_user_model().objects.all()
+            user = (users.filter(username=options['user']) if options['user']
+                    else users.filter(is_superuser=True).order_by('pk')).first()
+            if user is None:
+                raise CommandError('User to log in as not found, give --user or --anonymous.')
+            client.force_login(user)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'user': None if options['anonymous'] else user.username,
+            **run_benchmark(client, options['repeat'], options['warmup'], options['names']),
+        }
+        if options['admin']:
+            if options['anonymous'] or not user.is_staff:
+                raise CommandError('--admin needs a staff user.')
+            admin_report = run_admin_benchmark(client, options['repeat'], options['warmup'])
+            report['results'].update(admin_report['results'])
+            report['skipped'].update(admin_report['skipped'])
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f"{name:21} {result['status']}  {result['rps']:>8} req/s  "
+                f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                f"p99 {result['p99_ms']:>8} ms  {result['queries']:>3} queries"
+            )
+        for name, reason in report['skipped'].items():
+            self.stdout.write(f'{name:21} skipped, {reason}')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        if baseline is not None:
+            regressions = compare(baseline, report, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def host(self):
+        hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0] if hosts else 'localhost'
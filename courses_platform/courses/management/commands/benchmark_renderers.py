@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from courses.benchmark import measure_renderers, module_payload
+
+
+class Command(BaseCommand):
+    help = 'Compare render time and response size of renderers and compressions on a module page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', type=int,
+                            help='Module to render, the one with most items by default.')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+
+    def handle(self, *args, **options):
+        results = measure_renderers(module_payload(options['module']), options['repeat'])
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            compressed = '  '.join(
+                f"{encoding} {result[f'{encoding}_bytes']:>8} bytes "
+                f"{result[f'{encoding}_ms']:>7} ms"
+                for encoding in ('gzip', 'br') if f'{encoding}_bytes' in result
+            )
+            self.stdout.write(
+                f"{result['renderer']:20} {result['render_ms']:>7} ms "
+                f"{result['bytes']:>9} bytes  {compressed}"
+            )
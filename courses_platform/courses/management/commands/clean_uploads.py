@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.models import Upload
+from courses.uploads import discard
+
+
+class Command(BaseCommand):
+    help = 'Remove chunked uploads that were never completed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-hours', type=float, default=settings.COURSES_UPLOAD_EXPIRY_HOURS,
+            help='Remove uploads started earlier than this.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+        count = 0
+        for upload in Upload.objects.filter(created__lt=cutoff).iterator():
+            discard(upload)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} expired uploads.'))
@@ -0,0 +1,91 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from courses.models import Blob, CourseArchive, File, Image
+from courses.storage import BLOB_PREFIX, blob_storage, is_blob_name
+
+
+class Command(BaseCommand):
+    help = 'Recount blob references and remove unreferenced blobs from storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=settings.COURSES_BLOB_GC_GRACE_HOURS,
+            help='Keep unreferenced blobs changed more recently than this.',
+        )
+        parser.add_argument('--no-recount', action='store_true',
+                            help='Trust stored reference counts instead of recounting them.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be removed.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+        if not options['no_recount']:
+            fixed = self.recount(dry_run)
+            self.stdout.write(f'Fixed reference counts of {fixed} blobs.')
+
+        removed = 0
+        unreferenced = Blob.objects.filter(references=0, updated__lt=cutoff)
+        for name in unreferenced.values_list('name', flat=True).iterator():
+            if dry_run:
+                self.stdout.write(f'Would remove {name}')
+            elif not blob_storage.collect(name):
+                continue
+            removed += 1
+
+        strays = self.remove_strays(cutoff, dry_run)
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} blobs and {strays} stray files.'))
+
+    def recount(self, dry_run):
+        """Set reference counts to number of File/Image rows, live or archived, using each blob."""
+        counts = Counter()
+        for model in (File, Image):
+            rows = model.objects.order_by().values_list('file').annotate(count=Count('pk'))
+            for name, count in rows.iterator():
+                if is_blob_name(name):
+                    counts[name] += count
+        for archive in CourseArchive.objects.iterator():
+            for names in archive.file_names().values():
+                counts.update(name for name in names if is_blob_name(name))
+        fixed = 0
+        for name, references in Blob.objects.values_list('name', 'references').iterator():
+            actual = counts.get(name, 0)
+            if actual != references:
+                fixed += 1
+                if not dry_run:
+                    Blob.objects.filter(name=name).update(references=actual, updated=timezone.now())
+        return fixed
+
+    def remove_strays(self, cutoff, dry_run):
+        """Remove old files in blob directory that have no Blob row (interrupted uploads)."""
+        root = blob_storage.path(BLOB_PREFIX)
+        removed = 0
+        for dirpath, _, filenames in os.walk(root):
+            candidates = {}
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                modified = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+                if modified < cutoff:
+                    name = os.path.relpath(path, blob_storage.location).replace(os.sep, '/')
+                    candidates[name] = path
+            if not candidates:
+                continue
+            known = set(
+                Blob.objects.filter(name__in=list(candidates)).values_list('name', flat=True)
+            )
+            for name, path in candidates.items():
+                if name in known:
+                    continue
+                if dry_run:
+                    self.stdout.write(f'Would remove stray {name}')
+                else:
+                    os.unlink(path)
+                removed += 1
+        return removed
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.exports import generate_roster_file, roster_csv
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Write students of a course as CSV, row by row.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('--output', help='File to write, standard output by default.')
+        parser.add_argument('--store', action='store_true',
+                            help='Generate the file served by export url instead.')
+
+    def handle(self, *args, **options):
+        course_id = options['course_id']
+        if not Course.objects.filter(pk=course_id).exists():
+            raise CommandError(f'Course {course_id} does not exist.')
+        if options['store']:
+            name = generate_roster_file(course_id)
+            self.stdout.write(self.style.SUCCESS(f'Stored {name}'))
+            return
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in roster_csv(course_id):
+                    output.write(chunk)
+        else:
+            for chunk in roster_csv(course_id):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from common.loadtest import run_load
+
+DEFAULT_PATHS = ('courses/', 'courses/facets/', 'subjects/', 'courses/search/?q=course')
+DEFAULT_URL = 'http://127.0.0.1:8000/api/v0.1/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load course endpoints of running servers and report throughput and latency. '
+        'Give --url several times to compare servers, e.g. WSGI and ASGI ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS,
+                            help='Paths relative to --url, requested in turn.')
+        parser.add_argument('--url', action='append', dest='urls')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--json', action='store_true', help='Print full results as JSON.')
+
+    def handle(self, *args, **options):
+        results = {
+            url: run_load(url, options['paths'], options['concurrency'], options['duration'])
+            for url in options['urls'] or [DEFAULT_URL]
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for url, result in results.items():
+            self.stdout.write(url)
+            for path, stats in [('total', result['total']), *result['paths'].items()]:
+                self.stdout.write(
+                    f"  {path:40} {stats['rps']:>8} req/s  p50 {stats['p50_ms']:>7} ms  "
+                    f"p99 {stats['p99_ms']:>7} ms  errors {stats['errors']}"
+                )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from courses.changes import horizon
+from courses.models import ChangeLogEntry, Course
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove tombstones older than COURSES_CHANGES_RETENTION_DAYS '
+        'and entries of removed courses.'
+    )
+
+    def handle(self, *args, **options):
+        tombstones, _ = ChangeLogEntry.objects.filter(
+            action=ChangeLogEntry.DELETED, changed__lt=horizon(),
+        ).delete()
+        orphans, _ = ChangeLogEntry.objects.exclude(
+            course_id__in=Course.objects.values('pk'),
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {tombstones} tombstones and {orphans} orphaned entries.'
+        ))
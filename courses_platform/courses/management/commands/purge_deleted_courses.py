@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.deletion import purge_course
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Remove courses marked as deleted together with their contents, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int,
+                            help='Courses to remove, all deleted ones if omitted.')
+        parser.add_argument('--batch-size', type=int, default=settings.COURSES_DELETE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        courses = Course.objects.filter(deleted=True)
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+        for course_id in list(courses.values_list('pk', flat=True)):
+            counts = purge_course(course_id, batch_size=options['batch_size'],
+                                  progress=self.stdout.write)
+            self.stdout.write(self.style.SUCCESS(
+                f'Course {course_id} removed ({sum(counts.values())} rows).'
+            ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Recreate course full-text search index from database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Database alias to rebuild index in.')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'], write=True)
+        backend.create_index()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} courses.'))
@@ -0,0 +1,47 @@
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from courses.seed import PASSWORD, CatalogSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk insert a generated catalog of subjects, courses, modules, items, '
+        'contents of every type and enrolled students for benchmarks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subjects', type=int, default=20)
+        parser.add_argument('--owners', type=int, default=50, help='Users owning the courses.')
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--modules', type=int, default=10, help='Modules per course.')
+        parser.add_argument('--items', type=int, default=5,
+                            help='Items per module, each with one content.')
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--enrollments', type=int, default=3,
+                            help='Courses each student is enrolled in.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Random seed for repeatable catalogs.')
+        parser.add_argument('--tag', default=None,
+                            help='Suffix of generated names, random by default.')
+
+    def handle(self, *args, **options):
+        tag = options['tag'] or uuid.uuid4().hex[:6]
+        seeder = CatalogSeeder(tag, batch_size=options['batch_size'], seed=options['seed'],
+                               progress=self.stdout.write)
+        counts = seeder.run(
+            subject_count=options['subjects'],
+            owner_count=max(1, options['owners']),
+            course_count=options['courses'],
+            modules=options['modules'],
+            items=options['items'],
+            student_count=options['students'],
+            enrollments=options['enrollments'],
+        )
+        self.stdout.write(', '.join(f'{count} {name}' for name, count in counts.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalog '{tag}' created, users are named bench-{tag}-owner-N and "
+            f"bench-{tag}-student-N with password '{PASSWORD}'."
+        ))
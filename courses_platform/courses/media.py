@@ -0,0 +1,146 @@
+"""Streaming delivery of content files with HTTP Range and front proxy offload support."""
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import quote_etag
+from django.utils.text import slugify
+
+from .storage import blob_digest, is_blob_name
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangedFile:
+    """File-like view of `length` bytes of `file` starting at its current position."""
+
+    def __init__(self, file, length: int):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # lets wsgi.file_wrapper use sendfile(), it starts at current offset
+        # and stops at Content-Length
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class StreamedFileResponse(FileResponse):
+    block_size = 64 * 1024
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Return inclusive (start, end) of a single byte range or None to send whole file.
+
+    Multiple ranges are not supported and fall back to the full response as RFC 7233 allows.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # suffix range: last N bytes
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def download_filename(name: str, title: str) -> str:
+    ext = os.path.splitext(name)[1]
+    base = slugify(title) or os.path.splitext(os.path.basename(name))[0]
+    return base + ext
+
+
+def serve_file(request, storage, name: str, title: str = '') -> HttpResponse:
+    """
+    Stream stored file honoring Range requests or delegate it to front proxy.
+
+    Delivery depends on COURSES_MEDIA_SENDFILE: 'django' streams the file itself,
+    'x-accel' returns X-Accel-Redirect for nginx and 'x-sendfile' X-Sendfile for
+    apache/lighttpd. Proxy modes leave Range handling to the proxy.
+    """
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    filename = download_filename(name, title)
+    # blob names are derived from content so the digest is a strong validator
+    etag = quote_etag(blob_digest(name)) if is_blob_name(name) else None
+
+    if etag and etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    mode = settings.COURSES_MEDIA_SENDFILE
+    if mode in ('x-accel', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            response['X-Accel-Redirect'] = settings.COURSES_MEDIA_ACCEL_PREFIX + name
+        else:
+            response['X-Sendfile'] = storage.path(name)
+    else:
+        response = stream_file(request, storage, name, content_type, etag)
+
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['Cache-Control'] = 'private, max-age=86400'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def stream_file(request, storage, name: str, content_type: str,
+                etag: Optional[str]) -> HttpResponse:
+    size = storage.size(name)
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range with a stale validator means client's partial copy is outdated
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    f = storage.open(name, 'rb')
+    if byte_range is None:
+        response = StreamedFileResponse(f, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = StreamedFileResponse(RangedFile(f, end - start + 1), status=206,
+                                        content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.3 on 2026-10-19 03:46
+
+from django.db import migrations
+
+from courses.search import SEARCH_BACKENDS
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor in SEARCH_BACKENDS:
+        SEARCH_BACKENDS[connection.vendor](connection).create_index()
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor in SEARCH_BACKENDS:
+        SEARCH_BACKENDS[connection.vendor](connection).drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_auto_20190702_1142'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='course',
+            options={'ordering': ('-created',)},
+        ),
+        migrations.AlterModelOptions(
+            name='module',
+            options={'ordering': ('order',)},
+        ),
+        # populate with `manage.py rebuild_search_index`
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.3 on 2026-10-19 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['visible', 'subject', 'price'], name='courses_cou_visible_bc1fef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['visible', 'price'], name='courses_cou_visible_1a2c55_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['visible', 'open_date'], name='courses_cou_visible_cc102f_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.3 on 2026-10-19 03:48
+
+import courses.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_course_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='file',
+            field=models.FileField(storage=courses.storage.ContentAddressedStorage(), upload_to='files'),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=models.ImageField(storage=courses.storage.ContentAddressedStorage(), upload_to='images'),
+        ),
+        migrations.AddIndex(
+            model_name='blob',
+            index=models.Index(fields=['references', 'updated'], name='courses_blo_referen_eb1d74_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
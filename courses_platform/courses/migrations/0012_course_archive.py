@@ -0,0 +1,28 @@
+# Generated by Django 2.2.3 on 2026-10-19 03:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_course_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseArchive',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='courses.Course')),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('payload', models.BinaryField(help_text='zlib compressed JSON fixture of the course tree.')),
+                ('size', models.PositiveIntegerField(help_text='Compressed size in bytes.')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
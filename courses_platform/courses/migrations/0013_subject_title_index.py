@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_course_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subject',
+            name='title',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.3 on 2026-10-19 04:10
+
+from itertools import islice
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+CONTENT_MODELS = ('Text', 'File', 'Image', 'Video', 'StringAssignment', 'ChoicesAssignment',
+                  'MultipleChoicesAssignment')
+
+
+def log_existing_objects(apps, schema_editor):
+    """Start the log with every existing module, item and content so first sync gets them all."""
+    ChangeLogEntry = apps.get_model('courses', 'ChangeLogEntry')
+    now = timezone.now()
+    sources = [
+        ('module', apps.get_model('courses', 'Module').objects.values_list('pk', 'course_id')),
+        ('item', apps.get_model('courses', 'Item').objects.values_list('pk', 'module__course_id')),
+    ] + [
+        (name.lower(),
+         apps.get_model('courses', name).objects.values_list('pk', 'item__module__course_id'))
+        for name in CONTENT_MODELS
+    ]
+    for model, rows in sources:
+        entries = (
+            ChangeLogEntry(course_id=course_id, model=model, object_id=pk, action='updated',
+                           changed=now)
+            for pk, course_id in rows.iterator()
+        )
+        while True:
+            batch = list(islice(entries, 1000))
+            if not batch:
+                break
+            ChangeLogEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_subject_title_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=30)),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('updated', 'Created or updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('changed', models.DateTimeField()),
+                ('course', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='changes', to='courses.Course')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['course', 'changed'], name='courses_cha_course__8cbaa2_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='changelogentry',
+            unique_together={('model', 'object_id')},
+        ),
+        migrations.RunPython(log_existing_objects, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_course_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='completing',
+            field=models.BooleanField(default=False),
+        ),
+    ]
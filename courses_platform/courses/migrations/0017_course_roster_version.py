@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_upload_completing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='roster_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
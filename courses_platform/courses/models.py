@@ -1,16 +1,22 @@
-from typing import List
+import json
+import uuid
+import zlib
+from collections import defaultdict
+from typing import Dict, List
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models import Q
 from django.utils.functional import cached_property
 
 from .fields import OrderField
+from .storage import blob_storage
 
 
 class Subject(models.Model):
     """Subject to tag courses with it."""
-    title = models.CharField(max_length=200)
+    title = models.CharField(max_length=200, db_index=True)
     slug = models.SlugField(max_length=200, unique=True, primary_key=True)
 
     class Meta:
@@ -20,6 +26,28 @@ class Subject(models.Model):
         return self.title
 
 
+class CourseQuerySet(models.QuerySet):
+
+    def alive(self):
+        """Courses not scheduled for removal."""
+        return self.filter(deleted=False)
+
+    def visible_to(self, user):
+        """Courses user may see: all for staff, visible and own ones for others."""
+        qs = self.alive()
+        if user.is_staff:
+            return qs
+        if user.is_authenticated:
+            return qs.filter(Q(visible=True) | Q(owner=user.pk))
+        return qs.filter(visible=True)
+
+    def with_member(self, user):
+        """Courses user owns, teaches or studies, all for staff."""
+        if user.is_staff:
+            return self
+        return self.filter(Q(owner=user.pk) | Q(students=user.pk) | Q(teachers=user.pk)).distinct()
+
+
 class Course(models.Model):
     """Course that consist of modules."""
     owner = models.ForeignKey(
@@ -48,14 +76,29 @@ class Course(models.Model):
     slug = models.SlugField(max_length=200)
     overview = models.TextField()
     price = models.PositiveIntegerField(default=0, help_text='Price in USD')
-    created = models.DateTimeField(auto_now_add=True)
+    # default ordering, admin date hierarchy and filters
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
     open_date = models.DateField()
     is_enroll_open = models.BooleanField(default=True)
     visible = models.BooleanField(default=False)
+    # set when course is scheduled for removal, its contents are deleted in background
+    deleted = models.BooleanField(default=False)
+    # set when modules and contents are moved to CourseArchive, course row stays as a stub
+    archived = models.BooleanField(default=False)
+    # bumped whenever students enroll, leave or rename, names stored roster exports
+    roster_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CourseQuerySet.as_manager()
 
     class Meta:
         ordering = ('-created', )
         unique_together = ('owner', 'title', )
+        # match course list filters, leading `visible` column is used by anonymous users
+        indexes = [
+            models.Index(fields=('visible', 'subject', 'price', )),
+            models.Index(fields=('visible', 'price', )),
+            models.Index(fields=('visible', 'open_date', )),
+        ]
 
     def __str__(self):
         return self.title
@@ -65,6 +108,13 @@ class Course(models.Model):
         return sum([module.get_max_score() for module in self.modules.all()])
 
 
+class ModuleQuerySet(models.QuerySet):
+
+    def alive(self):
+        """Modules of courses not scheduled for removal."""
+        return self.filter(course__deleted=False)
+
+
 class Module(models.Model):
     """Course module."""
     course = models.ForeignKey(
@@ -76,6 +126,8 @@ class Module(models.Model):
     description = models.TextField(blank=True)
     order = OrderField(blank=True, for_fields=['course'])
 
+    objects = ModuleQuerySet.as_manager()
+
     class Meta:
         ordering = ('order', )
 
@@ -94,6 +146,13 @@ class Module(models.Model):
         return items
 
 
+class ItemQuerySet(models.QuerySet):
+
+    def alive(self):
+        """Items of courses not scheduled for removal."""
+        return self.filter(module__course__deleted=False)
+
+
 class Item(models.Model):
     """Item with content."""
     CONTENTS_RELATED = [
@@ -114,10 +173,15 @@ class Item(models.Model):
     )
     order = OrderField(for_fields=['module'], blank=True)
 
+    objects = ItemQuerySet.as_manager()
+
     def str(self):
         return f'Item {self.order} of module {self.module.id}'
 
     def all_contents(self):
+        # set by courses.contents.load_contents when contents are fetched for many items at once
+        if hasattr(self, 'loaded_contents'):
+            return self.loaded_contents
         contents = []
         for content_type in Item.CONTENTS_RELATED:
             if hasattr(self, content_type):
@@ -128,6 +192,13 @@ class Item(models.Model):
         return contents
 
 
+class ContentQuerySet(models.QuerySet):
+
+    def alive(self):
+        """Contents of courses not scheduled for removal."""
+        return self.filter(item__module__course__deleted=False)
+
+
 class ContentBase(models.Model):
     """Base class for different content types (video, pics etc)."""
 
@@ -148,6 +219,8 @@ class ContentBase(models.Model):
         related_name='%(class)s_related'
     )
 
+    objects = ContentQuerySet.as_manager()
+
     class Meta:
         abstract = True
         indexes = [
@@ -174,7 +247,7 @@ class Text(ContentBase):
 
 class File(ContentBase):
     """Files attached to modules."""
-    file = models.FileField(upload_to='files')
+    file = models.FileField(upload_to='files', storage=blob_storage)
 
     def __str__(self):
         return f'File {self.file.name}'
@@ -182,7 +255,7 @@ class File(ContentBase):
 
 class Image(ContentBase):
     """Images in modules."""
-    file = models.ImageField(upload_to='images')
+    file = models.ImageField(upload_to='images', storage=blob_storage)
 
     def __str__(self):
         return f'Image {self.file.name}'
@@ -276,3 +349,115 @@ class MultipleChoicesAssignment(BaseAssignment):
             return 0
         # if there are at least one correct answer min score is 1
         return round(correct_answers*self.max_score/num_correct_choices) or 1
+
+
+class Upload(models.Model):
+    """Chunked upload of a large file that becomes File content of the item once completed."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        related_name='uploads',
+        on_delete=models.CASCADE,
+    )
+    item = models.ForeignKey(
+        to=Item,
+        related_name='uploads',
+        on_delete=models.CASCADE,
+    )
+    filename = models.CharField(max_length=255)
+    title = models.CharField(max_length=250, blank=True)
+    size = models.BigIntegerField(help_text='Total size in bytes.')
+    chunk_size = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    # set by the request that completes upload, so parallel ones don't create it twice
+    completing = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'Upload {self.filename} ({self.size} bytes)'
+
+    @property
+    def parts_count(self):
+        return -(-self.size // self.chunk_size)
+
+
+class Blob(models.Model):
+    """File stored once by content digest and shared by all contents that reference it."""
+
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    # last time references changed, garbage collection waits a grace period after it
+    updated = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('references', 'updated', )),
+        ]
+
+    def __str__(self):
+        return f'Blob {self.name} ({self.references} references)'
+
+
+class CourseArchive(models.Model):
+    """Modules, items and contents of archived course, serialized and compressed."""
+
+    course = models.OneToOneField(
+        to=Course,
+        related_name='archive',
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    archived_at = models.DateTimeField(auto_now=True)
+    payload = models.BinaryField(help_text='zlib compressed JSON fixture of the course tree.')
+    size = models.PositiveIntegerField(help_text='Compressed size in bytes.')
+
+    def __str__(self):
+        return f'Archive of course {self.course_id} ({self.size} bytes)'
+
+    def objects_data(self) -> List[dict]:
+        return json.loads(zlib.decompress(self.payload))
+
+    def file_names(self) -> Dict[str, List[str]]:
+        """Names of stored files referenced by archived contents, by model label."""
+        names = defaultdict(list)
+        for obj in self.objects_data():
+            name = obj['fields'].get('file')
+            if name:
+                names[obj['model']].append(name)
+        return names
+
+
+class ChangeLogEntry(models.Model):
+    """Latest change of a module, item or content, kept after deletion as a tombstone."""
+
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (UPDATED, 'Created or updated'),
+        (DELETED, 'Deleted'),
+    )
+
+    # no constraint, entries are written while course trees are being deleted
+    # and removed together with the rest of the course by courses.deletion
+    course = models.ForeignKey(
+        to=Course,
+        related_name='changes',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    # 'module', 'item' or content type like 'text'
+    model = models.CharField(max_length=30)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    changed = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('model', 'object_id', )
+        indexes = [
+            models.Index(fields=('course', 'changed', )),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} {self.action} at {self.changed}'
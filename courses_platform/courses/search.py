@@ -0,0 +1,256 @@
+"""
+Full-text search over courses.
+
+Every course is indexed as a single document built from its title, subject,
+overview, module titles/descriptions and text contents. Index storage depends
+on database vendor: SQLite uses FTS5 virtual table and Postgres uses tsvector
+column with GIN index. Both are hidden behind the same backend interface,
+use `get_search_backend()` to get the one for current connection.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+
+from . import models
+
+SEARCH_TABLE = 'courses_search_index'
+
+# document columns in order of decreasing weight
+DOCUMENT_FIELDS = ('title', 'subject', 'overview', 'modules', 'texts')
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize_query(query: str) -> List[str]:
+    """Split user input to plain word tokens so it's safe to pass to the backend query syntax."""
+    return TOKEN_RE.findall(query.lower())[:settings.COURSES_SEARCH_MAX_TERMS]
+
+
+def course_document(course_id: int, using: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """Collect text of the course and its modules/contents or return None if course is gone."""
+    course = (
+        models.Course.objects.using(using)
+        .filter(pk=course_id)
+        .values('title', 'overview', 'subject__title')
+        .first()
+    )
+    if course is None:
+        return None
+    modules = models.Module.objects.using(using).filter(course_id=course_id)
+    module_text = ' '.join(
+        f'{title} {description}'
+        for title, description in modules.values_list('title', 'description')
+    )
+    texts = models.Text.objects.using(using).filter(item__module__course_id=course_id)
+    return {
+        'title': course['title'],
+        'subject': course['subject__title'] or '',
+        'overview': course['overview'],
+        'modules': module_text,
+        'texts': ' '.join(texts.values_list('content', flat=True)),
+    }
+
+
+class BaseSearchBackend:
+    """Interface of course search index."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self):
+        raise NotImplementedError
+
+    def drop_index(self):
+        raise NotImplementedError
+
+    def write_document(self, course_id: int, document: Dict[str, str]):
+        raise NotImplementedError
+
+    def remove_course(self, course_id: int):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE {self.key_column} = %s', [course_id])
+
+    def search(self, query: str, limit: int, within=None) -> List[Tuple[int, float]]:
+        """
+        Return (course_id, rank) pairs, most relevant first. `within` is a Course
+        queryset restricting the hits, applied before the limit.
+        """
+        raise NotImplementedError
+
+    def restriction(self, within) -> Tuple[str, list]:
+        """SQL condition keeping only courses of `within` queryset, and its params."""
+        if within is None:
+            return '', []
+        query = within.using(self.connection.alias).values('pk').query
+        sql, params = query.get_compiler(connection=self.connection).as_sql()
+        return f'AND {self.key_column} IN ({sql})', list(params)
+
+    def matching_sql(self, query: str) -> Optional[Tuple[str, list]]:
+        """SQL selecting ids of all matching courses and its params, None if query has no words."""
+        raise NotImplementedError
+
+    def index_course(self, course_id: int):
+        """Update course document or remove it from index if course was deleted."""
+        document = course_document(course_id, using=self.connection.alias)
+        if document is None:
+            self.remove_course(course_id)
+        else:
+            self.write_document(course_id, document)
+
+    def rebuild(self) -> int:
+        """Recreate index from scratch, return number of indexed courses."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        course_ids = models.Course.objects.using(self.connection.alias).values_list('pk', flat=True)
+        count = 0
+        for course_id in course_ids.iterator():
+            self.index_course(course_id)
+            count += 1
+        return count
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 index with course id stored as rowid and bm25 ranking."""
+
+    key_column = 'rowid'
+    weights = (10.0, 5.0, 3.0, 2.0, 1.0)
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+                f'USING fts5({", ".join(DOCUMENT_FIELDS)}, tokenize = "porter unicode61")'
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def write_document(self, course_id, document):
+        placeholders = ', '.join(['%s'] * (len(DOCUMENT_FIELDS) + 1))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [course_id])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, {", ".join(DOCUMENT_FIELDS)}) '
+                f'VALUES ({placeholders})',
+                [course_id, *(document[field] for field in DOCUMENT_FIELDS)],
+            )
+
+    def match_expression(self, query: str) -> str:
+        # quoted prefix terms, implicitly AND-ed
+        return ' '.join(f'"{token}"*' for token in tokenize_query(query))
+
+    def matching_sql(self, query):
+        match = self.match_expression(query)
+        if not match:
+            return None
+        return f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match]
+
+    def search(self, query, limit, within=None):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        restriction, params = self.restriction(within)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({SEARCH_TABLE}, {weights}) AS score FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s {restriction} ORDER BY score LIMIT %s',
+                [match, *params, limit],
+            )
+            # bm25 is negative, the lower the better
+            return [(course_id, -score) for course_id, score in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector index ranked with ts_rank."""
+
+    key_column = 'course_id'
+    weights = ('A', 'A', 'B', 'C', 'D')
+
+    @property
+    def config(self):
+        return settings.COURSES_SEARCH_PG_CONFIG
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+                f'course_id integer PRIMARY KEY REFERENCES courses_course (id) '
+                f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                f'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document '
+                f'ON {SEARCH_TABLE} USING GIN (document)'
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def write_document(self, course_id, document):
+        vector = ' || '.join(
+            f"setweight(to_tsvector(%s::regconfig, %s), '{weight}')" for weight in self.weights
+        )
+        params = [course_id]
+        for field in DOCUMENT_FIELDS:
+            params.extend([self.config, document[field]])
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (course_id, document) VALUES (%s, {vector}) '
+                f'ON CONFLICT (course_id) DO UPDATE SET document = EXCLUDED.document',
+                params,
+            )
+
+    def ts_query(self, query: str) -> str:
+        return ' & '.join(f'{token}:*' for token in tokenize_query(query))
+
+    def matching_sql(self, query):
+        tsquery = self.ts_query(query)
+        if not tsquery:
+            return None
+        return (
+            f'SELECT course_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery(%s::regconfig, %s)',
+            [self.config, tsquery],
+        )
+
+    def search(self, query, limit, within=None):
+        tsquery = self.ts_query(query)
+        if not tsquery:
+            return []
+        restriction, params = self.restriction(within)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT course_id, ts_rank(document, query) AS rank '
+                f'FROM {SEARCH_TABLE}, to_tsquery(%s::regconfig, %s) query '
+                f'WHERE document @@ query {restriction} ORDER BY rank DESC LIMIT %s',
+                [self.config, tsquery, *params, limit],
+            )
+            return cursor.fetchall()
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using: Optional[str] = None, write: bool = False) -> BaseSearchBackend:
+    """
+    Return search backend for given database alias.
+
+    By default router's choice for Course reads, or for writes when the backend
+    is used to update the index, so searches may be served by replicas.
+    """
+    if using is None:
+        using = router.db_for_write(models.Course) if write else router.db_for_read(models.Course)
+    connection = connections[using]
+    try:
+        backend_class = SEARCH_BACKENDS[connection.vendor]
+    except KeyError:
+        raise ImproperlyConfigured(f'Course search is not supported for {connection.vendor}')
+    return backend_class(connection)
@@ -0,0 +1,216 @@
+"""
+Generation of large catalogs for benchmarks.
+
+Rows are inserted with bulk_create, so signals don't run: order and content type
+fields are set here, and change log, search index, subject registry and blob
+references are brought up to date once at the end.
+"""
+import random
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import models, subjects
+from .search import get_search_backend
+from .storage import blob_storage
+
+CONTENT_MODELS = (models.Text, models.File, models.Image, models.Video, models.StringAssignment,
+                  models.ChoicesAssignment, models.MultipleChoicesAssignment)
+# 1x1 transparent png
+PLACEHOLDER_IMAGE = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+)
+PASSWORD = 'benchmark'
+TOPICS = ('python', 'django', 'databases', 'math')
+WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet')
+# keeps `course_id IN (...)` below SQLite limit of query parameters
+MAX_COURSES_PER_CHUNK = 500
+
+
+class CatalogSeeder:
+    """
+    Insert subjects, owners, courses with modules, items and contents, and students.
+
+    Every content type is used in turn, so each item has one content and each
+    module gets all types once it has enough items. Names carry `tag` so runs
+    don't collide.
+    """
+
+    def __init__(self, tag: str, batch_size: int = 1000, seed: Optional[int] = None,
+                 progress: Optional[Callable[[str], None]] = None):
+        self.tag = tag
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+        self.files: Dict[type, str] = {}
+
+    def run(self, subject_count: int, owner_count: int, course_count: int, modules: int, items: int,
+            student_count: int, enrollments: int) -> Dict[str, int]:
+        self.files = {
+            models.File: blob_storage.save('files/benchmark.txt', ContentFile(b'benchmark file\n')),
+            models.Image: blob_storage.save('images/benchmark.png', ContentFile(PLACEHOLDER_IMAGE)),
+        }
+        subject_slugs = self.create_subjects(subject_count)
+        owner_ids = self.create_users('owner', owner_count)
+        course_ids = self.create_courses(course_count, subject_slugs, owner_ids)
+        counts = {
+            'subjects': len(subject_slugs), 'owners': len(owner_ids), 'courses': len(course_ids),
+        }
+        # fill as many courses at once as give about a batch of items
+        step = min(max(1, self.batch_size // max(1, modules * items)), MAX_COURSES_PER_CHUNK)
+        for start in range(0, len(course_ids), step):
+            chunk = course_ids[start:start + step]
+            for name, count in self.create_trees(chunk, modules, items).items():
+                counts[name] = counts.get(name, 0) + count
+            self.progress(f'Filled {start + len(chunk)} of {len(course_ids)} courses.')
+        student_ids = self.create_users('student', student_count)
+        counts['students'] = len(student_ids)
+        counts['enrollments'] = self.enroll(student_ids, course_ids, enrollments)
+
+        self.update_blob_references()
+        subjects.invalidate()
+        self.progress('Rebuilding search index.')
+        backend = get_search_backend(write=True)
+        backend.create_index()
+        backend.rebuild()
+        return counts
+
+    def bulk_create(self, model, objects: List):
+        for start in range(0, len(objects), self.batch_size):
+            model.objects.bulk_create(objects[start:start + self.batch_size])
+
+    def create_subjects(self, count: int) -> List[str]:
+        subject_list = [
+            models.Subject(title=f'Benchmark subject {self.tag} {n}',
+                           slug=f'benchmark-{self.tag}-{n}')
+            for n in range(count)
+        ]
+        self.bulk_create(models.Subject, subject_list)
+        return [subject.slug for subject in subject_list]
+
+    def create_users(self, role: str, count: int) -> List[int]:
+        User = get_user_model()
+        prefix = f'bench-{self.tag}-{role}-'
+        password = make_password(PASSWORD)
+        self.bulk_create(User, [
+            User(username=f'{prefix}{n}', password=password) for n in range(count)
+        ])
+        users = User.objects.filter(username__startswith=prefix).order_by('pk')
+        return list(users.values_list('pk', flat=True))
+
+    def create_courses(self, count: int, subject_slugs: List[str],
+                       owner_ids: List[int]) -> List[int]:
+        prefix = f'Benchmark course {self.tag} '
+        today = date.today()
+        courses = []
+        for n in range(count):
+            courses.append(models.Course(
+                owner_id=owner_ids[n % len(owner_ids)],
+                subject_id=self.random.choice(subject_slugs) if subject_slugs else None,
+                title=f'{prefix}{n}',
+                slug=f'benchmark-course-{self.tag}-{n}',
+                overview=f'Course number {n} about {self.random.choice(TOPICS)}.',
+                price=self.random.choice((0, 0, 10, 50, 100)),
+                open_date=today - timedelta(days=self.random.randrange(365)),
+                visible=self.random.random() < 0.9,
+            ))
+        self.bulk_create(models.Course, courses)
+        courses = models.Course.objects.filter(title__startswith=prefix).order_by('pk')
+        return list(courses.values_list('pk', flat=True))
+
+    def create_trees(self, course_ids: List[int], modules: int, items: int) -> Dict[str, int]:
+        with transaction.atomic():
+            self.bulk_create(models.Module, [
+                models.Module(course_id=course_id, title=f'Module {order}', order=order)
+                for course_id in course_ids for order in range(modules)
+            ])
+            module_queryset = models.Module.objects.filter(course_id__in=course_ids)
+            module_rows = list(module_queryset.values_list('pk', 'course_id'))
+            course_of_module = dict(module_rows)
+            self.bulk_create(models.Item, [
+                models.Item(module_id=module_id, order=order)
+                for module_id, _ in module_rows for order in range(items)
+            ])
+            item_rows = list(
+                models.Item.objects.filter(module__course_id__in=course_ids)
+                .values_list('pk', 'module_id')
+            )
+            course_of_item = {
+                item_id: course_of_module[module_id] for item_id, module_id in item_rows
+            }
+            counts = {'modules': len(module_rows), 'items': len(item_rows)}
+            log = [self.log_entry('module', pk, course_id) for pk, course_id in module_rows]
+            log += [
+                self.log_entry('item', pk, course_id) for pk, course_id in course_of_item.items()
+            ]
+
+            owners = dict(
+                models.Course.objects.filter(pk__in=course_ids).values_list('pk', 'owner_id')
+            )
+            by_model: Dict[type, List] = {model: [] for model in CONTENT_MODELS}
+            for item_id, _ in item_rows:
+                model = CONTENT_MODELS[item_id % len(CONTENT_MODELS)]
+                owner_id = owners[course_of_item[item_id]]
+                by_model[model].append(self.content(model, item_id, owner_id))
+            for model, contents in by_model.items():
+                self.bulk_create(model, contents)
+                rows = model.objects.filter(
+                    item__module__course_id__in=course_ids,
+                ).values_list('pk', 'item_id')
+                name = model._meta.model_name
+                entries = [
+                    self.log_entry(name, pk, course_of_item[item_id]) for pk, item_id in rows
+                ]
+                counts[name] = len(entries)
+                log += entries
+            self.bulk_create(models.ChangeLogEntry, log)
+        return counts
+
+    def content(self, model, item_id: int, owner_id: int):
+        fields = {
+            'owner_id': owner_id, 'item_id': item_id, 'order': 0,
+            'content_type': model._meta.model_name,
+            'title': f'{model._meta.verbose_name} {item_id}',
+        }
+        if model is models.Text:
+            fields['content'] = ' '.join(self.random.choice(WORDS) for _ in range(200))
+        elif model in (models.File, models.Image):
+            fields['file'] = self.files[model]
+        elif model is models.Video:
+            fields['url'] = f'https://video.example.com/{item_id}'
+        elif model is models.StringAssignment:
+            fields.update(question='Two plus two?', answer='four', max_score=5)
+        elif model is models.ChoicesAssignment:
+            fields.update(_choices='one,_two,_three', answer='two', max_score=5)
+        else:
+            fields.update(_choices='one,_two,_three', _correct_choices='one,_three', max_score=5)
+        return model(**fields)
+
+    def log_entry(self, model: str, object_id: int, course_id: int):
+        return models.ChangeLogEntry(course_id=course_id, model=model, object_id=object_id,
+                                     action=models.ChangeLogEntry.UPDATED, changed=self.now)
+
+    def enroll(self, student_ids: List[int], course_ids: List[int], per_student: int) -> int:
+        Enrollment = models.Course.students.through
+        per_student = min(per_student, len(course_ids))
+        enrollments = [
+            Enrollment(course_id=course_id, myuser_id=student_id)
+            for student_id in student_ids
+            for course_id in self.random.sample(course_ids, per_student)
+        ]
+        self.bulk_create(Enrollment, enrollments)
+        return len(enrollments)
+
+    def update_blob_references(self):
+        for model, name in self.files.items():
+            # save() added one reference, rows were inserted without it
+            models.Blob.objects.filter(name=name).update(
+                references=model.objects.filter(file=name).count(), updated=timezone.now(),
+            )
@@ -1,13 +1,16 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import IntegrityError
-from django.db.models import ObjectDoesNotExist
 from django.utils.text import slugify
 
-from common.serializers import ListSerializerWithoutNulls
+from common.serializers import DynamicFieldsMixin, ListSerializerWithoutNulls
 from rest_framework import serializers
 from rest_framework.exceptions import NotAcceptable, NotFound
 from rest_framework.reverse import reverse
 
-from . import models
+from . import models, subjects, uploads
 
 #####################
 # Content serializers
@@ -15,6 +18,9 @@ from . import models
 
 # All of the content contain id field so that it can be patched in ModuleItems view
 
+# contents with a stored file served by content_download view
+DOWNLOADABLE_CONTENT_TYPES = ('file', 'image', )
+
 def get_content_serializer_class(content_type: str):
     contents = {
         'text': TextSerializer,
@@ -40,6 +46,12 @@ class ContentSerializer(serializers.Serializer):
             request=self.context.get('request'),
         )
         ret = {**serializer_class(instance).data, 'url': url}
+        if instance.content_type in DOWNLOADABLE_CONTENT_TYPES:
+            ret['download_url'] = reverse(
+                'courses:content_download',
+                args=[instance.content_type, instance.pk, ],
+                request=self.context.get('request'),
+            )
         return ret
 
     def to_internal_value(self, data):
@@ -147,17 +159,31 @@ class FileSerializer(serializers.ModelSerializer):
 
 
 class ImageSerializer(serializers.ModelSerializer):
+    derivatives = serializers.SerializerMethodField()
+
     class Meta:
         model = models.Image
         fields = (
             'content_type',
             'title',
             'file',
+            'derivatives',
             'order',
             'id',
         )
         read_only_fields = ('content_type', 'id', )
 
+    def get_derivatives(self, obj):
+        """Urls of resized versions of the image by size name."""
+        if not obj.pk:
+            return {}
+        url = reverse(
+            'courses:content_download',
+            args=['image', obj.pk],
+            request=self.context.get('request'),
+        )
+        return {size: f'{url}?size={size}' for size in settings.COURSES_IMAGE_DERIVATIVES}
+
 
 class VideoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -193,9 +219,16 @@ class SubjectWithoutCoursesSerializer(serializers.HyperlinkedModelSerializer):
         return ret
 
 
-class CourseWithoutModulesSerializer(serializers.HyperlinkedModelSerializer):
+class CourseSubjectSerializer(DynamicFieldsMixin, SubjectWithoutCoursesSerializer):
+    """Subject of course, taken from subject registry instead of the database."""
+
+    def get_attribute(self, instance):
+        return subjects.get(instance.subject_id)
+
+
+class CourseWithoutModulesSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
 
-    subject = SubjectWithoutCoursesSerializer(required=False)
+    subject = CourseSubjectSerializer(required=False)
 
     class Meta:
         model = models.Course
@@ -216,13 +249,12 @@ class CourseWithoutModulesSerializer(serializers.HyperlinkedModelSerializer):
 
     def create(self, validated_data):
         subject = validated_data.pop('subject', None)
-        subject_obj = None
+        subject_slug = None
         if subject:
-            try:
-                subject_obj = models.Subject.objects.get(title=subject['title'])
-            except ObjectDoesNotExist:
+            subject_slug = subjects.slug_for_title(subject['title'])
+            if subject_slug is None:
                 raise NotFound(detail='Subject does not exist')
-        validated_data['subject_id'] = subject_obj.pk if subject_obj else None
+        validated_data['subject_id'] = subject_slug
         try:
             instance = super().create(validated_data)
         except IntegrityError:
@@ -244,7 +276,7 @@ class CourseWithoutModulesSerializer(serializers.HyperlinkedModelSerializer):
             return None
 
 
-class ModuleWithoutItemsSerializer(serializers.HyperlinkedModelSerializer):
+class ModuleWithoutItemsSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     """Use to provide url and other module info, but without items."""
 
     class Meta:
@@ -257,6 +289,21 @@ class ModuleWithoutItemsSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
+class ModuleChangeSerializer(ModuleWithoutItemsSerializer):
+
+    class Meta(ModuleWithoutItemsSerializer.Meta):
+        fields = ('id', ) + ModuleWithoutItemsSerializer.Meta.fields
+
+
+class ItemWithoutContentsSerializer(serializers.ModelSerializer):
+
+    url = serializers.HyperlinkedIdentityField(view_name='courses:item_detail')
+
+    class Meta:
+        model = models.Item
+        fields = ('id', 'module', 'order', 'url', )
+
+
 ##################################
 # Serializers with related objects
 ##################################
@@ -275,30 +322,34 @@ class SubjectSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     modules = ModuleWithoutItemsSerializer(many=True, read_only=True)
-    subject = SubjectWithoutCoursesSerializer(required=False)
+    subject = CourseSubjectSerializer(required=False)
+
+    collapsed_fields = {
+        'modules': partial(serializers.HyperlinkedRelatedField, view_name='courses:module_detail',
+                           many=True, read_only=True),
+    }
 
     class Meta:
         model = models.Course
-        fields = ('title', 'overview', 'subject', 'price', 'open_date', 'modules', )
+        fields = ('title', 'overview', 'subject', 'price', 'open_date', 'archived', 'modules', )
+        read_only_fields = ('archived', )
 
     def update(self, instance, validated_data):
         # can replace subject but cannot update nested modules
         subject = validated_data.pop('subject', None)
         validated_data.pop('modules', None)
         if subject:
-            try:
-                subject_obj = models.Subject.objects.get(title=subject['title'])
-                validated_data['subject_id'] = subject_obj.pk if subject_obj else None
-            except ObjectDoesNotExist:
+            validated_data['subject_id'] = subjects.slug_for_title(subject['title'])
+            if validated_data['subject_id'] is None:
                 raise NotFound(detail='Subject does not exist')
         instance = super().update(instance, validated_data)
         return instance
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer that supports nested Content creation."""
 
     content = ContentSerializer(source='all_contents', many=True, required=False)
@@ -312,7 +363,7 @@ class ItemSerializer(serializers.ModelSerializer):
     def get_module_url(self, obj):
         return reverse(
             'courses:module_detail',
-            args=[obj.module.pk],
+            args=[obj.module_id],
             request=self.context.get('request')
         )
 
@@ -368,11 +419,18 @@ class ItemSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = ItemSerializer(many=True, read_only=True)
     course = CourseWithoutModulesSerializer()
     items_url = serializers.SerializerMethodField()
 
+    collapsed_fields = {
+        'course': partial(serializers.HyperlinkedRelatedField, view_name='courses:course_detail',
+                          read_only=True),
+        'items': partial(serializers.HyperlinkedRelatedField, view_name='courses:item_detail',
+                         many=True, read_only=True),
+    }
+
     class Meta:
         model = models.Module
         fields = (
@@ -396,3 +454,44 @@ class ModuleSerializer(serializers.ModelSerializer):
             args=[obj.pk],
             request=self.context.get('request')
         )
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """Chunked upload state, `missing_parts` tells what to send after reconnect."""
+
+    url = serializers.HyperlinkedIdentityField(view_name='courses:upload_detail')
+    parts_count = serializers.IntegerField(read_only=True)
+    missing_parts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Upload
+        fields = (
+            'id',
+            'url',
+            'filename',
+            'title',
+            'size',
+            'chunk_size',
+            'parts_count',
+            'missing_parts',
+            'created',
+        )
+        read_only_fields = ('id', 'chunk_size', 'created', )
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.COURSES_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Size must be between 1 and {settings.COURSES_UPLOAD_MAX_SIZE} bytes.'
+            )
+        return value
+
+    def get_missing_parts(self, obj):
+        return uploads.missing_parts(obj)
+
+
+class CourseStudentSerializer(serializers.ModelSerializer):
+    """Student row of course roster."""
+
+    class Meta:
+        model = get_user_model()
+        fields = ('id', 'username', 'first_name', 'last_name', 'email', )
@@ -0,0 +1,189 @@
+"""Signal handlers that keep derived course data in sync with models."""
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import changes, exports, models, subjects
+from .archive import check_tree_writable
+from .contents import content_models
+from .events import broker
+from .images import schedule_derivatives
+from .search import get_search_backend
+
+
+class PendingReindex:
+    """Courses reindexed by commit hooks of one transaction, so each is indexed once."""
+
+    def __init__(self):
+        self.indexed = set()
+        self.ran = False
+
+    def index(self, course_id):
+        self.ran = True
+        if course_id not in self.indexed:
+            self.indexed.add(course_id)
+            get_search_backend(write=True).index_course(course_id)
+
+
+# PendingReindex of each database alias, connections are per thread too
+_pending = threading.local()
+
+
+def reindex_course(course_id):
+    """Schedule course search document refresh after current transaction commits."""
+    if course_id is None:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        get_search_backend(write=True).index_course(course_id)
+        return
+    # every change gets its own hook, so changes rolled back to a savepoint take
+    # only their hooks with them, and the hooks of one commit share the object
+    # that indexes each course once
+    pending = getattr(_pending, connection.alias, None)
+    if pending is None or pending.ran:
+        pending = PendingReindex()
+        setattr(_pending, connection.alias, pending)
+    transaction.on_commit(lambda: pending.index(course_id))
+
+
+def item_course_id(item_id):
+    items = models.Item.objects.filter(pk=item_id)
+    return items.values_list('module__course_id', flat=True).first()
+
+
+@receiver(post_save, sender=models.Course)
+@receiver(post_delete, sender=models.Course)
+def course_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reindex_course(instance.pk)
+
+
+@receiver(post_save, sender=models.Module)
+@receiver(post_delete, sender=models.Module)
+def module_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reindex_course(instance.course_id)
+
+
+@receiver(post_save, sender=models.Text)
+@receiver(post_delete, sender=models.Text)
+def text_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reindex_course(item_course_id(instance.item_id))
+
+
+@receiver(post_save, sender=models.Subject)
+@receiver(post_delete, sender=models.Subject)
+def subject_registry_changed(sender, **kwargs):
+    transaction.on_commit(subjects.invalidate)
+
+
+@receiver(post_save, sender=models.Subject)
+def subject_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for course_id in instance.courses.values_list('pk', flat=True):
+            reindex_course(course_id)
+
+
+def invalidate_rosters(course_ids):
+    # version is bumped in the same transaction, rolled back with the change
+    course_ids = list(course_ids)
+    if course_ids:
+        exports.invalidate_rosters(course_ids)
+
+
+@receiver(m2m_changed, sender=models.Course.students.through)
+def enrollment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_rosters([instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        invalidate_rosters(pk_set)
+    elif reverse and action == 'pre_clear':
+        invalidate_rosters(instance.courses_joined.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=get_user_model())
+def student_changed(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    # logins only update last_login
+    if raw or created or update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_rosters(instance.courses_joined.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def student_deleted(sender, instance, **kwargs):
+    invalidate_rosters(instance.courses_joined.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=models.File)
+@receiver(post_delete, sender=models.Image)
+def release_blob(sender, instance, **kwargs):
+    name, storage = instance.file.name, instance.file.storage
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=models.Image)
+def image_saved(sender, instance, raw=False, **kwargs):
+    if not raw and instance.file:
+        schedule_derivatives(instance.file)
+
+
+def module_course_id(module_id):
+    return models.Module.objects.filter(pk=module_id).values_list('course_id', flat=True).first()
+
+
+def change_target(instance):
+    """Kind, course id and ids of changed module, item or content for change notifications."""
+    if isinstance(instance, models.Module):
+        return 'module', instance.course_id, {'module': instance.pk}
+    if isinstance(instance, models.Item):
+        ids = {'module': instance.module_id, 'item': instance.pk}
+        return 'item', module_course_id(instance.module_id), ids
+    ids = {'item': instance.item_id, 'content_type': instance.content_type, 'content': instance.pk}
+    return 'content', item_course_id(instance.item_id), ids
+
+
+def course_tree_changed(sender, instance, raw=False, created=False, **kwargs):
+    """Record change in course change log and notify event streams of the course."""
+    if raw:
+        return
+    kind, course_id, ids = change_target(instance)
+    if course_id is None:
+        return
+    deleted = kwargs['signal'] is post_delete
+    changes.record(
+        course_id,
+        instance.content_type if kind == 'content' else kind,
+        instance.pk,
+        deleted,
+    )
+    if broker.has_subscribers(course_id):
+        action = 'deleted' if deleted else 'created' if created else 'updated'
+        event = {'type': f'{kind}.{action}', 'course': course_id, **ids}
+        transaction.on_commit(lambda: broker.publish(course_id, event))
+
+
+@receiver(post_delete, sender=models.Course)
+def course_deleted(sender, instance, **kwargs):
+    # course is deleted after its tree, so every entry written meanwhile is gone too
+    models.ChangeLogEntry.objects.filter(course_id=instance.pk).delete()
+
+
+def course_tree_changing(sender, instance, raw=False, **kwargs):
+    if not raw:
+        check_tree_writable(instance)
+
+
+for model in (models.Module, models.Item, *content_models()):
+    name = model.__name__
+    pre_save.connect(course_tree_changing, sender=model, dispatch_uid=f'course_tree_saving_{name}')
+    pre_delete.connect(course_tree_changing, sender=model,
+                       dispatch_uid=f'course_tree_deleting_{name}')
+    post_save.connect(course_tree_changed, sender=model, dispatch_uid=f'course_tree_saved_{name}')
+    post_delete.connect(course_tree_changed, sender=model,
+                        dispatch_uid=f'course_tree_deleted_{name}')
@@ -0,0 +1,119 @@
+"""
+Server-Sent Events stream of course changes, `courses/<pk>/events/`.
+
+It's a plain ASGI application mounted in `config.asgi` next to Django, so an
+idle connection costs a buffer on the event loop rather than a worker thread.
+Enrolled students, teachers, owner and staff may listen. Each message is a
+JSON change notification, a `reset` event means some were dropped and the
+client should reload the course.
+"""
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.db import close_old_connections
+from django.utils.crypto import constant_time_compare
+
+from . import models
+from .events import broker
+
+EVENTS_PATH = re.compile(r'^/api/v0\.1/courses/(?P<pk>\d+)/events/$')
+
+
+def session_user(scope):
+    """User logged in with session cookie of the request, None for anonymous."""
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value)
+    if SESSION_KEY not in session or BACKEND_SESSION_KEY not in session:
+        return None
+    user = get_user_model()._default_manager.filter(pk=session[SESSION_KEY], is_active=True).first()
+    # same check as django.contrib.auth.get_user, sessions die with password change
+    if user is None:
+        return None
+    if not constant_time_compare(session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()):
+        return None
+    return user
+
+
+def may_listen(scope, course_id: int) -> bool:
+    try:
+        user = session_user(scope)
+        if user is None:
+            return False
+        return models.Course.objects.filter(pk=course_id, deleted=False).with_member(user).exists()
+    finally:
+        close_old_connections()
+
+
+def format_event(event: dict) -> bytes:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def course_events(scope, receive, send, course_id: int):
+    if not await sync_to_async(may_listen)(scope, course_id):
+        await send({
+            'type': 'http.response.start',
+            'status': 403,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'{"detail": "Not allowed to follow this course."}',
+        })
+        return
+
+    subscription = broker.subscribe(course_id)
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # nginx would otherwise buffer the stream
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while True:
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=settings.COURSES_EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                next_event.cancel()
+                return
+            if next_event in done:
+                chunk = b''
+                if subscription.lost:
+                    subscription.lost = False
+                    chunk += b'event: reset\ndata: {}\n\n'
+                chunk += format_event(next_event.result())
+            else:
+                next_event.cancel()
+                chunk = b': keep-alive\n\n'
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
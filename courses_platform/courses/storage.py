@@ -0,0 +1,163 @@
+"""Content-addressed file storage for course contents."""
+import hashlib
+import io
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_path(path: str) -> str:
+    """Return sha256 hex digest of a file on disk."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_blob_name(name: str) -> bool:
+    return name.startswith(BLOB_PREFIX + '/')
+
+
+def blob_digest(name: str) -> str:
+    """Extract digest from blob name, i.e. 'blobs/ab/cd/abcd...ef.pdf' -> 'abcd...ef'."""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Store every distinct file once under its sha256 digest.
+
+    Requested name is only used for its extension, file is saved as
+    `blobs/ab/cd/<digest><ext>` so identical uploads share one file on disk.
+    Every save adds a reference to the blob and delete() releases one,
+    unreferenced blobs are removed from disk by `collect_blobs` command.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # names are derived from content, same name means same file
+        return name
+
+    def blob_name(self, digest: str, ext: str) -> str:
+        return '/'.join([BLOB_PREFIX, digest[:2], digest[2:4], digest + ext])
+
+    def _save(self, name, content):
+        # reference is added and file written in one transaction, so collect()
+        # can't remove the blob between the two
+        with transaction.atomic():
+            return self._save_blob(name, content)
+
+    def _save_blob(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        if hasattr(content, 'temporary_file_path'):
+            # upload already written to disk by upload handler, hash and move it in place
+            path = content.temporary_file_path()
+            # writer may have hashed it already, i.e. chunked upload assembly
+            digest = getattr(content, 'sha256', None) or hash_path(path)
+            blob_name = self.blob_name(digest, ext)
+            self._add_reference(blob_name, content.size)
+            if not self.exists(blob_name):
+                self._ensure_dir(blob_name)
+                file_move_safe(path, self.path(blob_name))
+        elif isinstance(getattr(content, 'file', None), io.BytesIO):
+            # small in-memory upload, hash first and write only if it's a new blob
+            hasher = hashlib.sha256()
+            for chunk in content.chunks():
+                hasher.update(chunk)
+            blob_name = self.blob_name(hasher.hexdigest(), ext)
+            self._add_reference(blob_name, content.size)
+            if not self.exists(blob_name):
+                self._write_stream(content, blob_name)
+        else:
+            blob_name = self._save_stream(content, ext)
+        return blob_name
+
+    def _save_stream(self, content, ext: str) -> str:
+        """Write stream to temporary file while hashing it, keep it only if blob is new."""
+        tmp_dir = self.path(os.path.join(BLOB_PREFIX, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+            try:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            except Exception:
+                os.unlink(tmp.name)
+                raise
+        blob_name = self.blob_name(hasher.hexdigest(), ext)
+        self._add_reference(blob_name, size)
+        if self.exists(blob_name):
+            os.unlink(tmp.name)
+        else:
+            self._ensure_dir(blob_name)
+            os.replace(tmp.name, self.path(blob_name))
+        return blob_name
+
+    def _write_stream(self, content, blob_name: str):
+        self._ensure_dir(blob_name)
+        path = self.path(blob_name)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+    def _ensure_dir(self, name: str):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+
+    def _add_reference(self, name: str, size: int):
+        Blob = apps.get_model('courses', 'Blob')
+        now = timezone.now()
+        updated = Blob.objects.filter(name=name).update(references=F('references') + 1, updated=now)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    Blob.objects.create(name=name, size=size, references=1, updated=now)
+            except IntegrityError:
+                # created concurrently
+                Blob.objects.filter(name=name).update(references=F('references') + 1, updated=now)
+
+    def delete(self, name):
+        """Release one reference, file itself is removed by garbage collection."""
+        if not is_blob_name(name):
+            return super().delete(name)
+        self.release(name)
+
+    def release(self, name, count: int = 1):
+        """Drop `count` references to blob."""
+        Blob = apps.get_model('courses', 'Blob')
+        Blob.objects.filter(name=name, references__gte=count).update(
+            references=F('references') - count,
+            updated=timezone.now(),
+        )
+
+    def purge(self, name):
+        """Remove blob file from disk regardless of references."""
+        super().delete(name)
+
+    def collect(self, name) -> bool:
+        """Remove blob if nothing references it, return whether it was removed."""
+        Blob = apps.get_model('courses', 'Blob')
+        with transaction.atomic():
+            # conditional delete, so blob referenced in the meantime survives
+            deleted, _ = Blob.objects.filter(name=name, references=0).delete()
+            if deleted:
+                self.purge(name)
+        return bool(deleted)
+
+
+blob_storage = ContentAddressedStorage()
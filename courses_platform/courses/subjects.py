@@ -0,0 +1,80 @@
+"""
+In-process registry of subjects.
+
+Subjects change rarely but are read by almost every course request, so each
+process keeps all of them in memory. The copy carries a version stamp compared
+with the one in the shared cache on every access; saving or deleting a subject
+writes a new stamp, and processes reload subjects with one query when they see it.
+A subject missing from the copy is looked up in the database too, so a process
+that missed the stamp, e.g. without a shared cache, still finds new subjects.
+"""
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+
+from . import models
+
+VERSION_KEY = 'courses:subjects:version'
+
+_lock = threading.Lock()
+_version: Optional[str] = None
+_by_slug: Dict[str, models.Subject] = {}
+_by_title: Dict[str, models.Subject] = {}
+
+
+def current_version() -> str:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # cache restarted or key evicted, nobody knows what others have loaded
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _load(reload: bool = False) -> Dict[str, models.Subject]:
+    global _version, _by_slug, _by_title
+    version = current_version()
+    if reload or version != _version:
+        with _lock:
+            if reload or version != _version:
+                subjects = list(models.Subject.objects.all())
+                _by_slug = {subject.slug: subject for subject in subjects}
+                _by_title = {subject.title: subject for subject in subjects}
+                _version = version
+    return _by_slug
+
+
+def invalidate():
+    """Make every process reload subjects on next access."""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def get(slug: Optional[str]) -> Optional[models.Subject]:
+    if slug is None:
+        return None
+    subject = _load().get(slug)
+    if subject is None and models.Subject.objects.filter(slug=slug).exists():
+        subject = _load(reload=True).get(slug)
+    return subject
+
+
+def get_by_title(title: str) -> Optional[models.Subject]:
+    _load()
+    subject = _by_title.get(title)
+    if subject is None and models.Subject.objects.filter(title=title).exists():
+        _load(reload=True)
+        subject = _by_title.get(title)
+    return subject
+
+
+def slug_for_title(title: str) -> Optional[str]:
+    subject = get_by_title(title)
+    return subject.slug if subject else None
+
+
+def all_subjects() -> List[models.Subject]:
+    """Subjects in model ordering."""
+    return sorted(_load().values(), key=lambda subject: subject.title)
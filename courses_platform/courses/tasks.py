@@ -0,0 +1,29 @@
+from tasks.queue import report_progress, task
+
+from . import archive, exports
+from .deletion import purge_course
+from .images import evict_lazy_derivatives, generate_derivatives  # noqa: F401
+
+
+@task(priority=-10)
+def delete_course(course_id: int):
+    """Delete course with its modules, items and contents in batches."""
+    purge_course(course_id, progress=report_progress)
+
+
+@task(priority=-10)
+def archive_course(course_id: int):
+    """Move course tree into archive table."""
+    archive.archive_course(course_id, progress=report_progress)
+
+
+@task(priority=5)
+def restore_course(course_id: int):
+    """Bring archived course tree back, someone is waiting for it."""
+    archive.restore_course(course_id)
+
+
+@task(priority=-5)
+def export_roster(course_id: int):
+    """Store CSV of course students for download."""
+    exports.generate_roster_file(course_id)
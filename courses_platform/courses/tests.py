@@ -1,3 +1,876 @@
-from django.test import TestCase
-
-# Create your tests here.
+import asyncio
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config.asgi import application
+from tasks import queue
+from tasks.models import Task
+
+from . import archive, changes, deletion, exports, models, seed, subjects, uploads
+from .events import Broker, broker
+from .media import RangeNotSatisfiable, parse_range
+from .search import SQLiteSearchBackend
+from .storage import blob_storage
+
+
+def create_user(username, **kwargs):
+    return get_user_model().objects.create_user(
+        username=username, password='test_password', **kwargs
+    )
+
+
+def create_course(owner, **kwargs):
+    fields = {
+        'title': 'Course',
+        'slug': 'course',
+        'overview': 'Overview',
+        'open_date': datetime.date(2020, 1, 1),
+        'visible': True,
+        **kwargs,
+    }
+    return models.Course.objects.create(owner=owner, **fields)
+
+
+def create_tree(course, items=1):
+    """Module of course with `items` items holding one text each."""
+    module = models.Module.objects.create(course=course, title='Module')
+    for _ in range(items):
+        item = models.Item.objects.create(module=module)
+        models.Text.objects.create(owner=course.owner, item=item, title='Text', content='Some text')
+    return module
+
+
+class SearchIndexTests(TransactionTestCase):
+
+    def test_course_reindexed_once_per_transaction(self):
+        owner = create_user('owner')
+        course = create_course(owner)
+        with mock.patch.object(SQLiteSearchBackend, 'index_course') as index_course:
+            with transaction.atomic():
+                create_tree(course, items=3)
+        index_course.assert_called_once_with(course.pk)
+
+    def test_rolled_back_changes_are_not_indexed(self):
+        owner = create_user('owner')
+        course = create_course(owner)
+        with mock.patch.object(SQLiteSearchBackend, 'index_course') as index_course:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                create_tree(course)
+                raise RuntimeError
+            with transaction.atomic():
+                models.Module.objects.create(course=course, title='Other')
+        index_course.assert_called_once_with(course.pk)
+
+    def test_changes_rolled_back_to_savepoint_are_not_indexed(self):
+        owner = create_user('owner')
+        kept = create_course(owner)
+        dropped = create_course(owner, title='Other', slug='other')
+        with mock.patch.object(SQLiteSearchBackend, 'index_course') as index_course:
+            with transaction.atomic():
+                create_tree(kept)
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    create_tree(dropped)
+                    raise RuntimeError
+                models.Module.objects.create(course=kept, title='Other')
+        index_course.assert_called_once_with(kept.pk)
+
+    def test_search_finds_indexed_course(self):
+        owner = create_user('owner')
+        course = create_course(owner, title='Practical astronomy')
+        response = self.client.get('/api/v0.1/courses/search/', {'q': 'astro'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit['title'] for hit in response.json()['results']], [course.title])
+
+    @override_settings(COURSES_SEARCH_MAX_RESULTS=1)
+    def test_hidden_courses_do_not_take_up_results(self):
+        owner = create_user('owner')
+        for number in range(3):
+            create_course(owner, title=f'Astronomy astronomy {number}', slug=f'hidden-{number}',
+                          visible=False)
+        create_course(owner, title='Astronomy', overview='Stars')
+        response = self.client.get('/api/v0.1/courses/search/', {'q': 'astronomy'})
+        self.assertEqual([hit['title'] for hit in response.json()['results']], ['Astronomy'])
+        self.client.force_login(owner)
+        response = self.client.get('/api/v0.1/courses/search/', {'q': 'astronomy'})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertNotEqual(response.json()['results'][0]['title'], 'Astronomy')
+
+    @override_settings(COURSES_SEARCH_MAX_RESULTS=1)
+    def test_admin_search_is_not_capped(self):
+        owner = create_user('owner', is_staff=True, is_superuser=True)
+        for number in range(3):
+            create_course(owner, title=f'Astronomy {number}', slug=f'astronomy-{number}')
+        self.client.force_login(owner)
+        response = self.client.get('/admin/courses/course/?q=astro')
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+
+class UploadTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root, COURSES_UPLOAD_DIR=f'{self.media_root}/uploads',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        owner = create_user('owner')
+        item = create_tree(create_course(owner)).items.get()
+        self.data = bytes(range(256)) * 10
+        self.upload = models.Upload.objects.create(
+            owner=owner, item=item, filename='data.bin', title='Data',
+            size=len(self.data), chunk_size=1000,
+        )
+
+    def write_part(self, index):
+        part = self.data[index * 1000:(index + 1) * 1000]
+        uploads.write_part(self.upload, index, io.BytesIO(part), len(part))
+
+    def test_parts_in_any_order_make_the_file(self):
+        for index in (2, 0):
+            self.write_part(index)
+        self.assertEqual(uploads.missing_parts(self.upload), [1])
+        self.write_part(1)
+        content = uploads.complete(self.upload)
+        with content.file.open() as f:
+            self.assertEqual(f.read(), self.data)
+        # same blob as the file uploaded at once
+        self.assertIn(hashlib.sha256(self.data).hexdigest(), content.file.name)
+        self.assertFalse(models.Upload.objects.filter(pk=self.upload.pk).exists())
+
+    def test_incomplete_part_is_not_received(self):
+        with self.assertRaises(uploads.UploadError):
+            uploads.write_part(self.upload, 0, io.BytesIO(self.data[:10]), 1000)
+        self.assertEqual(uploads.missing_parts(self.upload), [0, 1, 2])
+
+    def test_upload_is_completed_once(self):
+        for index in range(3):
+            self.write_part(index)
+        models.Upload.objects.filter(pk=self.upload.pk).update(completing=True)
+        with self.assertRaises(uploads.UploadError):
+            uploads.complete(self.upload)
+        self.assertFalse(models.File.objects.exists())
+
+    def test_failed_completion_keeps_upload(self):
+        for index in range(3):
+            self.write_part(index)
+        with mock.patch.object(models.File, 'save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                uploads.complete(self.upload)
+        self.assertFalse(models.Blob.objects.exists())
+        self.upload.refresh_from_db()
+        self.assertFalse(self.upload.completing)
+        content = uploads.complete(self.upload)
+        with content.file.open() as f:
+            self.assertEqual(f.read(), self.data)
+
+
+class EnrollTests(TestCase):
+
+    def setUp(self):
+        self.owner = create_user('owner')
+        self.student = create_user('student')
+        self.client.force_login(self.student)
+
+    def enroll(self, course):
+        return self.client.post(f'/api/v0.1/courses/{course.pk}/enroll/')
+
+    def test_student_enrolls_in_visible_course(self):
+        course = create_course(self.owner)
+        self.assertEqual(self.enroll(course).status_code, 200)
+        self.assertTrue(course.students.filter(pk=self.student.pk).exists())
+
+    def test_hidden_deleted_and_archived_courses_are_not_found(self):
+        courses = [
+            create_course(self.owner, title='Hidden', slug='hidden', visible=False),
+            create_course(self.owner, title='Deleted', slug='deleted', deleted=True),
+            create_course(self.owner, title='Archived', slug='archived', archived=True),
+        ]
+        for course in courses:
+            self.assertEqual(self.enroll(course).status_code, 404)
+            self.assertFalse(course.students.exists())
+
+
+class RosterExportTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.course = create_course(create_user('owner'))
+
+    def test_stored_roster_is_served_until_roster_changes(self):
+        student = create_user('student')
+        self.course.students.add(student)
+        name = exports.generate_roster_file(self.course.pk)
+        self.assertEqual(exports.stored_roster(self.course.pk), name)
+        student.first_name = 'Ann'
+        student.save()
+        self.assertIsNone(exports.stored_roster(self.course.pk))
+        self.course.students.remove(student)
+        self.assertNotEqual(exports.generate_roster_file(self.course.pk), name)
+
+    def test_rolled_back_enrollment_keeps_version(self):
+        version = exports.roster_version(self.course.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.course.students.add(create_user('student'))
+            raise RuntimeError
+        self.assertEqual(exports.roster_version(self.course.pk), version)
+
+
+class SubjectRegistryTests(TestCase):
+
+    def test_subject_unknown_to_process_is_read_from_database(self):
+        subjects.all_subjects()
+        # created by another process whose new version stamp this one didn't see
+        models.Subject.objects.bulk_create([models.Subject(title='Physics', slug='physics')])
+        self.assertEqual(subjects.get('physics').title, 'Physics')
+        self.assertEqual(subjects.slug_for_title('Physics'), 'physics')
+        self.assertIsNone(subjects.get('chemistry'))
+
+
+class ChangesTests(TestCase):
+
+    def test_pages_of_entries_changed_at_the_same_time(self):
+        course = create_course(create_user('owner'))
+        changed = timezone.now() - datetime.timedelta(hours=1)
+        models.ChangeLogEntry.objects.bulk_create([
+            models.ChangeLogEntry(course=course, model='item', object_id=object_id,
+                                  action=models.ChangeLogEntry.UPDATED, changed=changed)
+            for object_id in range(25)
+        ])
+        pages, since, after, more = [], None, None, True
+        while more:
+            entries, since, after, more = changes.changes_since(course.pk, since, after, limit=10)
+            pages.append([entry.object_id for entry in entries])
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sorted(sum(pages, [])), list(range(25)))
+        entries, *_ = changes.changes_since(course.pk, since, after, limit=10)
+        self.assertEqual(entries, [])
+
+
+@override_settings(COURSES_CHANGES_SETTLE_SECONDS=0)
+class ChangesViewTests(TestCase):
+
+    def setUp(self):
+        self.course = create_course(create_user('owner'))
+        self.module = create_tree(self.course, items=2)
+        self.url = f'/api/v0.1/courses/{self.course.pk}/changes/'
+        self.client.force_login(self.course.owner)
+
+    def sync(self, **params):
+        pages, more = [], True
+        while more:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            pages.append(page)
+            params = {**params, 'since': page['until']}
+            if page['after'] is not None:
+                params['after'] = page['after']
+            else:
+                params.pop('after', None)
+            more = page['more']
+        return pages
+
+    def test_pages_of_changes_and_tombstones(self):
+        text = models.Text.objects.filter(item__module=self.module).first()
+        text_id = text.pk
+        text.delete()
+        pages = self.sync(limit=2)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual([module['id'] for page in pages for module in page['modules']],
+                         [self.module.pk])
+        self.assertEqual(sum(len(page['items']) for page in pages), 2)
+        self.assertEqual(sum(len(page['contents']) for page in pages), 1)
+        self.assertEqual([(deleted['model'], deleted['id'])
+                          for page in pages for deleted in page['deleted']], [('text', text_id)])
+        # nothing new since the last page
+        last = self.client.get(self.url, {'since': pages[-1]['until']}).json()
+        self.assertEqual((last['modules'], last['items'], last['contents'], last['deleted']),
+                         ([], [], [], []))
+
+    def test_changes_older_than_tombstones_are_gone(self):
+        since = (timezone.now() - datetime.timedelta(days=365)).isoformat()
+        self.assertEqual(self.client.get(self.url, {'since': since}).status_code, 410)
+
+    def test_since_without_offset_is_utc(self):
+        self.assertEqual(self.client.get(self.url, {'since': '2020-01-01T00:00:00'}).status_code,
+                         410)
+        since = (timezone.now() - datetime.timedelta(hours=1)).replace(tzinfo=None)
+        response = self.client.get(self.url, {'since': since.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 2)
+        since = (timezone.now() + datetime.timedelta(hours=1)).replace(tzinfo=None)
+        self.assertEqual(self.client.get(self.url, {'since': since.isoformat()}).json()['items'],
+                         [])
+
+
+class ArchiveTests(TestCase):
+
+    def test_restored_contents_keep_their_times(self):
+        course = create_course(create_user('owner'))
+        create_tree(course, items=2)
+        created = (timezone.now() - datetime.timedelta(days=30)).replace(microsecond=0)
+        models.Text.objects.update(created=created, update=created)
+        archive.archive_course(course.pk)
+        self.assertFalse(models.Text.objects.exists())
+        archive.restore_course(course.pk)
+        self.assertEqual(
+            list(models.Text.objects.values_list('created', 'update')), [(created, created)] * 2
+        )
+
+    def test_archive_and_restore_are_in_change_log(self):
+        course = create_course(create_user('owner'))
+        module = create_tree(course, items=2)
+        tree = {('module', module.pk)}
+        tree.update(('item', pk) for pk in models.Item.objects.values_list('pk', flat=True))
+        tree.update(('text', pk) for pk in models.Text.objects.values_list('pk', flat=True))
+        entries = models.ChangeLogEntry.objects.filter(course=course)
+        with mock.patch.object(archive.broker, 'has_subscribers', return_value=True), \
+                mock.patch.object(archive.broker, 'publish') as publish:
+            archive.archive_course(course.pk)
+        publish.assert_called_once_with(course.pk, {'type': 'course.archived', 'course': course.pk})
+        self.assertEqual(set(entries.values_list('model', 'object_id')), tree)
+        self.assertEqual(set(entries.values_list('action', flat=True)),
+                         {models.ChangeLogEntry.DELETED})
+        archive.restore_course(course.pk)
+        self.assertEqual(set(entries.values_list('model', 'object_id')), tree)
+        self.assertEqual(set(entries.values_list('action', flat=True)),
+                         {models.ChangeLogEntry.UPDATED})
+
+    def test_tree_of_archived_course_is_read_only(self):
+        course = create_course(create_user('owner'))
+        module = create_tree(course)
+        models.Course.objects.filter(pk=course.pk).update(archived=True)
+        with self.assertRaises(archive.CourseArchived):
+            models.Module.objects.create(course=course, title='Other')
+        with self.assertRaises(archive.CourseArchived):
+            module.items.get().text_related.get().save()
+        with self.assertRaises(archive.CourseArchived):
+            module.delete()
+
+
+class CourseFilterTests(TestCase):
+
+    def setUp(self):
+        models.Subject.objects.bulk_create([
+            models.Subject(title='Physics', slug='physics'),
+            models.Subject(title='Chemistry', slug='chemistry'),
+        ])
+        owner = create_user('owner')
+        for slug, subject, price, open_date in (
+            ('free', 'physics', 0, datetime.date(2020, 1, 1)),
+            ('cheap', 'physics', 30, datetime.date(2020, 6, 1)),
+            ('pricey', 'chemistry', 700, datetime.date(2021, 1, 1)),
+            ('other', None, 60, datetime.date(2021, 6, 1)),
+        ):
+            create_course(owner, title=slug, slug=slug, subject_id=subject, price=price,
+                          open_date=open_date)
+        create_course(owner, title='hidden', slug='hidden', subject_id='physics', visible=False)
+
+    def titles(self, **params):
+        response = self.client.get('/api/v0.1/courses/', {'fields': 'title', **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(course['title'] for course in response.json())
+
+    def test_filters(self):
+        self.assertEqual(self.titles(subject='physics'), ['cheap', 'free'])
+        self.assertEqual(self.titles(subject='physics,chemistry'), ['cheap', 'free', 'pricey'])
+        self.assertEqual(self.titles(price_min=30, price_max=60), ['cheap', 'other'])
+        self.assertEqual(self.titles(price_max=0), ['free'])
+        self.assertEqual(self.titles(open_after='2020-06-01', open_before='2021-01-01'),
+                         ['cheap', 'pricey'])
+        self.assertEqual(self.titles(subject='physics', price_min=1), ['cheap'])
+
+    def test_invalid_filters(self):
+        for params in (
+            {'price_min': 100, 'price_max': 50},
+            {'price_min': -1},
+            {'open_after': '2020-13-01'},
+        ):
+            response = self.client.get('/api/v0.1/courses/', params)
+            self.assertEqual(response.status_code, 400, params)
+            response = self.client.get('/api/v0.1/courses/facets/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_facets(self):
+        response = self.client.get('/api/v0.1/courses/facets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'total': 4,
+            'subject': {'physics': 2, 'chemistry': 1, 'null': 1},
+            'price': {'0': 1, '1-50': 1, '51-100': 1, '501+': 1},
+        })
+        response = self.client.get('/api/v0.1/courses/facets/', {'subject': 'physics'})
+        self.assertEqual(response.json(), {
+            'total': 2, 'subject': {'physics': 2}, 'price': {'0': 1, '1-50': 1},
+        })
+
+
+class SparseFieldsetsTests(TestCase):
+
+    def setUp(self):
+        models.Subject.objects.create(title='Physics', slug='physics')
+        self.course = create_course(create_user('owner'), subject_id='physics')
+        self.module = create_tree(self.course, items=2)
+
+    def test_list_returns_asked_fields(self):
+        response = self.client.get('/api/v0.1/courses/', {'fields': 'title,subject.title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{'title': 'Course', 'subject': {'title': 'Physics'}}])
+
+    def test_unknown_fields_are_rejected(self):
+        # list shows courses without modules, only detail has them
+        response = self.client.get('/api/v0.1/courses/', {'fields': 'title,modules'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': 'Unknown fields: modules.'})
+        response = self.client.get(f'/api/v0.1/courses/{self.course.pk}/', {'fields': 'modules'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_overview_is_fetched_only_when_asked_for(self):
+        for fields, fetched in (('title', False), ('title,overview', True)):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/v0.1/courses/', {'fields': fields})
+            self.assertEqual(response.status_code, 200)
+            sql = ' '.join(query['sql'] for query in queries)
+            self.assertEqual('"overview"' in sql, fetched, fields)
+
+    def test_detail_expands_asked_nested_objects(self):
+        url = f'/api/v0.1/courses/{self.course.pk}/'
+        response = self.client.get(url, {'fields': 'modules.title'})
+        self.assertEqual(response.json(), {'modules': [{'title': 'Module'}]})
+        response = self.client.get(url, {'fields': 'title,modules', 'expand': ''})
+        self.assertEqual(response.json(), {
+            'title': 'Course',
+            'modules': [f'http://testserver/api/v0.1/modules/{self.module.pk}/'],
+        })
+
+    def test_module_detail_collapses_nested_objects_not_expanded(self):
+        self.client.force_login(create_user('admin', is_staff=True, is_superuser=True))
+        url = f'/api/v0.1/modules/{self.module.pk}/'
+        response = self.client.get(url, {'fields': 'course,items', 'expand': 'course'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['course']['title'], 'Course')
+        self.assertEqual(data['items'], [
+            f'http://testserver/api/v0.1/items/{item.pk}/' for item in self.module.items.all()
+        ])
+        response = self.client.get(url, {'fields': 'items.url'})
+        self.assertEqual(response.json(), {'items': [
+            {'url': f'http://testserver/api/v0.1/items/{item.pk}/'}
+            for item in self.module.items.all()
+        ]})
+
+
+class CourseStreamTests(TestCase):
+
+    def test_only_staff_streams_courses(self):
+        create_course(create_user('owner'))
+        self.assertEqual(self.client.get('/api/v0.1/courses/?stream=json').status_code, 403)
+        self.client.force_login(create_user('student'))
+        self.assertEqual(self.client.get('/api/v0.1/courses/?stream=ndjson').status_code, 403)
+        self.client.force_login(create_user('staff', is_staff=True))
+        response = self.client.get('/api/v0.1/courses/?stream=json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 1)
+
+
+class DeletedCourseTests(TestCase):
+
+    def test_tree_of_deleted_course_is_not_found(self):
+        owner = create_user('owner', is_staff=True)
+        course = create_course(owner, deleted=True)
+        module = create_tree(course)
+        item = module.items.get()
+        text = item.text_related.get()
+        self.client.force_login(owner)
+        for url in (
+            f'/api/v0.1/courses/{course.pk}/modules/',
+            f'/api/v0.1/modules/{module.pk}/',
+            f'/api/v0.1/modules/{module.pk}/items/',
+            f'/api/v0.1/items/{item.pk}/',
+            f'/api/v0.1/contents/text/{text.pk}/',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        response = self.client.get(f'/api/v0.1/users/{owner.pk}/courses/')
+        self.assertEqual(response.json(), [])
+
+
+class BlobStorageTests(TransactionTestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        owner = create_user('owner')
+        self.item = create_tree(create_course(owner)).items.get()
+
+    def create_file(self, data, name='notes.txt'):
+        content = models.File(owner=self.item.module.course.owner, item=self.item, title=name)
+        content.file.save(name, ContentFile(data), save=True)
+        return content
+
+    def collect(self, *args):
+        call_command('collect_blobs', '--grace-hours', '0', *args, stdout=io.StringIO())
+
+    def test_same_bytes_share_one_blob(self):
+        first = self.create_file(b'same bytes')
+        second = self.create_file(b'same bytes', name='copy.txt')
+        other = self.create_file(b'other bytes')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertIn(hashlib.sha256(b'same bytes').hexdigest(), first.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertEqual(models.Blob.objects.get(name=first.file.name).references, 2)
+        self.assertEqual(models.Blob.objects.get(name=other.file.name).references, 1)
+
+    def test_unreferenced_blob_is_collected(self):
+        first = self.create_file(b'same bytes')
+        second = self.create_file(b'same bytes')
+        name = first.file.name
+        path = blob_storage.path(name)
+        first.delete()
+        self.assertEqual(models.Blob.objects.get(name=name).references, 1)
+        self.collect()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertEqual(models.Blob.objects.get(name=name).references, 0)
+        self.collect('--dry-run')
+        self.assertTrue(os.path.exists(path))
+        self.collect()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(models.Blob.objects.exists())
+
+    def test_recount_fixes_references(self):
+        content = self.create_file(b'bytes')
+        models.Blob.objects.update(references=0)
+        self.collect()
+        self.assertEqual(models.Blob.objects.get(name=content.file.name).references, 1)
+        self.assertTrue(blob_storage.exists(content.file.name))
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False, COURSES_DELETE_BATCH_SIZE=2)
+class CourseDeletionTests(TransactionTestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_course_is_purged_in_batches_by_task(self):
+        owner = create_user('owner')
+        course = create_course(owner)
+        module = create_tree(course, items=3)
+        for item in module.items.all():
+            content = models.File(owner=owner, item=item, title='Notes')
+            content.file.save('notes.txt', ContentFile(b'shared notes'), save=True)
+        blob_path = blob_storage.path(content.file.name)
+        self.assertEqual(models.Blob.objects.get().references, 3)
+        self.client.force_login(owner)
+        self.assertEqual(self.client.delete(f'/api/v0.1/courses/{course.pk}/').status_code, 202)
+        self.assertTrue(models.Text.objects.exists())
+
+        deleted = []
+        with mock.patch.object(deletion, 'delete_rows', wraps=deletion.delete_rows) as delete_rows:
+            for pk in queue.claim('test', limit=10):
+                queue.execute(pk)
+            for (model, pks), _ in delete_rows.call_args_list:
+                deleted.append((model, len(pks)))
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertEqual([size for model, size in deleted if model is models.Text], [2, 1])
+        self.assertEqual([size for model, size in deleted if model is models.File], [2, 1])
+        self.assertEqual([size for model, size in deleted if model is models.Item], [2, 1])
+        for model in (models.Course, models.Module, models.Item, models.Text, models.File,
+                      models.ChangeLogEntry, models.Blob):
+            self.assertFalse(model.objects.exists(), model)
+        self.assertFalse(os.path.exists(blob_path))
+
+
+class SeedBenchmarkDataTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_small_catalog(self):
+        out = io.StringIO()
+        call_command(
+            'seed_benchmark_data', '--subjects', '2', '--owners', '2', '--courses', '3',
+            '--modules', '2', '--items', '7', '--students', '4', '--enrollments', '2',
+            '--batch-size', '5', '--seed', '1', '--tag', 'smoke', stdout=out,
+        )
+        self.assertIn("Catalog 'smoke' created", out.getvalue())
+        self.assertEqual(models.Subject.objects.count(), 2)
+        self.assertEqual(models.Course.objects.count(), 3)
+        self.assertEqual(models.Module.objects.count(), 6)
+        self.assertEqual(models.Item.objects.count(), 42)
+        self.assertEqual(models.Course.students.through.objects.count(), 8)
+        # every item holds one content, types taken in turn
+        for model in seed.CONTENT_MODELS:
+            self.assertEqual(model.objects.count(), 6, model)
+        self.assertEqual([blob.references for blob in models.Blob.objects.all()], [6, 6])
+        self.assertEqual(
+            models.ChangeLogEntry.objects.count(),
+            models.Module.objects.count() + models.Item.objects.count() * 2,
+        )
+        self.assertTrue(self.client.login(username='bench-smoke-student-0',
+                                          password=seed.PASSWORD))
+
+
+class CourseAdminTests(TransactionTestCase):
+
+    def setUp(self):
+        self.admin = create_user('admin', is_staff=True, is_superuser=True)
+        self.astronomy = create_course(self.admin, title='Astronomy', slug='astronomy',
+                                       overview='Stars and planets')
+        self.biology = create_course(self.admin, title='Biology', slug='biology',
+                                     overview='Cells')
+        models.Course.objects.filter(pk=self.astronomy.pk).update(
+            created=timezone.make_aware(datetime.datetime(2019, 3, 5))
+        )
+        models.Course.objects.filter(pk=self.biology.pk).update(
+            created=timezone.make_aware(datetime.datetime(2020, 7, 1))
+        )
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        response = self.client.get('/admin/courses/course/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def titles(self, **params):
+        return sorted(course.title for course in self.changelist(**params).result_list)
+
+    def test_search(self):
+        self.assertEqual(self.titles(q='astro'), ['Astronomy'])
+        self.assertEqual(self.titles(q='planets'), ['Astronomy'])
+        self.assertEqual(self.titles(q=str(self.biology.pk)), ['Biology'])
+        self.assertEqual(self.titles(q='chemistry'), [])
+
+    def test_created_filter(self):
+        self.assertEqual(self.titles(created='2019'), ['Astronomy'])
+        self.assertEqual(self.titles(created='2020-07'), ['Biology'])
+        self.assertEqual(self.titles(created='2020-06'), [])
+        # months are listed for the chosen year only
+        created_filter = self.changelist(created='2019').filter_specs[0]
+        self.assertEqual(
+            [value for value, _ in created_filter.lookup_choices],
+            ['2020', '2019'] + [f'2019-{month:02}' for month in range(12, 0, -1)],
+        )
+        # changelist redirects with error flag for bad lookups
+        response = self.client.get('/admin/courses/course/', {'created': 'last-year'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith('?e=1'))
+
+    def test_change_form(self):
+        create_tree(self.astronomy)
+        response = self.client.get(f'/admin/courses/course/{self.astronomy.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Astronomy')
+        self.assertEqual(self.client.get('/admin/courses/course/add/').status_code, 200)
+
+
+class ItemAdminTests(TestCase):
+
+    def setUp(self):
+        admin = create_user('admin', is_staff=True, is_superuser=True)
+        self.item = create_tree(create_course(admin)).items.get()
+        models.Video.objects.create(owner=admin, item=self.item, title='Video', order=1,
+                                    url='https://video.example.com/1')
+        self.url = f'/admin/courses/item/{self.item.pk}/change/'
+        self.client.force_login(admin)
+
+    def test_contents_of_all_types_are_listed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['inline_admin_formsets'], [])
+        content = response.content.decode()
+        self.assertLess(content.index('>Text</a>'), content.index('>Video</a>'))
+
+    def test_inlines_are_shown_when_asked_for(self):
+        response = self.client.get(self.url, {'contents': 'text'})
+        self.assertEqual([formset.opts.model for formset
+                          in response.context['inline_admin_formsets']], [models.Text])
+        response = self.client.get(self.url, {'contents': 'all'})
+        self.assertEqual(len(response.context['inline_admin_formsets']), 7)
+
+    def test_changelist(self):
+        response = self.client.get('/admin/courses/item/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [self.item])
+
+
+class RangeTests(SimpleTestCase):
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=990-2000', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        # multiple ranges are answered with the whole file
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range('items=0-1', 1000))
+        for header in ('bytes=1000-', 'bytes=5-4', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1000)
+
+
+class DownloadTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root, COURSES_MEDIA_SENDFILE='django')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        owner = create_user('owner')
+        item = create_tree(create_course(owner)).items.get()
+        self.content = models.File(owner=owner, item=item, title='Notes')
+        self.content.file.save('notes.txt', ContentFile(b'0123456789'), save=True)
+        self.url = f'/api/v0.1/contents/file/{self.content.pk}/download/'
+        self.client.force_login(owner)
+
+    def test_range_of_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_range_past_the_end(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_outsider_gets_nothing(self):
+        self.client.force_login(create_user('outsider'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class BrokerTests(SimpleTestCase):
+
+    def test_events_reach_subscribers_of_course(self):
+        async def scenario():
+            broker = Broker()
+            subscription = broker.subscribe(1)
+            other = broker.subscribe(2)
+            broker.publish(1, {'type': 'module.created', 'module': 5})
+            event = await asyncio.wait_for(subscription.queue.get(), 1)
+            self.assertEqual((event['id'], event['type'], event['module']),
+                             (1, 'module.created', 5))
+            self.assertTrue(other.queue.empty())
+
+        asyncio.run(scenario())
+
+    def test_slow_subscriber_loses_oldest_events(self):
+        async def scenario():
+            broker = Broker()
+            subscription = broker.subscribe(1, maxsize=2)
+            for module in range(3):
+                broker.publish(1, {'type': 'module.created', 'module': module})
+            await asyncio.sleep(0)
+            self.assertTrue(subscription.lost)
+            self.assertEqual([subscription.queue.get_nowait()['module'] for _ in range(2)],
+                             [1, 2])
+
+        asyncio.run(scenario())
+
+    def test_subscribers_are_forgotten(self):
+        broker = Broker()
+
+        async def subscribe():
+            return broker.subscribe(1), broker.subscribe(1)
+
+        first, second = asyncio.run(subscribe())
+        broker.unsubscribe(first)
+        self.assertTrue(broker.has_subscribers(1))
+        # loop of second subscription is closed, like one of a stopped server
+        broker.publish(1, {'type': 'module.created'})
+        self.assertFalse(broker.has_subscribers(1))
+        self.assertFalse(broker.has_subscribers())
+
+
+class CourseEventStreamTests(TransactionTestCase):
+
+    def setUp(self):
+        self.course = create_course(create_user('owner'))
+        self.path = f'/api/v0.1/courses/{self.course.pk}/events/'
+
+    def scope(self):
+        cookie = self.client.cookies.output(header='', sep=';').strip().encode()
+        return {
+            'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': self.path,
+            'query_string': b'', 'headers': [(b'cookie', cookie)] if cookie else [],
+        }
+
+    def test_anonymous_is_refused(self):
+        sent = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application(self.scope(), receive, send))
+        self.assertEqual(sent[0]['status'], 403)
+
+    def test_changes_are_streamed_until_disconnect(self):
+        self.client.force_login(self.course.owner)
+        scope = self.scope()
+
+        async def scenario():
+            received, sent = asyncio.Queue(), asyncio.Queue()
+            stream = asyncio.ensure_future(application(scope, received.get, sent.put))
+            start = await asyncio.wait_for(sent.get(), 5)
+            self.assertEqual(start['status'], 200)
+            self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+            self.assertEqual((await sent.get())['body'], b'retry: 5000\n\n')
+            self.assertTrue(broker.has_subscribers(self.course.pk))
+
+            module = await sync_to_async(models.Module.objects.create)(
+                course=self.course, title='Module'
+            )
+            body = (await asyncio.wait_for(sent.get(), 5))['body'].decode()
+            lines = body.split('\n')
+            self.assertTrue(lines[0].startswith('id: '))
+            self.assertEqual(lines[1], 'event: module.created')
+            data = json.loads(lines[2][len('data: '):])
+            self.assertEqual((data['type'], data['module']), ('module.created', module.pk))
+            self.assertTrue(body.endswith('\n\n'))
+
+            await received.put({'type': 'http.disconnect'})
+            await asyncio.wait_for(stream, 5)
+            self.assertFalse(broker.has_subscribers(self.course.pk))
+
+        asyncio.run(scenario())
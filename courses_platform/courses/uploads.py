@@ -0,0 +1,146 @@
+"""
+Chunked, resumable uploads of large files.
+
+Client initiates upload with total size, sends parts of `chunk_size` bytes in
+any order (last one may be shorter) and completes it once all parts are
+received. Every part is written straight to its offset in one file of the
+upload's size and a marker is written once the part is complete, so after
+dropped connection client asks which parts are missing and sends only those.
+On completion the file is hashed once and moved into blob storage as it is,
+never copied. Its blob is named by the digest of its content like any other
+upload, so the same file shares one blob however it was uploaded.
+"""
+import os
+import shutil
+from typing import List
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.db import transaction
+
+from . import models
+from .storage import hash_path
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class AssembledUpload(DjangoFile):
+    """Upload file on disk with known content digest, blob storage moves it instead of copying."""
+
+    def __init__(self, path: str, sha256: str):
+        super().__init__(open(path, 'rb'), name=path)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def upload_dir(upload) -> str:
+    return os.path.join(settings.COURSES_UPLOAD_DIR, str(upload.pk))
+
+
+def data_path(upload) -> str:
+    return os.path.join(upload_dir(upload), 'data')
+
+
+def marker_path(upload, index: int) -> str:
+    return os.path.join(upload_dir(upload), f'{index}.done')
+
+
+def staged_path(upload) -> str:
+    return os.path.join(upload_dir(upload), 'staged')
+
+
+def part_size(upload, index: int) -> int:
+    """Expected size of part, all but the last one are exactly chunk_size bytes."""
+    if index == upload.parts_count - 1:
+        return upload.size - index * upload.chunk_size
+    return upload.chunk_size
+
+
+def received_parts(upload) -> List[int]:
+    try:
+        filenames = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-len('.done')]) for name in filenames if name.endswith('.done'))
+
+
+def missing_parts(upload) -> List[int]:
+    received = set(received_parts(upload))
+    return [index for index in range(upload.parts_count) if index not in received]
+
+
+def write_part(upload, index: int, stream, length: int):
+    """Stream request body to its place in upload file, replacing earlier attempt of the part."""
+    if not 0 <= index < upload.parts_count:
+        raise UploadError(f'Part index must be between 0 and {upload.parts_count - 1}.')
+    expected = part_size(upload, index)
+    if length != expected:
+        raise UploadError(f'Part {index} must be exactly {expected} bytes, got {length}.')
+    os.makedirs(upload_dir(upload), exist_ok=True)
+    written = 0
+    fd = os.open(data_path(upload), os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        # parts may come in any order and concurrently, each writes its own range
+        if os.fstat(fd).st_size < upload.size:
+            os.ftruncate(fd, upload.size)
+        offset = index * upload.chunk_size
+        while written < length:
+            chunk = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not chunk:
+                break
+            os.pwrite(fd, chunk, offset + written)
+            written += len(chunk)
+    finally:
+        os.close(fd)
+    if written != length:
+        # connection dropped mid-part, client will resend it
+        raise UploadError(f'Part {index} is incomplete, received {written} of {length} bytes.')
+    path = marker_path(upload, index)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w'):
+        pass
+    # rename is atomic so partially written parts are never listed as received
+    os.replace(tmp_path, path)
+
+
+def complete(upload) -> models.File:
+    """Create File content from uploaded parts and remove upload."""
+    missing = missing_parts(upload)
+    if missing:
+        raise UploadError(f'Missing parts: {missing}.')
+    # only one of concurrent requests gets to complete the upload
+    if not models.Upload.objects.filter(pk=upload.pk, completing=False).update(completing=True):
+        raise UploadError('Upload is already being completed.')
+    staged = staged_path(upload)
+    try:
+        # storage moves the file away, give it a second link so the upload is
+        # left as it was if the File row is not saved
+        if os.path.exists(staged):
+            os.unlink(staged)
+        os.link(data_path(upload), staged)
+        assembled = AssembledUpload(staged, hash_path(staged))
+        content = models.File(owner_id=upload.owner_id, item_id=upload.item_id, title=upload.title)
+        try:
+            # blob reference is added only along with the row referencing it, a blob
+            # file left without one is removed by collect_blobs
+            with transaction.atomic():
+                content.file.save(upload.filename, assembled, save=True)
+        finally:
+            assembled.close()
+    except Exception:
+        models.Upload.objects.filter(pk=upload.pk).update(completing=False)
+        raise
+    discard(upload)
+    return content
+
+
+def discard(upload):
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
+    upload.delete()
@@ -10,14 +10,28 @@ app_name = 'courses'
 urlpatterns = [
     path('', RedirectView.as_view(url=reverse_lazy('courses:course_list'), permanent=True)),
     path('items/<int:pk>/', views.ItemDetailView.as_view(), name='item_detail'),
+    path('items/<int:pk>/uploads/', views.upload_create, name='upload_create'),
+    path('uploads/<uuid:pk>/', views.upload_detail, name='upload_detail'),
+    path('uploads/<uuid:pk>/parts/<int:index>/', views.upload_part, name='upload_part'),
+    path('uploads/<uuid:pk>/complete/', views.upload_complete, name='upload_complete'),
     path('modules/<int:pk>/', views.ModuleDetailView.as_view(), name='module_detail'),
     path('modules/<int:pk>/items/', views.ModuleItemsView.as_view(), name='module_items'),
     path('subjects/', views.SubjectListView.as_view(), name='subject_list'),
     path('subjects/<slug:pk>/', views.SubjectDetailView.as_view(), name='subject_detail'),
     path('courses/', views.CourseListView.as_view(), name='course_list'),
+    path('courses/facets/', views.course_facets_view, name='course_facets'),
+    path('courses/search/', views.CourseSearchView.as_view(), name='course_search'),
     path('courses/<int:pk>/', views.CourseDetailView.as_view(), name='course_detail'),
     path('courses/<int:pk>/modules/', views.CourseModulesView.as_view(), name='course_modules'),
+    path('courses/<int:pk>/students/', views.CourseStudentsView.as_view(), name='course_students'),
+    path('courses/<int:pk>/students/export/', views.course_students_export,
+         name='course_students_export'),
+    path('courses/<int:pk>/changes/', views.course_changes, name='course_changes'),
+    path('courses/<int:pk>/restore/', views.course_restore, name='course_restore'),
+    path('courses/<int:pk>/enroll/', views.enroll, name='course_enroll'),
     path('courses/<int:pk>/add_teacher/', views.add_teacher, name='course_add_teacher'),
     path('users/<int:pk>/courses/', views.UserCourseListView.as_view(), name='user_courses'),
     path('contents/<str:content_type>/<int:pk>/', views.ContentDetailView.as_view(), name='content_detail'),
+    path('contents/<str:content_type>/<int:pk>/download/', views.content_download,
+         name='content_download'),
 ]
@@ -1,58 +1,127 @@
 from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from django.http import Http404, JsonResponse
+from django.core.files.storage import default_storage
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
+from common.instrumentation import query_budget
 from common.permissions import (IsAdminUserOrReadOnly, IsOwnerOrSuperuser,
-                                IsOwnerOrSuperuserOrReadOnly, IsStudentOrTeacherReadOnlyOrAdminOrSU)
+                                IsOwnerOrSuperuserOrReadOnly,
+                                IsStudentOrTeacherReadOnlyOrAdminOrSU, is_course_member)
+from common.streaming import StreamingListMixin
+from common.throttling import throttle_group
+from common.views import CachedObjectMixin, SparseFieldsetsMixin
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.exceptions import NotFound
-from rest_framework.generics import (ListCreateAPIView, RetrieveUpdateDestroyAPIView,
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.generics import (ListAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView,
                                      get_object_or_404)
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from . import models, serializers
+from . import changes, exports, models, serializers, subjects, uploads
+from .contents import load_contents
+from .filters import course_facets, filter_courses
+from .images import get_derivative
+from .media import serve_file
+from .search import get_search_backend
+from .tasks import delete_course, export_roster, restore_course
 
 
-class CourseDetailView(RetrieveUpdateDestroyAPIView):
+def defer_unused_fields(queryset, serializer):
+    """Don't load long course overviews for payloads without them."""
+    if not serializer.includes('overview'):
+        queryset = queryset.defer('overview')
+    return queryset
+
+
+class CourseDetailView(CachedObjectMixin, SparseFieldsetsMixin, RetrieveUpdateDestroyAPIView):
     """View and update course."""
 
     permission_classes = (IsOwnerOrSuperuserOrReadOnly, )
     serializer_class = serializers.CourseSerializer
     queryset = models.Course.objects.all()
+    query_budget = {'GET': 6}
 
     def filter_queryset(self, queryset):
-        user = self.request.user
-        if user.is_staff:
-            qs = queryset
-        elif user.is_authenticated:
-            qs = queryset.filter(Q(visible=True) | Q(owner=user.pk)).all()
-        else:
-            qs = queryset.filter(visible=True).all()
-        return qs
+        return queryset.visible_to(self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        # big courses take long to delete, so it is done by background task
+        instance = self.get_object()
+        models.Course.objects.filter(pk=instance.pk).update(visible=False, deleted=True)
+        delete_course.delay(instance.pk)
+        return Response(status=status.HTTP_202_ACCEPTED)
 
 
-class CourseListView(ListCreateAPIView):
-    """View all courses and create new ones if authenticated user."""
+class CourseListView(StreamingListMixin, SparseFieldsetsMixin, ListCreateAPIView):
+    """View all courses and create new ones if authenticated user, staff stream big exports."""
 
     permission_classes = (IsAuthenticatedOrReadOnly, )
     serializer_class = serializers.CourseWithoutModulesSerializer
     queryset = models.Course.objects.all()
+    query_budget = {'GET': 6}
+
+    def check_stream_permission(self, request):
+        if not request.user.is_staff:
+            raise PermissionDenied('Only staff can stream course lists.')
 
     def perform_create(self, serializer):
         serializer.save(owner_id=self.request.user.pk)
 
+    def get_queryset(self):
+        return defer_unused_fields(super().get_queryset(), self.get_serializer())
+
     def filter_queryset(self, queryset):
-        user = self.request.user
-        if user.is_staff:
-            qs = queryset
-        elif user.is_authenticated:
-            qs = queryset.filter(Q(visible=True) | Q(owner=user.pk)).all()
-        else:
-            qs = queryset.filter(visible=True).all()
-        return qs
+        return filter_courses(queryset.visible_to(self.request.user), self.request.query_params)
+
+
+@api_view(http_method_names=['GET'])
+def course_facets_view(request):
+    """Course counts per subject and price bucket for the same filters as course list."""
+    qs = filter_courses(models.Course.objects.visible_to(request.user), request.query_params)
+    return Response(course_facets(qs))
+
+
+class SearchResultsPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CourseSearchView(SparseFieldsetsMixin, ListAPIView):
+    """Search courses by text with ?q=, most relevant first."""
+
+    serializer_class = serializers.CourseWithoutModulesSerializer
+    pagination_class = SearchResultsPagination
+    queryset = models.Course.objects.all()
+
+    def filter_queryset(self, queryset):
+        return queryset.visible_to(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        # restricted in the index query, so hidden courses don't take up the limit
+        hits = get_search_backend().search(
+            query, limit=settings.COURSES_SEARCH_MAX_RESULTS,
+            within=self.filter_queryset(self.get_queryset()),
+        )
+        page = self.paginate_queryset([course_id for course_id, _ in hits])
+        queryset = defer_unused_fields(
+            self.get_queryset().select_related('subject', 'owner'), self.get_serializer()
+        )
+        courses = queryset.in_bulk(page)
+        serializer = self.get_serializer(
+            [courses[course_id] for course_id in page if course_id in courses],
+            many=True,
+        )
+        return self.get_paginated_response(serializer.data)
 
 
 class UserCourseListView(CourseListView):
@@ -65,10 +134,57 @@ class UserCourseListView(CourseListView):
             user = get_object_or_404(User, pk=user_pk)
         except User.DoesNotExist:
             raise NotFound(detail='No such user')
-        qs = queryset.filter(owner=user)
+        qs = queryset.visible_to(self.request.user).filter(owner=user)
         return qs
 
 
+def get_roster_course(request, pk):
+    """Course whose students user may see, as owner, teacher or staff."""
+    course = get_object_or_404(models.Course.objects.alive(), pk=pk)
+    user = request.user
+    if not (user.is_staff or course.owner_id == user.pk
+            or is_course_member(request, course, 'teachers')):
+        raise PermissionDenied('Only course owner and teachers can see its students.')
+    return course
+
+
+class CourseStudentsView(StreamingListMixin, ListAPIView):
+    """Roster of course students for its owner, teachers and staff."""
+
+    permission_classes = (IsAuthenticated, )
+    serializer_class = serializers.CourseStudentSerializer
+    query_budget = {'GET': 4}
+
+    def get_queryset(self):
+        return get_roster_course(self.request, self.kwargs['pk']).students.order_by('pk')
+
+
+@query_budget(4)
+@api_view(http_method_names=['GET', 'POST'])
+@permission_classes((IsAuthenticated, ))
+def course_students_export(request, pk):
+    """
+    Course roster as CSV, streamed or served from storage when already generated.
+
+    POST queues generation in background, for rosters too big to wait for.
+    """
+    course = get_roster_course(request, pk)
+    name = exports.stored_roster(course.pk)
+    if request.method == 'POST':
+        if name is not None:
+            return Response({'detail': 'Export is ready.'})
+        export_roster.delay(course.pk)
+        return Response(status=status.HTTP_202_ACCEPTED, data={'detail': 'Export scheduled.'})
+
+    if name is not None:
+        response = serve_file(request, default_storage, name)
+    else:
+        response = StreamingHttpResponse(exports.roster_csv(course.pk), content_type='text/csv')
+    filename = f'{course.slug or course.pk}-students.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 class CourseModulesView(ListCreateAPIView):
     """View all modules in course and create new ones."""
 
@@ -76,14 +192,14 @@ class CourseModulesView(ListCreateAPIView):
     serializer_class = serializers.ModuleWithoutItemsSerializer
 
     def get_queryset(self):
-        course = models.Course.objects.get(pk=self.kwargs['pk'])
+        course = get_object_or_404(models.Course.objects.alive(), pk=self.kwargs['pk'])
         return course.modules.all()
 
     def perform_create(self, serializer):
         serializer.save(course_id=self.kwargs.get('pk'))
 
 
-class ModuleDetailView(RetrieveUpdateDestroyAPIView):
+class ModuleDetailView(CachedObjectMixin, SparseFieldsetsMixin, RetrieveUpdateDestroyAPIView):
     """View and update module."""
 
     # Doesn't have put support as it's ambigous what to do with module items
@@ -91,21 +207,46 @@ class ModuleDetailView(RetrieveUpdateDestroyAPIView):
     http_method_names = ['get', 'patch', 'delete', 'head', 'options', 'trace']
     permission_classes = (IsStudentOrTeacherReadOnlyOrAdminOrSU, )
     serializer_class = serializers.ModuleSerializer
-    queryset = models.Module.objects.all()
+    query_budget = {'GET': 16}
+    throttle_group = {'GET': 'content'}
+
+    def get_queryset(self):
+        # course is needed by permission checks anyway
+        queryset = models.Module.objects.alive().select_related('course')
+        serializer = self.get_serializer()
+        if serializer.expands('items'):
+            queryset = queryset.prefetch_related('items')
+        elif serializer.includes('items'):
+            # only links to items
+            queryset = queryset.prefetch_related(
+                Prefetch('items', models.Item.objects.only('pk', 'module_id'))
+            )
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        if serializer.includes('items.content'):
+            load_contents(instance.items.all())
+        return Response(serializer.data)
 
 
-class ModuleItemsView(ListCreateAPIView):
+class ModuleItemsView(CachedObjectMixin, SparseFieldsetsMixin, ListCreateAPIView):
     """View all items in module and create a new ones."""
 
     permission_classes = (IsOwnerOrSuperuser, )
     serializer_class = serializers.ItemSerializer
+    query_budget = {'GET': 14}
+    throttle_group = {'GET': 'content'}
 
     def get_queryset(self):
-        qs = models.Module.objects.get(pk=self.kwargs['pk']).all_items()
+        qs = get_object_or_404(models.Module.objects.alive(), pk=self.kwargs['pk']).all_items()
         return qs
 
     def list(self, request, *args, **kwargs):
-        qs = models.Module.objects.get(pk=self.kwargs['pk']).all_items()
+        qs = get_object_or_404(models.Module.objects.alive(), pk=self.kwargs['pk']).all_items()
+        if self.get_serializer().includes('content'):
+            qs = load_contents(qs)
 
         ctx = self.get_serializer_context()
         serializer = serializers.ItemSerializer(qs, many=True, context=ctx)
@@ -114,7 +255,7 @@ class ModuleItemsView(ListCreateAPIView):
     def get_object(self):
         # This is an object to run permission checks from permission_classes against
         # So we display items but run checks on module those items belong to
-        return get_object_or_404(models.Module, pk=self.kwargs['pk'])
+        return get_object_or_404(models.Module.objects.alive(), pk=self.kwargs['pk'])
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -123,12 +264,21 @@ class ModuleItemsView(ListCreateAPIView):
         return ctx
 
 
-class ItemDetailView(RetrieveUpdateDestroyAPIView):
+class ItemDetailView(CachedObjectMixin, SparseFieldsetsMixin, RetrieveUpdateDestroyAPIView):
     """View single item and update it if owner."""
 
     permission_classes = (IsOwnerOrSuperuser, )
     serializer_class = serializers.ItemSerializer
-    queryset = models.Item.objects.all()
+    queryset = models.Item.objects.alive()
+    query_budget = {'GET': 12}
+    throttle_group = {'GET': 'content'}
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        if serializer.includes('content'):
+            load_contents([instance])
+        return Response(serializer.data)
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -150,13 +300,19 @@ class SubjectListView(ListCreateAPIView):
     permission_classes = (IsAdminUserOrReadOnly, )
     serializer_class = serializers.SubjectWithoutCoursesSerializer
     queryset = models.Subject.objects.all()
+    query_budget = {'GET': 3}
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(subjects.all_subjects(), many=True)
+        return Response(serializer.data)
 
 
-class ContentDetailView(RetrieveUpdateDestroyAPIView):
+class ContentDetailView(CachedObjectMixin, RetrieveUpdateDestroyAPIView):
     # TODO when content deleted return response is 404 which is probably due to get_object()
     permission_classes = (IsStudentOrTeacherReadOnlyOrAdminOrSU, )
     serializer_class = serializers.ContentSerializer
     lookup_url_kwarg = 'pk'
+    throttle_group = {'GET': 'content'}
 
     def get_queryset(self):
         content_type = self.kwargs.get('content_type')
@@ -164,7 +320,7 @@ class ContentDetailView(RetrieveUpdateDestroyAPIView):
             klass = apps.get_model('courses', content_type)
         except LookupError:
             raise Http404(f'No such content-type {content_type}')
-        return klass.objects.all()
+        return klass.objects.alive()
 
 
 @api_view(http_method_names=['POST'])
@@ -172,7 +328,7 @@ class ContentDetailView(RetrieveUpdateDestroyAPIView):
 def add_teacher(request, pk):
     User = get_user_model()
     user = get_object_or_404(User, pk=request.data['user_pk'])
-    course = get_object_or_404(models.Course, pk=pk)
+    course = get_object_or_404(models.Course.objects.alive(), pk=pk)
     course.teachers.add(user)
     return Response(
         status=status.HTTP_200_OK,
@@ -180,10 +336,82 @@ def add_teacher(request, pk):
     )
 
 
+@api_view(http_method_names=['POST'])
+@permission_classes((IsAuthenticated, ))
+def course_restore(request, pk):
+    """Queue restoring of archived course tree."""
+    course = get_object_or_404(models.Course.objects.visible_to(request.user), pk=pk)
+    if course.owner_id != request.user.pk and not request.user.is_staff:
+        raise PermissionDenied('Only course owner can restore it.')
+    if not course.archived:
+        raise ValidationError({'detail': 'Course is not archived.'})
+    restore_course.delay(course.pk)
+    return Response(status=status.HTTP_202_ACCEPTED, data={'detail': 'Course restore scheduled.'})
+
+
+@query_budget(14)
+@throttle_group('content')
+@api_view(http_method_names=['GET'])
+@permission_classes((IsAuthenticated, ))
+def course_changes(request, pk):
+    """Modules, items and contents of course changed since `since`, and tombstones of deleted."""
+    course = get_object_or_404(models.Course.objects.alive().with_member(request.user), pk=pk)
+    since = request.query_params.get('since')
+    if since is not None:
+        since = parse_datetime(since)
+        if since is None:
+            raise ValidationError(
+                {'since': 'Use ISO 8601 date and time, e.g. `until` of previous response.'}
+            )
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, timezone.utc)
+        if since < changes.horizon():
+            return Response(
+                status=status.HTTP_410_GONE,
+                data={
+                    'detail': 'Changes this old are not kept anymore, download the whole course.'
+                },
+            )
+    try:
+        limit = min(int(request.query_params.get('limit', settings.COURSES_CHANGES_PAGE_SIZE)),
+                    settings.COURSES_CHANGES_PAGE_SIZE)
+    except ValueError:
+        raise ValidationError({'limit': 'Must be a number.'})
+    after = request.query_params.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            raise ValidationError({'after': 'Must be `after` of previous response.'})
+
+    entries, until, after, more = changes.changes_since(course.pk, since, after, max(limit, 1))
+    changed, deleted = changes.group_entries(entries)
+    context = {'request': request}
+    modules = models.Module.objects.filter(pk__in=changed.pop('module', []), course_id=course.pk)
+    items = models.Item.objects.filter(pk__in=changed.pop('item', []), module__course_id=course.pk)
+    contents = []
+    for content_type, ids in changed.items():
+        model = apps.get_model('courses', content_type)
+        for content in model.objects.filter(pk__in=ids, item__module__course_id=course.pk):
+            data = serializers.ContentSerializer(content, context=context).data
+            contents.append({'item': content.item_id, **data})
+    return Response({
+        'until': until,
+        'after': after,
+        'more': more,
+        'modules': serializers.ModuleChangeSerializer(modules, many=True, context=context).data,
+        'items': serializers.ItemWithoutContentsSerializer(items, many=True, context=context).data,
+        'contents': contents,
+        'deleted': deleted,
+    })
+
+
+@throttle_group('enroll')
 @api_view(http_method_names=['POST'])
 @permission_classes((IsAuthenticated, ))
 def enroll(request, pk):
-    course = get_object_or_404(models.Course, pk=pk)
+    courses = models.Course.objects.visible_to(request.user).filter(archived=False)
+    course = get_object_or_404(courses, pk=pk)
     if course.is_enroll_open:
         course.students.add(request.user)
         return JsonResponse(
@@ -194,3 +422,113 @@ def enroll(request, pk):
         status=status.HTTP_400_BAD_REQUEST,
         data={'error': f'Course {course.title} not open for enroll.'}
     )
+
+
+def course_member_exists(relation, user):
+    """Subquery telling whether user is in course `relation` (students or teachers) of content."""
+    through = getattr(models.Course, relation).through
+    return Exists(through.objects.filter(
+        course_id=OuterRef('item__module__course_id'),
+        myuser_id=user.pk,
+    ))
+
+
+@throttle_group('content')
+@api_view(http_method_names=['GET', 'HEAD'])
+@permission_classes((IsAuthenticated, ))
+def content_download(request, content_type, pk):
+    """
+    Stream file of File/Image content to course owner, teachers, students and staff.
+
+    Resized image is served instead of original if `size` query param is given.
+    """
+    if content_type not in serializers.DOWNLOADABLE_CONTENT_TYPES:
+        raise Http404(f'No downloadable content-type {content_type}')
+    model = apps.get_model('courses', content_type)
+    # fetch file name and access flags in one query
+    content = (
+        model.objects.alive().filter(pk=pk)
+        .annotate(
+            is_student=course_member_exists('students', request.user),
+            is_teacher=course_member_exists('teachers', request.user),
+        )
+        .values('file', 'title', 'item__module__course__owner_id', 'is_student', 'is_teacher')
+        .first()
+    )
+    if content is None:
+        raise Http404
+    if not (
+        request.user.is_staff
+        or content['item__module__course__owner_id'] == request.user.pk
+        or content['is_student']
+        or content['is_teacher']
+    ):
+        raise PermissionDenied
+    storage = model._meta.get_field('file').storage
+    name = content['file']
+    size = request.query_params.get('size')
+    if size:
+        if content_type != 'image' or size not in settings.COURSES_IMAGE_DERIVATIVES:
+            raise Http404(f'No such image size {size}')
+        name = get_derivative(storage, name, size)
+        storage = default_storage
+    return serve_file(request, storage, name, content['title'])
+
+
+@api_view(http_method_names=['POST'])
+@permission_classes((IsAuthenticated, ))
+def upload_create(request, pk):
+    """Start chunked upload of a file that will be added to the item as File content."""
+    item = get_object_or_404(models.Item.objects.alive().select_related('module__course'), pk=pk)
+    if not (request.user.is_staff or item.module.course.owner_id == request.user.pk):
+        raise PermissionDenied
+    serializer = serializers.UploadSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save(owner_id=request.user.pk, item=item,
+                    chunk_size=settings.COURSES_UPLOAD_CHUNK_SIZE)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def get_upload(request, pk):
+    upload = get_object_or_404(models.Upload, pk=pk)
+    if not (request.user.is_staff or upload.owner_id == request.user.pk):
+        raise PermissionDenied
+    return upload
+
+
+@api_view(http_method_names=['GET', 'DELETE'])
+@permission_classes((IsAuthenticated, ))
+def upload_detail(request, pk):
+    """See which parts are still missing or abort upload."""
+    upload = get_upload(request, pk)
+    if request.method == 'DELETE':
+        uploads.discard(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    serializer = serializers.UploadSerializer(upload, context={'request': request})
+    return Response(serializer.data)
+
+
+@api_view(http_method_names=['PUT'])
+@permission_classes((IsAuthenticated, ))
+def upload_part(request, pk, index):
+    """Store raw request body as part `index` of the upload."""
+    upload = get_upload(request, pk)
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    try:
+        uploads.write_part(upload, index, request.stream, length)
+    except uploads.UploadError as e:
+        raise ValidationError({'detail': str(e)})
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(http_method_names=['POST'])
+@permission_classes((IsAuthenticated, ))
+def upload_complete(request, pk):
+    """Assemble received parts into File content."""
+    upload = get_upload(request, pk)
+    try:
+        content = uploads.complete(upload)
+    except uploads.UploadError as e:
+        raise ValidationError({'detail': str(e)})
+    serializer = serializers.ContentSerializer(content, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -4,6 +4,8 @@ import sys
 
 if __name__ == "__main__":
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    if sys.argv[1:2] == ["test"]:
+        os.environ.setdefault("DJANGO_PROFILE", "test")
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'priority', 'attempts', 'progress', 'run_after', 'finished']
+    list_filter = ['status', 'name']
+    readonly_fields = ['created', 'finished', 'locked_by', 'locked_at']
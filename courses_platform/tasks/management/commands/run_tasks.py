@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run worker that executes queued background tasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of tasks run at once.')
+        parser.add_argument('--mode', choices=('thread', 'process'), default='thread',
+                            help='Run tasks in thread or process pool.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between queue checks when idle.')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            mode=options['mode'],
+            poll_interval=options['poll_interval'],
+        )
+        self.stdout.write(f'Worker {worker.worker_id} started.')
+        try:
+            worker.run(burst=options['burst'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('Worker stopped.')
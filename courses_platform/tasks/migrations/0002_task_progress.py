@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='progress',
+            field=models.CharField(blank=True, help_text='Last progress reported by task.', max_length=250),
+        ),
+    ]
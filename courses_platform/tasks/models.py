@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Queued call of a registered task function."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    # JSON object with `args` and `kwargs` of the call
+    arguments = models.TextField(default='{}')
+    priority = models.SmallIntegerField(
+        default=0, help_text='Tasks with higher priority run first.'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    progress = models.CharField(
+        max_length=250, blank=True, help_text='Last progress reported by task.'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-priority', 'run_after', )
+        indexes = [
+            models.Index(fields=('status', 'priority', 'run_after', )),
+            models.Index(fields=('status', 'locked_at', )),
+        ]
+
+    def __str__(self):
+        return f'Task {self.name} ({self.status})'
@@ -0,0 +1,16 @@
+"""
+Entry points of worker pool processes.
+
+Spawned processes unpickle these before Django is set up,
+so this module must not import models at module level.
+"""
+import django
+
+
+def init_process():
+    django.setup()
+
+
+def execute(pk: int):
+    from .queue import execute
+    execute(pk)
@@ -0,0 +1,176 @@
+"""
+Database-backed task queue.
+
+Functions decorated with `@task` can be called as usual or queued with
+`.delay(*args, **kwargs)`. Queued calls are rows of Task table picked by
+`run_tasks` workers in order of priority. Arguments must be JSON serializable.
+Failed calls are retried with exponential backoff until `max_attempts`.
+Since tasks are rows written in the same transaction as the data they're
+about, a task queued in request that rolls back is never run.
+"""
+import json
+import logging
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry: Dict[str, 'TaskFunction'] = {}
+
+# id of task being executed in current thread, None outside of workers
+current_task_id: ContextVar[Optional[int]] = ContextVar('current_task_id', default=None)
+
+
+class TaskFunction:
+    """Registered task, call it to run inline or use delay() to queue it."""
+
+    def __init__(self, func: Callable, name: str, priority: int, max_attempts: int):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs) -> Optional[Task]:
+        return self.enqueue(args=args, kwargs=kwargs)
+
+    def enqueue(self, args=(), kwargs=None, priority: Optional[int] = None,
+                run_after=None) -> Optional[Task]:
+        """Queue the call, in eager mode run it after current transaction commits instead."""
+        kwargs = kwargs or {}
+        if settings.TASKS_ALWAYS_EAGER:
+            transaction.on_commit(lambda: self.func(*args, **kwargs))
+            return None
+        return Task.objects.create(
+            name=self.name,
+            arguments=json.dumps({'args': list(args), 'kwargs': kwargs}),
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_after=run_after or timezone.now(),
+        )
+
+
+def task(func: Callable = None, *, name: str = None, priority: int = 0, max_attempts: int = 3):
+    """Register function as a task, usable as `@task` or `@task(priority=10)`."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[task_name] = TaskFunction(func, task_name, priority, max_attempts)
+        return registry[task_name]
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def claim(worker_id: str, limit: int) -> List[int]:
+    """
+    Lock up to `limit` due tasks for worker and return their ids.
+
+    Each task is taken with conditional update from queued to running state,
+    so concurrent workers never run the same task without needing row locks.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    candidates = (
+        Task.objects.filter(status=Task.QUEUED, run_after__lte=now)
+        .order_by('-priority', 'run_after')
+        .values_list('pk', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for pk in list(candidates):
+        updated = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def heartbeat(worker_id: str, pks: Iterable[int]):
+    """Mark tasks as still running, so they are not taken for abandoned ones."""
+    Task.objects.filter(pk__in=list(pks), status=Task.RUNNING, locked_by=worker_id).update(
+        locked_at=timezone.now(),
+    )
+
+
+def requeue_stale(timeout_seconds: int) -> int:
+    """
+    Return tasks of workers that died while running them back to the queue,
+    or fail them if they have used up their attempts.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=timeout_seconds),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED,
+        finished=now,
+        last_error=f'Worker stopped responding, no heartbeat for {timeout_seconds} seconds.',
+    )
+    if failed:
+        logger.warning('Failed %s stale tasks out of attempts', failed)
+    return stale.update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def report_progress(message: str):
+    """Record progress of currently executed task, does nothing outside of workers."""
+    pk = current_task_id.get()
+    if pk is not None:
+        # doubles as heartbeat so long tasks are not taken for abandoned ones
+        Task.objects.filter(pk=pk).update(progress=message[:250], locked_at=timezone.now())
+
+
+def execute(pk: int):
+    """Run claimed task and record its outcome, used by workers."""
+    close_old_connections()
+    token = current_task_id.set(pk)
+    try:
+        task_row = Task.objects.get(pk=pk)
+        arguments = json.loads(task_row.arguments)
+        try:
+            func = registry[task_row.name]
+            func(*arguments.get('args', []), **arguments.get('kwargs', {}))
+        except Exception:
+            error = traceback.format_exc()
+            logger.exception('Task %s (%s) failed', task_row.name, pk)
+            if task_row.attempts < task_row.max_attempts:
+                Task.objects.filter(pk=pk).update(
+                    status=Task.QUEUED,
+                    run_after=timezone.now() + retry_delay(task_row.attempts),
+                    locked_by='',
+                    locked_at=None,
+                    last_error=error,
+                )
+            else:
+                Task.objects.filter(pk=pk).update(
+                    status=Task.FAILED,
+                    finished=timezone.now(),
+                    last_error=error,
+                )
+        else:
+            Task.objects.filter(pk=pk).update(status=Task.DONE, finished=timezone.now())
+    finally:
+        current_task_id.reset(token)
+        close_old_connections()
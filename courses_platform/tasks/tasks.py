@@ -0,0 +1,2 @@
+# task modules of installed apps are imported by TasksConfig.ready() to register tasks
+from .mail import send_email  # noqa: F401
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from . import queue
+from .models import Task
+
+
+class RequeueStaleTests(TestCase):
+
+    def running_task(self, attempts, locked_ago):
+        return Task.objects.create(
+            name='test', status=Task.RUNNING, attempts=attempts, max_attempts=3,
+            locked_by='host:1', locked_at=timezone.now() - locked_ago,
+        )
+
+    def test_stale_tasks_are_requeued_until_out_of_attempts(self):
+        retried = self.running_task(attempts=1, locked_ago=timedelta(hours=1))
+        exhausted = self.running_task(attempts=3, locked_ago=timedelta(hours=1))
+        fresh = self.running_task(attempts=3, locked_ago=timedelta(seconds=1))
+        with self.assertLogs('tasks.queue'):
+            self.assertEqual(queue.requeue_stale(60), 1)
+        statuses = dict(Task.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[retried.pk], Task.QUEUED)
+        self.assertEqual(statuses[exhausted.pk], Task.FAILED)
+        self.assertEqual(statuses[fresh.pk], Task.RUNNING)
+
+    def test_heartbeat_keeps_running_task(self):
+        task = self.running_task(attempts=1, locked_ago=timedelta(hours=1))
+        queue.heartbeat('host:1', [task.pk])
+        self.assertEqual(queue.requeue_stale(60), 0)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.RUNNING)
@@ -0,0 +1,73 @@
+"""Worker that runs queued tasks in a thread or process pool."""
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+from . import process, queue
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Poll the queue and keep up to `concurrency` tasks running.
+
+    Thread mode suits IO-bound tasks (email, database work), process mode
+    is for CPU-bound ones like image processing.
+    """
+
+    def __init__(self, concurrency: int = 4, mode: str = 'thread', poll_interval: float = 1.0):
+        self.concurrency = concurrency
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+    def make_pool(self):
+        if self.mode == 'process':
+            # spawn instead of fork so children don't inherit open database connections
+            return ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.init_process,
+            )
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='task')
+
+    @property
+    def execute(self):
+        return process.execute if self.mode == 'process' else queue.execute
+
+    def run(self, burst: bool = False):
+        """Process tasks until interrupted, or until the queue is empty if `burst`."""
+        running = {}
+        last_recovery = 0.0
+        with self.make_pool() as pool:
+            while True:
+                if time.monotonic() - last_recovery > settings.TASKS_LOCK_TIMEOUT / 2:
+                    # running tasks of live workers stay fresh however long they take
+                    queue.heartbeat(self.worker_id, running.values())
+                    requeued = queue.requeue_stale(settings.TASKS_LOCK_TIMEOUT)
+                    if requeued:
+                        logger.warning('Requeued %s stale tasks', requeued)
+                    last_recovery = time.monotonic()
+
+                for pk in queue.claim(self.worker_id, self.concurrency - len(running)):
+                    running[pool.submit(self.execute, pk)] = pk
+                # polling connection is idle until next claim
+                connections.close_all()
+
+                if not running:
+                    if burst:
+                        return
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    if future.exception():
+                        logger.error('Task execution crashed', exc_info=future.exception())
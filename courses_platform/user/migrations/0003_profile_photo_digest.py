@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 04:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_profile_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='photo_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+import json
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def queue_photo_processing(apps, schema_editor):
+    """Profiles with photos saved before digests were stored get them in background."""
+    Profile = apps.get_model('user', 'Profile')
+    Task = apps.get_model('tasks', 'Task')
+    now = timezone.now()
+    Task.objects.bulk_create(
+        Task(name='user.tasks.process_photo', run_after=now,
+             arguments=json.dumps({'args': [pk, photo], 'kwargs': {}}))
+        for pk, photo in Profile.objects.filter(photo_digest='').exclude(photo='')
+        .values_list('pk', 'photo').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_profile_photo_digest'),
+        ('tasks', '0002_task_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_photo_processing, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from courses.images import derivative_urls
+
 
 class MyUser(AbstractUser):
     pass
@@ -11,6 +13,29 @@ class Profile(models.Model):
     about_myself = models.TextField(blank=True, default='')
     date_of_birth = models.DateField(null=True, blank=True)
     photo = models.ImageField(upload_to='users/%Y/%m/%d/', blank=True)
+    # sha256 of photo naming its derivatives, stored by background task with them
+    photo_digest = models.CharField(max_length=64, blank=True, editable=False)
+
+    # photo name as loaded from database, to notice a new one
+    _loaded_photo = None
 
     def __str__(self):
         return 'Profile for user {}'.format(self.user.username)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_photo = instance.photo.name
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.photo.name != self._loaded_photo:
+            self.photo_digest = ''
+        super().save(*args, **kwargs)
+        self._loaded_photo = self.photo.name
+
+    def photo_derivatives(self):
+        """Media urls of resized photo by size name, none until they are generated."""
+        if not self.photo or not self.photo_digest:
+            return {}
+        return derivative_urls(self.photo.storage, self.photo.name, digest=self.photo_digest)
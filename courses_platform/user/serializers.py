@@ -0,0 +1,24 @@
+from rest_framework import serializers
+from rest_registration.api.serializers import DefaultUserProfileSerializer
+
+from .models import Profile
+
+
+class UserProfileSerializer(DefaultUserProfileSerializer):
+    """Account of current user with urls of resized profile photo."""
+
+    photo_derivatives = serializers.SerializerMethodField()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.Meta.fields = (*self.Meta.fields, 'photo_derivatives')
+
+    def get_photo_derivatives(self, user):
+        profile = Profile.objects.filter(user=user).first()
+        if profile is None:
+            return {}
+        request = self.context.get('request')
+        return {
+            size: request.build_absolute_uri(url) if request else url
+            for size, url in profile.photo_derivatives().items()
+        }
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Profile
+from .tasks import process_photo
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, raw=False, **kwargs):
+    # digest is cleared when photo changes
+    if not raw and instance.photo and not instance.photo_digest:
+        process_photo.delay(instance.pk, instance.photo.name)
@@ -0,0 +1,20 @@
+from django.conf import settings
+
+from courses.images import get_derivative, source_digest
+from tasks.queue import task
+
+from .models import Profile
+
+
+@task
+def process_photo(profile_id: int, name: str):
+    """Store digest of profile photo and render its pregenerated sizes."""
+    profile = Profile.objects.filter(pk=profile_id, photo=name).first()
+    if profile is None:
+        # photo replaced or profile removed since
+        return
+    storage = profile.photo.storage
+    digest = source_digest(storage, name)
+    for size in settings.COURSES_IMAGE_PREGENERATE:
+        get_derivative(storage, name, size, digest=digest)
+    Profile.objects.filter(pk=profile_id, photo=name).update(photo_digest=digest)
@@ -1,3 +1,83 @@
-from django.test import TestCase
-
-# Create your tests here.
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image as PILImage
+
+from .models import MyUser, Profile
+from .tasks import process_photo
+
+
+def image_upload(name='photo.png', color='red'):
+    data = io.BytesIO()
+    PILImage.new('RGB', (8, 8), color).save(data, 'PNG')
+    return SimpleUploadedFile(name, data.getvalue(), content_type='image/png')
+
+
+class ProfilePhotoTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = MyUser.objects.create_user(username='user', password='test_password')
+
+    def create_processed_profile(self):
+        with mock.patch('courses.images.hash_path') as hash_path, \
+                mock.patch.object(process_photo, 'delay') as delay:
+            profile = Profile.objects.create(user=self.user, photo=image_upload())
+        hash_path.assert_not_called()
+        delay.assert_called_once_with(profile.pk, profile.photo.name)
+        self.assertEqual(profile.photo_derivatives(), {})
+        process_photo(profile.pk, profile.photo.name)
+        return Profile.objects.get(pk=profile.pk)
+
+    def test_digest_stored_by_task_and_reused(self):
+        profile = self.create_processed_profile()
+        self.assertEqual(len(profile.photo_digest), 64)
+        with mock.patch('courses.images.hash_path') as hash_path:
+            urls = profile.photo_derivatives()
+        hash_path.assert_not_called()
+        self.assertEqual(set(urls), {'thumb', 'medium'})
+        self.assertTrue(all(profile.photo_digest in url for url in urls.values()))
+
+    def test_digest_follows_photo_changes(self):
+        profile = self.create_processed_profile()
+        with mock.patch.object(process_photo, 'delay') as delay:
+            profile.about_myself = 'Hello'
+            profile.save()
+            delay.assert_not_called()
+            profile.photo = image_upload(color='blue')
+            profile.save()
+            delay.assert_called_once_with(profile.pk, profile.photo.name)
+        self.assertEqual(Profile.objects.get(pk=profile.pk).photo_digest, '')
+        profile.photo = None
+        profile.save()
+        self.assertEqual(profile.photo_derivatives(), {})
+
+    def test_task_of_replaced_photo_does_nothing(self):
+        profile = self.create_processed_profile()
+        digest = profile.photo_digest
+        with mock.patch.object(process_photo, 'delay'):
+            old_name = profile.photo.name
+            profile.photo = image_upload(color='blue')
+            profile.save()
+        process_photo(profile.pk, old_name)
+        self.assertEqual(Profile.objects.get(pk=profile.pk).photo_digest, '')
+        process_photo(profile.pk, profile.photo.name)
+        self.assertNotIn(Profile.objects.get(pk=profile.pk).photo_digest, ('', digest))
+
+    def test_profile_payload_lists_derivatives(self):
+        profile = self.create_processed_profile()
+        self.client.force_login(self.user)
+        response = self.client.get('/api/v0.1/accounts/profile/')
+        self.assertEqual(response.status_code, 200)
+        urls = response.json()['photo_derivatives']
+        self.assertEqual(set(urls), {'thumb', 'medium'})
+        self.assertTrue(urls['thumb'].startswith('http://testserver/'))
+        self.assertIn(profile.photo_digest, urls['thumb'])